@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BaseThrelteDvConfig(AppConfig):
@@ -7,6 +8,12 @@ class BaseThrelteDvConfig(AppConfig):
 
     def ready(self):
         """
-        Importe les signaux pour les activer
+        Importe les signaux (et les checks système) pour les activer
         """
         import backend.Base_threlte_dv.auto_sync_signals
+        import backend.Base_threlte_dv.model_processing
+        import backend.Base_threlte_dv.signals
+        import backend.Base_threlte_dv.scene_version
+        from backend.search import ensure_search_triggers
+
+        post_migrate.connect(ensure_search_triggers, sender=self)
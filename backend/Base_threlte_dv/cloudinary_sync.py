@@ -0,0 +1,347 @@
+"""
+Moteur de synchronisation Cloudinary -> CloudinaryAsset.
+
+- suit `next_cursor` (pages de 500) au lieu de s'arrêter à la première page ;
+- récupère les types de ressources (image, video, raw) en parallèle ;
+- compare en mémoire avec les assets existants et n'écrit que les différences,
+  par lots de bulk_create / bulk_update ;
+- mémorise par type le `created_at` le plus récent (CloudinarySyncState) :
+  les synchronisations suivantes ne demandent que les nouveaux assets (start_at) ;
+- ne vide jamais un champ renseigné, et ne fait que compléter les champs vides
+  des assets créés par le pipeline d'upload (content_hash) : leurs nom, format
+  et URL font foi (un fichier "raw" n'a pas de format côté Cloudinary).
+
+`sync_scheduler` regroupe les déclenchements (post_save de CloudinaryAsset) en une
+seule exécution incrémentale en arrière-plan, sans jamais bloquer la requête.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.auth import HTTPBasicAuth
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import CloudinaryAsset, CloudinarySyncState
+from .scene_version import schedule_asset_republish
+from .signals import ASSET_CREATED, ASSET_UPDATED, emit_assets_changed
+from .storage_metrics import measure
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_TYPES = ["image", "video", "raw"]
+PAGE_SIZE = 500
+BATCH_SIZE = 500
+SYNCED_FIELDS = [
+    "asset_id",
+    "url",
+    "asset_type",
+    "file_name",
+    "format",
+    "file_size",
+    "tags",
+]
+
+
+def clean_cloudinary_url(url):
+    """
+    Nettoie les URLs Cloudinary redondantes
+    Transforme: https://res.cloudinary.com/drcok7moc/raw/upload/https:/res.cloudinary.com/drcok7moc/models/hhh_dmydkc.glb
+    En:       /models/hhh_dmydkc.glb
+    """
+    if not url:
+        return url
+
+    # Pattern à détecter et nettoyer
+    redundant_prefix = "https:/res.cloudinary.com/drcok7moc"
+
+    if redundant_prefix in url:
+        # Extraire la partie après le préfixe redondant
+        parts = url.split(redundant_prefix)
+        if len(parts) > 1:
+            return parts[1]  # Retourne "/models/hhh_dmydkc.glb"
+
+    return url
+
+
+def get_cloudinary_credentials():
+    cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME")
+    api_key = os.environ.get("CLOUDINARY_API_KEY")
+    api_secret = os.environ.get("CLOUDINARY_API_SECRET")
+    if not all([cloud_name, api_key, api_secret]):
+        return None
+    return cloud_name, api_key, api_secret
+
+
+def fetch_resources(auth, cloud_name, resource_type, start_at=None):
+    """
+    Récupère toutes les pages d'un type de ressource (optionnellement depuis start_at).
+    Une session HTTP par type : la connexion est réutilisée de page en page.
+    """
+    api_url = f"https://api.cloudinary.com/v1_1/{cloud_name}/resources/{resource_type}/upload"
+    params = {"max_results": PAGE_SIZE}
+    if start_at:
+        params["start_at"] = start_at.isoformat()
+        params["direction"] = "asc"
+
+    resources = []
+    with requests.Session() as session:
+        session.auth = auth
+        while True:
+            with measure("cloudinary", "list") as call:
+                response = session.get(api_url, params=params, timeout=30)
+                response.raise_for_status()
+                data = response.json()
+                call["bytes"] = len(response.content)
+            resources.extend(data.get("resources", []))
+
+            next_cursor = data.get("next_cursor")
+            if not next_cursor:
+                return resources
+            params["next_cursor"] = next_cursor
+
+
+def resource_to_fields(resource):
+    return {
+        "asset_id": resource.get("asset_id", ""),
+        "url": clean_cloudinary_url(resource.get("secure_url", "")),
+        "asset_type": resource.get("resource_type", "raw"),
+        "file_name": resource.get("original_filename", ""),
+        "format": resource.get("format", ""),
+        "file_size": resource.get("bytes", 0),
+        "tags": resource.get("tags", []),
+    }
+
+
+def _is_blank(value):
+    return value is None or value == "" or value == []
+
+
+def synced_changes(asset, fields):
+    """Champs de la ressource à écrire sur un asset existant"""
+    changes = {}
+    for name, value in fields.items():
+        current = getattr(asset, name)
+        if current == value or _is_blank(value):
+            continue
+        if asset.content_hash and not _is_blank(current):
+            continue
+        changes[name] = value
+    return changes
+
+
+def insert_assets(assets):
+    """
+    Insère les nouveaux assets et retourne ceux réellement créés. Si une ligne
+    a été créée entre-temps (upload, autre synchronisation), le lot échoue et
+    est rejoué ligne par ligne : les lignes en conflit ne sont pas comptées.
+    """
+    try:
+        with transaction.atomic():
+            CloudinaryAsset.objects.bulk_create(assets)
+        return assets
+    except IntegrityError:
+        pass
+    inserted = []
+    for asset in assets:
+        try:
+            with transaction.atomic():
+                CloudinaryAsset.objects.bulk_create([asset])
+        except IntegrityError:
+            continue
+        inserted.append(asset)
+    return inserted
+
+
+def apply_resources(resources):
+    """
+    Compare les ressources à la base et écrit uniquement les différences.
+    Retourne (créés, mis à jour, inchangés).
+    """
+    incoming = {}
+    for resource in resources:
+        incoming[resource["public_id"]] = resource_to_fields(resource)
+
+    created_ids = []
+    updated_ids = []
+    unchanged = 0
+    public_ids = list(incoming)
+    for start in range(0, len(public_ids), BATCH_SIZE):
+        batch_ids = public_ids[start : start + BATCH_SIZE]
+        existing = {
+            asset.public_id: asset
+            for asset in CloudinaryAsset.objects.filter(public_id__in=batch_ids).only(
+                "id", "public_id", "content_hash", *SYNCED_FIELDS
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for public_id in batch_ids:
+            fields = incoming[public_id]
+            asset = existing.get(public_id)
+            if asset is None:
+                to_create.append(CloudinaryAsset(public_id=public_id, **fields))
+                continue
+            changes = synced_changes(asset, fields)
+            if changes:
+                for name, value in changes.items():
+                    setattr(asset, name, value)
+                to_update.append(asset)
+            else:
+                unchanged += 1
+
+        with transaction.atomic():
+            if to_create:
+                to_create = insert_assets(to_create)
+            if to_update:
+                CloudinaryAsset.objects.bulk_update(to_update, SYNCED_FIELDS)
+                # bulk_update n'émet pas post_save : géométries liées republiées ici
+                schedule_asset_republish(asset_ids=[asset.pk for asset in to_update])
+        created_ids.extend(asset.public_id for asset in to_create)
+        updated_ids.extend(asset.public_id for asset in to_update)
+
+    # bulk_create/bulk_update n'émettent pas post_save : un événement par lot
+    emit_assets_changed(ASSET_CREATED, created_ids)
+    emit_assets_changed(ASSET_UPDATED, updated_ids)
+    return len(created_ids), len(updated_ids), unchanged
+
+
+def sync_cloudinary(full=False, resource_types=None):
+    """
+    Synchronise les assets Cloudinary. `full=True` ignore le high-water mark.
+    Retourne un dict de statistiques par type, ou None si Cloudinary n'est pas configuré.
+    """
+    credentials = get_cloudinary_credentials()
+    if credentials is None:
+        logger.error("❌ Configuration Cloudinary manquante")
+        return None
+    cloud_name, api_key, api_secret = credentials
+    resource_types = resource_types or RESOURCE_TYPES
+
+    states = {
+        state.resource_type: state
+        for state in CloudinarySyncState.objects.filter(resource_type__in=resource_types)
+    }
+
+    def high_water_mark(resource_type):
+        state = states.get(resource_type)
+        return None if full or state is None else state.last_created_at
+
+    auth = HTTPBasicAuth(api_key, api_secret)
+    with ThreadPoolExecutor(max_workers=len(resource_types)) as pool:
+        futures = {
+            resource_type: pool.submit(
+                fetch_resources,
+                auth,
+                cloud_name,
+                resource_type,
+                high_water_mark(resource_type),
+            )
+            for resource_type in resource_types
+        }
+
+        stats = {}
+        for resource_type, future in futures.items():
+            try:
+                resources = future.result()
+            except requests.RequestException as e:
+                logger.error(f"❌ Erreur API Cloudinary ({resource_type}): {str(e)}")
+                stats[resource_type] = {"error": str(e)}
+                continue
+
+            created, updated, unchanged = apply_resources(resources)
+
+            created_at = [
+                parse_datetime(r["created_at"]) for r in resources if r.get("created_at")
+            ]
+            state = states.get(resource_type) or CloudinarySyncState(
+                resource_type=resource_type
+            )
+            if created_at:
+                newest = max(created_at)
+                if state.last_created_at is None or newest > state.last_created_at:
+                    state.last_created_at = newest
+            state.last_count = len(resources)
+            state.save()
+
+            stats[resource_type] = {
+                "fetched": len(resources),
+                "created": created,
+                "updated": updated,
+                "unchanged": unchanged,
+            }
+            logger.info(
+                f"📊 {resource_type}: {len(resources)} récupérés, "
+                f"{created} créés, {updated} mis à jour"
+            )
+
+    return stats
+
+
+class SyncScheduler:
+    """
+    Planifie la synchronisation en arrière-plan avec anti-rebond :
+    les déclenchements reçus pendant `window` secondes donnent une seule exécution,
+    un déclenchement pendant une exécution en provoque une seule de plus à la fin,
+    et les écritures faites par la synchronisation elle-même sont ignorées.
+    """
+
+    def __init__(self, run, window=None):
+        self.run = run
+        self.window = window
+        self._lock = threading.Lock()
+        self._timer = None
+        self._running = False
+        self._dirty = False
+        self._local = threading.local()
+
+    def get_window(self):
+        if self.window is not None:
+            return self.window
+        return getattr(settings, "CLOUDINARY_SYNC_DEBOUNCE", 5.0)
+
+    def is_syncing(self):
+        """Vrai dans le thread qui exécute la synchronisation"""
+        return getattr(self._local, "active", False)
+
+    def trigger(self):
+        if self.is_syncing():
+            return
+        with self._lock:
+            if self._running:
+                self._dirty = True
+                return
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.get_window(), self._execute)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _execute(self):
+        with self._lock:
+            self._timer = None
+            self._running = True
+            self._dirty = False
+
+        self._local.active = True
+        try:
+            self.run()
+        except Exception as e:
+            logger.error(f"❌ Erreur synchronisation Cloudinary: {str(e)}", exc_info=True)
+        finally:
+            self._local.active = False
+            connections.close_all()
+            with self._lock:
+                self._running = False
+                rerun = self._dirty
+
+        if rerun:
+            self.trigger()
+
+
+sync_scheduler = SyncScheduler(run=sync_cloudinary)
@@ -0,0 +1,178 @@
+"""
+Compression de la géométrie des GLB (remplace scripts/compress_draco.py).
+
+Codecs :
+- "draco" / "meshopt" : via la CLI gltf-transform (MODEL_COMPRESSION_CLI) ;
+- "quantize" : intégré, sans dépendance externe. Quantification NumPy
+  (KHR_mesh_quantization) : positions en uint16 avec la transformation de
+  déquantification portée par un nœud enfant, normales/tangentes en int8
+  normalisés, UV en uint16 normalisés, indices réduits au plus petit type.
+
+Si la CLI est absente ou échoue, on se replie sur "quantize" : le codec
+réellement utilisé est enregistré dans les métadonnées ("codec", avec
+"fallback_reason"), à côté du codec demandé. Module indépendant de Django : `compress_model`
+est exécutée dans le pool de processus.
+"""
+
+import os
+import subprocess
+
+import numpy as np
+
+from .glb import GLB, TARGET_ARRAY_BUFFER
+
+CODECS = ("draco", "meshopt", "quantize")
+CLI_CODECS = ("draco", "meshopt")
+QUANTIZATION_EXTENSION = "KHR_mesh_quantization"
+COMPRESSED_EXTENSIONS = (
+    "KHR_draco_mesh_compression",
+    "EXT_meshopt_compression",
+    "KHR_meshopt_compression",
+    QUANTIZATION_EXTENSION,
+)
+POSITION_STEPS = 65535
+
+
+def _is_float(glb, index):
+    return glb.document["accessors"][index]["componentType"] == 5126
+
+
+def _quantizable_meshes(glb):
+    """Meshes sans skin, morph targets ni instancing, aux positions flottantes"""
+    excluded = set()
+    for node in glb.document.get("nodes", []):
+        if "mesh" in node and (
+            "skin" in node
+            or "weights" in node
+            or "EXT_mesh_gpu_instancing" in node.get("extensions", {})
+        ):
+            excluded.add(node["mesh"])
+
+    meshes = []
+    for index, mesh in enumerate(glb.document.get("meshes", [])):
+        primitives = mesh.get("primitives", [])
+        if index in excluded or not primitives:
+            continue
+        if all(
+            "POSITION" in primitive.get("attributes", {})
+            and not primitive.get("targets")
+            and _is_float(glb, primitive["attributes"]["POSITION"])
+            for primitive in primitives
+        ):
+            meshes.append(index)
+    return meshes
+
+
+def _quantize_attribute(glb, name, values):
+    """Nouvel accessor quantifié pour un attribut flottant, ou None s'il reste en float"""
+    if name in ("NORMAL", "TANGENT"):
+        quantized = np.round(np.clip(values, -1.0, 1.0) * 127).astype(np.int8)
+        return glb.add_accessor(quantized, TARGET_ARRAY_BUFFER, normalized=True)
+    if name.startswith("TEXCOORD_") and len(values) and values.min() >= 0 and values.max() <= 1:
+        quantized = np.round(values * 65535).astype(np.uint16)
+        return glb.add_accessor(quantized, TARGET_ARRAY_BUFFER, normalized=True)
+    return None
+
+
+def quantize(glb):
+    """Applique KHR_mesh_quantization au GLB (en place). Retourne le nombre de meshes traités."""
+    doc = glb.document
+    nodes = doc.get("nodes", [])
+    meshes = _quantizable_meshes(glb)
+    replaced = {}
+
+    for mesh_index in meshes:
+        primitives = doc["meshes"][mesh_index]["primitives"]
+        positions = [glb.accessor(p["attributes"]["POSITION"]).astype(np.float64) for p in primitives]
+        lo = np.min([p.min(axis=0) for p in positions if len(p)], axis=0)
+        hi = np.max([p.max(axis=0) for p in positions if len(p)], axis=0)
+        extent = np.where(hi - lo > 0, hi - lo, 1.0)
+
+        quantized_positions = {}
+        for primitive, position in zip(primitives, positions):
+            attributes = primitive["attributes"]
+            source = attributes["POSITION"]
+            if source not in quantized_positions:
+                quantized = np.round((position - lo) / extent * POSITION_STEPS).astype(np.uint16)
+                quantized_positions[source] = glb.add_accessor(
+                    quantized, TARGET_ARRAY_BUFFER, with_bounds=True
+                )
+            attributes["POSITION"] = quantized_positions[source]
+            for name, index in list(attributes.items()):
+                if name == "POSITION" or not _is_float(glb, index):
+                    continue
+                if index not in replaced:
+                    replaced[index] = _quantize_attribute(glb, name, glb.accessor(index))
+                if replaced[index] is not None:
+                    attributes[name] = replaced[index]
+            if "indices" in primitive:
+                faces = glb.accessor(primitive["indices"]).reshape(-1).astype(np.int64)
+                primitive["indices"] = glb.add_indices(faces, len(position))
+
+        # Déquantification : le mesh passe sur un nœud enfant qui porte offset et échelle
+        dequantize = {
+            "translation": [float(v) for v in lo],
+            "scale": [float(v) for v in extent / POSITION_STEPS],
+        }
+        for node in list(nodes):
+            if node.get("mesh") == mesh_index:
+                del node["mesh"]
+                nodes.append({"mesh": mesh_index, **dequantize})
+                node.setdefault("children", []).append(len(nodes) - 1)
+
+    if meshes:
+        glb.use_extension(QUANTIZATION_EXTENSION, required=True)
+        glb.prune()
+    return len(meshes)
+
+
+def run_cli(command, codec, source_path, output_path):
+    """gltf-transform <codec> <entrée> <sortie> ; lève une exception en cas d'échec"""
+    result = subprocess.run(
+        [*command, codec, source_path, output_path],
+        capture_output=True,
+        text=True,
+        timeout=600,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-500:] or f"code {result.returncode}")
+
+
+def compress_model(source_path, output_dir, options):
+    """
+    Compresse un GLB avec `options["codec"]`. Retourne [{"variant": "compressed", ...}],
+    ou une liste vide si le fichier est déjà compressé ou si le gain est nul.
+    """
+    codec = options.get("codec", "quantize")
+    original_bytes = os.path.getsize(source_path)
+    glb = GLB.load(source_path)
+    if glb.extensions_used & set(COMPRESSED_EXTENSIONS):
+        return []
+
+    output_path = os.path.join(output_dir, f"compressed-{codec}.glb")
+    error = ""
+    if codec in CLI_CODECS:
+        try:
+            run_cli(options.get("command", ["npx", "gltf-transform"]), codec, source_path, output_path)
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            if not options.get("fallback", True):
+                raise
+            error = str(e)
+            codec = "quantize"
+    if codec == "quantize":
+        if not quantize(glb):
+            return []
+        glb.save(output_path)
+
+    compressed_bytes = os.path.getsize(output_path)
+    if compressed_bytes >= original_bytes:
+        return []
+    metadata = {
+        "codec": codec,
+        "original_bytes": original_bytes,
+        "bytes": compressed_bytes,
+        "ratio": round(compressed_bytes / original_bytes, 4),
+    }
+    if error:
+        metadata["fallback_reason"] = error[:500]
+    return [{"variant": "compressed", "path": output_path, "metadata": metadata}]
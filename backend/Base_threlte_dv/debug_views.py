@@ -1,5 +1,6 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.conf import settings
+from django.views.decorators.http import require_http_methods
 import os
 
 
@@ -16,3 +17,24 @@ def debug_env(request):
         "CLOUDINARY_STORAGE": getattr(settings, "CLOUDINARY_STORAGE", None),
     }
     return JsonResponse(env_vars)
+
+
+@require_http_methods(["GET", "DELETE"])
+def profiling_report(request):
+    """
+    Agrégats du profilage des requêtes par nom d'URL (staff uniquement,
+    session de l'admin) ; DELETE vide le tampon.
+    """
+    from backend.profiling_middleware import request_profiles
+
+    if not (request.user.is_active and request.user.is_staff):
+        return JsonResponse({"error": "Réservé aux administrateurs"}, status=403)
+    if request.method == "DELETE":
+        request_profiles.reset()
+        return HttpResponse(status=204)
+    return JsonResponse(
+        {
+            "enabled": getattr(settings, "REQUEST_PROFILING_ENABLED", False),
+            **request_profiles.summary(),
+        }
+    )
@@ -0,0 +1,267 @@
+"""
+Lecture/écriture complète d'un GLB (JSON + BIN) pour les étapes d'ingestion.
+
+Module volontairement indépendant de Django (importable sans settings, vérifié
+par les tests) : il est importé par les workers du pool de processus (LOD,
+compression, textures, miniatures).
+
+Le BIN est découpé par bufferView ; les étapes remplacent ou ajoutent des
+bufferViews/accessors, puis `prune()` retire ce qui n'est plus référencé et
+`to_bytes()` réécrit un buffer unique, aligné sur 4 octets.
+"""
+
+import copy
+import json
+import struct
+
+import numpy as np
+
+from .model_inspection import CHUNK_BIN, CHUNK_JSON, GLB_MAGIC, ModelInspectionError
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+DTYPE_COMPONENTS = {np.dtype(dtype): code for code, dtype in COMPONENT_DTYPES.items()}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+SIZE_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+
+TARGET_ARRAY_BUFFER = 34962
+TARGET_ELEMENT_ARRAY_BUFFER = 34963
+
+
+class GLBError(ModelInspectionError):
+    """GLB non pris en charge par les étapes d'ingestion"""
+
+
+def _pad(data, fill):
+    return data + fill * ((4 - len(data) % 4) % 4)
+
+
+class GLB:
+    def __init__(self, document, views):
+        self.document = document
+        self.views = views
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < 20:
+            raise GLBError("Fichier tronqué")
+        magic, version, _ = struct.unpack_from("<4sII", data, 0)
+        if magic != GLB_MAGIC or version != 2:
+            raise GLBError("Fichier GLB 2.0 attendu")
+
+        offset = 12
+        document = None
+        binary = b""
+        while offset + 8 <= len(data):
+            length, chunk_type = struct.unpack_from("<II", data, offset)
+            chunk = data[offset + 8 : offset + 8 + length]
+            if chunk_type == CHUNK_JSON and document is None:
+                document = json.loads(chunk.decode("utf-8"))
+            elif chunk_type == CHUNK_BIN and not binary:
+                binary = chunk
+            offset += 8 + length
+        if document is None:
+            raise GLBError("Chunk JSON manquant")
+
+        buffers = document.get("buffers", [])
+        if len(buffers) > 1 or any("uri" in buffer for buffer in buffers):
+            raise GLBError("Buffers externes non pris en charge")
+
+        views = []
+        for view in document.get("bufferViews", []):
+            start = view.get("byteOffset", 0)
+            views.append(bytes(binary[start : start + view["byteLength"]]))
+        return cls(document, views)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fh:
+            return cls.from_bytes(fh.read())
+
+    def copy(self):
+        return GLB(copy.deepcopy(self.document), list(self.views))
+
+    @property
+    def extensions_used(self):
+        return set(self.document.get("extensionsUsed", []))
+
+    def use_extension(self, name, required=False):
+        keys = ["extensionsUsed", "extensionsRequired"] if required else ["extensionsUsed"]
+        for key in keys:
+            names = self.document.setdefault(key, [])
+            if name not in names:
+                names.append(name)
+
+    # Accessors
+
+    def accessor(self, index):
+        """Données d'un accessor en tableau NumPy de forme (count, composantes)"""
+        accessor = self.document["accessors"][index]
+        if "sparse" in accessor:
+            raise GLBError("Accessors sparse non pris en charge")
+        dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+        components = TYPE_SIZES[accessor["type"]]
+        count = accessor["count"]
+        if "bufferView" not in accessor or not count:
+            return np.zeros((count, components), dtype=dtype)
+
+        view = self.document["bufferViews"][accessor["bufferView"]]
+        data = self.views[accessor["bufferView"]]
+        offset = accessor.get("byteOffset", 0)
+        element_size = dtype.itemsize * components
+        stride = view.get("byteStride") or element_size
+        if stride == element_size:
+            array = np.frombuffer(data, dtype=dtype, count=count * components, offset=offset)
+            return array.reshape(count, components)
+        # Données entrelacées : on lit chaque élément avec le pas du bufferView
+        raw = np.frombuffer(data, dtype=np.uint8, count=stride * (count - 1) + element_size, offset=offset)
+        rows = np.lib.stride_tricks.as_strided(raw, shape=(count, element_size), strides=(stride, 1))
+        return np.ascontiguousarray(rows).view(dtype).reshape(count, components)
+
+    def add_view(self, data, target=None, stride=None):
+        view = {"buffer": 0, "byteOffset": 0, "byteLength": len(data)}
+        if stride is not None:
+            view["byteStride"] = stride
+        if target is not None:
+            view["target"] = target
+        self.document.setdefault("bufferViews", []).append(view)
+        self.views.append(bytes(data))
+        return len(self.views) - 1
+
+    def add_accessor(self, array, target=None, with_bounds=False, normalized=False):
+        array = np.ascontiguousarray(array)
+        if array.ndim == 1:
+            array = array.reshape(-1, 1)
+        count, components = array.shape
+        integer = array.dtype.kind in "iu"
+        accessor = {
+            "componentType": DTYPE_COMPONENTS[array.dtype],
+            "count": int(count),
+            "type": SIZE_TYPES[components],
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if with_bounds and count:
+            cast = int if integer else float
+            accessor["min"] = [cast(v) for v in array.min(axis=0)]
+            accessor["max"] = [cast(v) for v in array.max(axis=0)]
+
+        stride = None
+        row_bytes = components * array.dtype.itemsize
+        if target == TARGET_ARRAY_BUFFER and row_bytes % 4:
+            # Attributs de sommets : chaque élément doit être aligné sur 4 octets
+            padded = -(-row_bytes // 4) * 4 // array.dtype.itemsize
+            array = np.concatenate(
+                [array, np.zeros((count, padded - components), dtype=array.dtype)], axis=1
+            )
+            stride = padded * array.dtype.itemsize
+        accessor["bufferView"] = self.add_view(array.tobytes(), target, stride)
+        self.document.setdefault("accessors", []).append(accessor)
+        return len(self.document["accessors"]) - 1
+
+    def add_indices(self, faces, vertex_count):
+        dtype = np.uint8 if vertex_count < 256 else np.uint16 if vertex_count < 65536 else np.uint32
+        return self.add_accessor(faces.reshape(-1).astype(dtype), TARGET_ELEMENT_ARRAY_BUFFER)
+
+    # Réécriture
+
+    def _accessor_refs(self):
+        """(conteneur, clé) de chaque référence à un accessor"""
+        doc = self.document
+        for mesh in doc.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                attributes = primitive.get("attributes", {})
+                yield from ((attributes, name) for name in attributes)
+                if "indices" in primitive:
+                    yield primitive, "indices"
+                for target in primitive.get("targets", []):
+                    yield from ((target, name) for name in target)
+        for skin in doc.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                yield skin, "inverseBindMatrices"
+        for animation in doc.get("animations", []):
+            for sampler in animation.get("samplers", []):
+                yield sampler, "input"
+                yield sampler, "output"
+        for node in doc.get("nodes", []):
+            instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing", {})
+            attributes = instancing.get("attributes", {})
+            yield from ((attributes, name) for name in attributes)
+
+    def _view_refs(self):
+        """(conteneur, clé) de chaque référence à un bufferView"""
+        doc = self.document
+        for accessor in doc.get("accessors", []):
+            if "bufferView" in accessor:
+                yield accessor, "bufferView"
+            sparse = accessor.get("sparse")
+            if sparse:
+                yield sparse["indices"], "bufferView"
+                yield sparse["values"], "bufferView"
+        for image in doc.get("images", []):
+            if "bufferView" in image:
+                yield image, "bufferView"
+        for mesh in doc.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                draco = primitive.get("extensions", {}).get("KHR_draco_mesh_compression")
+                if draco:
+                    yield draco, "bufferView"
+
+    def prune(self):
+        """Supprime les accessors et bufferViews qui ne sont plus référencés"""
+        doc = self.document
+        refs = list(self._accessor_refs())
+        used = sorted({container[key] for container, key in refs})
+        remap = {old: new for new, old in enumerate(used)}
+        doc["accessors"] = [doc["accessors"][i] for i in used]
+        for container, key in refs:
+            container[key] = remap[container[key]]
+
+        refs = list(self._view_refs())
+        used = sorted({container[key] for container, key in refs})
+        remap = {old: new for new, old in enumerate(used)}
+        doc["bufferViews"] = [doc["bufferViews"][i] for i in used]
+        self.views = [self.views[i] for i in used]
+        for container, key in refs:
+            container[key] = remap[container[key]]
+        return self
+
+    def to_bytes(self):
+        binary = bytearray()
+        for view, data in zip(self.document.get("bufferViews", []), self.views):
+            binary.extend(b"\x00" * ((4 - len(binary) % 4) % 4))
+            view["buffer"] = 0
+            view["byteOffset"] = len(binary)
+            view["byteLength"] = len(data)
+            binary.extend(data)
+        binary = _pad(bytes(binary), b"\x00")
+
+        if binary:
+            self.document["buffers"] = [{"byteLength": len(binary)}]
+        else:
+            self.document.pop("buffers", None)
+        json_chunk = _pad(
+            json.dumps(self.document, separators=(",", ":")).encode("utf-8"), b" "
+        )
+
+        total = 12 + 8 + len(json_chunk) + (8 + len(binary) if binary else 0)
+        parts = [
+            struct.pack("<4sII", GLB_MAGIC, 2, total),
+            struct.pack("<II", len(json_chunk), CHUNK_JSON),
+            json_chunk,
+        ]
+        if binary:
+            parts += [struct.pack("<II", len(binary), CHUNK_BIN), binary]
+        return b"".join(parts)
+
+    def save(self, path):
+        data = self.to_bytes()
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return len(data)
@@ -0,0 +1,269 @@
+"""
+Génération de niveaux de détail (LOD) par décimation quadrique, vectorisée NumPy.
+
+La décimation suit l'approche « vertex clustering + quadriques » (Lindstrom) :
+chaque face contribue sa quadrique d'erreur (plan pondéré par l'aire) aux
+sommets, les sommets sont regroupés sur une grille, et chaque groupe est
+remplacé par le point minimisant la somme des quadriques (repli sur le
+barycentre si le système est mal conditionné). Toutes les étapes sont des
+opérations NumPy sur l'ensemble du maillage, sans boucle Python par arête.
+La résolution de la grille est ajustée par dichotomie pour atteindre le
+nombre de triangles visé.
+
+Module indépendant de Django : `generate_lods` est exécutée dans le pool de processus.
+"""
+
+import os
+
+import numpy as np
+
+from .glb import GLB, TARGET_ARRAY_BUFFER
+
+MODE_TRIANGLES = 4
+# Attributs flottants conservés (moyennés par groupe) ; les autres sont retirés
+AVERAGED_ATTRIBUTES = ("NORMAL", "TEXCOORD_0", "TEXCOORD_1", "COLOR_0")
+UNSUPPORTED_EXTENSIONS = (
+    "KHR_draco_mesh_compression",
+    "EXT_meshopt_compression",
+    "KHR_meshopt_compression",
+)
+MAX_GRID_RESOLUTION = 2048
+SEARCH_STEPS = 12
+
+
+def face_quadrics(positions, faces):
+    """Quadrique 4x4 (plan pondéré par l'aire) de chaque face"""
+    v0, v1, v2 = (positions[faces[:, i]] for i in range(3))
+    normals = np.cross(v1 - v0, v2 - v0)
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 0
+    unit = np.zeros_like(normals)
+    unit[valid] = normals[valid] / lengths[valid, None]
+    planes = np.concatenate([unit, -np.einsum("ij,ij->i", unit, v0)[:, None]], axis=1)
+    areas = 0.5 * lengths
+    return areas[:, None, None] * planes[:, :, None] * planes[:, None, :]
+
+
+def cluster_vertices(positions, resolution):
+    """Indice de groupe de chaque sommet sur une grille de `resolution` cellules"""
+    lo = positions.min(axis=0)
+    extent = float((positions.max(axis=0) - lo).max()) or 1.0
+    cell = extent / resolution
+    cells = np.minimum(np.floor((positions - lo) / cell).astype(np.int64), resolution)
+    # Coordonnées de cellule encodées en un entier : unique 1D bien plus rapide
+    side = resolution + 1
+    keys = (cells[:, 0] * side + cells[:, 1]) * side + cells[:, 2]
+    _, labels = np.unique(keys, return_inverse=True)
+    return labels.reshape(-1), cell
+
+
+def collapse_faces(labels, faces):
+    """Faces après regroupement, sans faces dégénérées ni doublons"""
+    new_faces = labels[faces]
+    keep = (
+        (new_faces[:, 0] != new_faces[:, 1])
+        & (new_faces[:, 1] != new_faces[:, 2])
+        & (new_faces[:, 0] != new_faces[:, 2])
+    )
+    new_faces = new_faces[keep]
+    if len(new_faces):
+        ordered = np.sort(new_faces, axis=1)
+        side = int(labels.max()) + 1
+        if side < 2**21:
+            keys = (ordered[:, 0] * side + ordered[:, 1]) * side + ordered[:, 2]
+            _, first = np.unique(keys, return_index=True)
+        else:
+            _, first = np.unique(ordered, axis=0, return_index=True)
+        new_faces = new_faces[np.sort(first)]
+    return new_faces
+
+
+def group_sum(labels, values, clusters):
+    """Somme de `values` (n, k) par groupe, via bincount (bien plus rapide que add.at)"""
+    return np.stack(
+        [np.bincount(labels, weights=values[:, k], minlength=clusters) for k in range(values.shape[1])],
+        axis=1,
+    )
+
+
+def place_vertices(positions, faces, labels, cell):
+    """Point minimisant la somme des quadriques de chaque groupe"""
+    clusters = labels.max() + 1
+    quadrics = face_quadrics(positions, faces).reshape(-1, 16)
+    corner_labels = np.concatenate([labels[faces[:, corner]] for corner in range(3)])
+    cluster_q = group_sum(corner_labels, np.tile(quadrics, (3, 1)), clusters).reshape(-1, 4, 4)
+
+    counts = np.bincount(labels, minlength=clusters).astype(np.float64)
+    centroids = group_sum(labels, positions, clusters) / np.maximum(counts, 1)[:, None]
+
+    # Point optimal : A x = -b, avec A = Q[:3,:3], b = Q[:3,3]
+    a = cluster_q[:, :3, :3]
+    b = -cluster_q[:, :3, 3]
+    det = np.linalg.det(a)
+    scale = np.abs(a).max(axis=(1, 2)) ** 3 + 1e-30
+    solvable = np.abs(det) > 1e-9 * scale
+    points = centroids.copy()
+    if solvable.any():
+        solved = np.linalg.solve(a[solvable], b[solvable][:, :, None])[:, :, 0]
+        # Un point trop éloigné du groupe crée des pointes : repli sur le barycentre
+        close = np.linalg.norm(solved - centroids[solvable], axis=1) <= cell
+        indices = np.flatnonzero(solvable)
+        points[indices[close]] = solved[close]
+    return points
+
+
+def decimate(positions, faces, target_faces):
+    """
+    Simplifie le maillage jusqu'à environ `target_faces` triangles.
+    Retourne (labels des sommets, positions des groupes, faces), ou None.
+    """
+    positions = positions.astype(np.float64)
+    lo, hi = 1, MAX_GRID_RESOLUTION
+    best = None
+    # La recherche ne compte que les faces ; les sommets sont placés une seule fois
+    for _ in range(SEARCH_STEPS):
+        if lo > hi:
+            break
+        resolution = (lo + hi) // 2
+        labels, cell = cluster_vertices(positions, resolution)
+        new_faces = collapse_faces(labels, faces)
+        if len(new_faces) <= target_faces:
+            if best is None or len(new_faces) > len(best[2]):
+                best = (labels, cell, new_faces)
+            lo = resolution + 1
+        else:
+            hi = resolution - 1
+    if best is None or not len(best[2]):
+        return None
+    labels, cell, new_faces = best
+    return labels, place_vertices(positions, faces, labels, cell), new_faces
+
+
+def average_attribute(values, labels, clusters):
+    sums = group_sum(labels, values.astype(np.float64), clusters)
+    counts = np.bincount(labels, minlength=clusters)[:, None]
+    return sums / np.maximum(counts, 1)
+
+
+def _triangle_primitives(glb):
+    """Primitives triangulées décimables, groupées par données partagées"""
+    groups = {}
+    accessors = glb.document.get("accessors", [])
+    for mesh_index, mesh in enumerate(glb.document.get("meshes", [])):
+        for primitive_index, primitive in enumerate(mesh.get("primitives", [])):
+            attributes = primitive.get("attributes", {})
+            position = attributes.get("POSITION")
+            if (
+                position is None
+                or primitive.get("mode", MODE_TRIANGLES) != MODE_TRIANGLES
+                or primitive.get("targets")
+                or "JOINTS_0" in attributes
+                or accessors[position]["componentType"] != 5126
+            ):
+                continue
+            key = (tuple(sorted(attributes.items())), primitive.get("indices"))
+            groups.setdefault(key, []).append((mesh_index, primitive_index))
+    return groups
+
+
+def _face_count(glb, key):
+    attributes, indices = key
+    accessors = glb.document["accessors"]
+    if indices is not None:
+        return accessors[indices]["count"] // 3
+    return accessors[dict(attributes)["POSITION"]]["count"] // 3
+
+
+def _primitive_faces(glb, indices, vertex_count):
+    if indices is not None:
+        return glb.accessor(indices).reshape(-1, 3).astype(np.int64)
+    return np.arange(vertex_count - vertex_count % 3, dtype=np.int64).reshape(-1, 3)
+
+
+def build_lod(source, groups, ratio):
+    """Copie du GLB dont chaque primitive est décimée à `ratio` de ses triangles"""
+    glb = source.copy()
+    triangles = 0
+    vertices = 0
+    for (attributes, indices), locations in groups.items():
+        attributes = dict(attributes)
+        positions = source.accessor(attributes["POSITION"])
+        faces = _primitive_faces(source, indices, len(positions))
+        target = max(int(len(faces) * ratio), 1)
+
+        result = decimate(positions, faces, target) if len(faces) > 1 else None
+        if result is None:
+            # Primitive trop petite : conservée telle quelle
+            triangles += len(faces)
+            vertices += len(positions)
+            continue
+        labels, points, new_faces = result
+
+        # Ne garder que les groupes utilisés par les faces restantes
+        used, compact_faces = np.unique(new_faces, return_inverse=True)
+        compact_faces = compact_faces.reshape(-1, 3)
+        new_attributes = {
+            "POSITION": glb.add_accessor(
+                points[used].astype(np.float32), TARGET_ARRAY_BUFFER, with_bounds=True
+            )
+        }
+        clusters = len(points)
+        for name in AVERAGED_ATTRIBUTES:
+            index = attributes.get(name)
+            if index is None or source.document["accessors"][index]["componentType"] != 5126:
+                continue
+            values = average_attribute(source.accessor(index), labels, clusters)[used]
+            if name == "NORMAL":
+                norms = np.linalg.norm(values, axis=1, keepdims=True)
+                values = values / np.where(norms > 0, norms, 1)
+            new_attributes[name] = glb.add_accessor(values.astype(np.float32), TARGET_ARRAY_BUFFER)
+        new_indices = glb.add_indices(compact_faces, len(used))
+
+        for mesh_index, primitive_index in locations:
+            primitive = glb.document["meshes"][mesh_index]["primitives"][primitive_index]
+            primitive["attributes"] = dict(new_attributes)
+            primitive["indices"] = new_indices
+        triangles += len(compact_faces)
+        vertices += len(used)
+
+    glb.prune()
+    return glb, vertices, triangles
+
+
+def generate_lods(source_path, output_dir, options):
+    """
+    Produit un GLB par ratio de `options["ratios"]` (ex: [0.5, 0.25, 0.1]).
+    Retourne une liste de {"variant", "path", "metadata"} (vide si non applicable).
+    """
+    glb = GLB.load(source_path)
+    if glb.extensions_used & set(UNSUPPORTED_EXTENSIONS):
+        # Géométrie déjà compressée : pas de décodeur Draco/meshopt côté serveur
+        return []
+
+    groups = _triangle_primitives(glb)
+    source_triangles = sum(_face_count(glb, key) for key in groups)
+    if source_triangles < options.get("min_triangles", 0):
+        return []
+
+    outputs = []
+    for level, ratio in enumerate(options["ratios"], start=1):
+        lod, vertices, triangles = build_lod(glb, groups, ratio)
+        if triangles >= source_triangles:
+            break
+        path = os.path.join(output_dir, f"lod{level}.glb")
+        size = lod.save(path)
+        outputs.append(
+            {
+                "variant": f"lod{level}",
+                "path": path,
+                "metadata": {
+                    "level": level,
+                    "ratio": ratio,
+                    "vertices": vertices,
+                    "triangles": triangles,
+                    "source_triangles": source_triangles,
+                    "bytes": size,
+                },
+            }
+        )
+    return outputs
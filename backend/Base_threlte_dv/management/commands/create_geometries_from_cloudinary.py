@@ -13,21 +13,26 @@ class Command(BaseCommand):
 
         with transaction.atomic():
             # Récupérer tous les assets 3D (GLB/GLTF)
+            # Les assets déjà liés à une geometry sont exclus via la clé étrangère indexée
             assets_3d = CloudinaryAsset.objects.filter(
+                asset_type="raw", format__in=["glb", "gltf"]
+            ) | CloudinaryAsset.objects.filter(
                 asset_type="raw", url__endswith=".glb"
             ) | CloudinaryAsset.objects.filter(asset_type="raw", url__endswith=".gltf")
 
-            for asset in assets_3d:
-                # Vérifier si une geometry existe déjà pour cet asset
-                if Geometry.objects.filter(asset=asset).exists():
-                    self.stdout.write(f"⏭️  {asset.public_id} déjà utilisé")
-                    continue
+            used = assets_3d.filter(geometries__isnull=False).distinct().count()
+            if used:
+                self.stdout.write(f"⏭️  {used} assets déjà utilisés")
+
+            for asset in assets_3d.filter(geometries__isnull=True).distinct():
 
                 # Créer une nouvelle geometry
                 geometry = Geometry.objects.create(
                     name=asset.file_name or asset.public_id.split("/")[-1],
                     asset=asset,
-                    model_type="glb" if asset.url.endswith(".glb") else "gltf",
+                    model_url=asset.url,
+                    type="gltf_model",
+                    model_type="gltf" if (asset.format == "gltf" or asset.url.endswith(".gltf")) else "glb",
                     position={"x": 0.0, "y": 0.0, "z": 0.0},
                     rotation={"x": 0.0, "y": 0.0, "z": 0.0},
                     color="#000000",
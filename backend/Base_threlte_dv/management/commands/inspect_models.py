@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from backend.Base_threlte_dv.model_inspection import MODEL_FORMATS, inspect_remote_model
+from backend.Base_threlte_dv.models import CloudinaryAsset
+
+
+class Command(BaseCommand):
+    help = (
+        "Inspecte les modèles GLB/glTF déjà stockés (en-tête + JSON seulement) "
+        "et enregistre leurs statistiques dans CloudinaryAsset.metadata"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Ré-inspecte aussi les assets ayant déjà des statistiques",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8, help="Téléchargements en parallèle"
+        )
+
+    def handle(self, *args, **options):
+        models_filter = Q(format__in=MODEL_FORMATS)
+        for ext in MODEL_FORMATS:
+            models_filter |= Q(url__iendswith=f".{ext}")
+        assets = CloudinaryAsset.objects.filter(models_filter)
+        if not options["force"]:
+            assets = assets.exclude(metadata__has_key="model")
+        assets = list(assets.only("id", "url", "file_name", "format", "metadata"))
+
+        self.stdout.write(f"🔍 {len(assets)} modèles à inspecter...")
+
+        def inspect(asset):
+            filename = asset.url
+            if asset.format in MODEL_FORMATS:
+                filename = f"model.{asset.format}"
+            return asset, inspect_remote_model(asset.url, filename)
+
+        inspected = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for asset, stats in pool.map(inspect, assets):
+                if stats is None:
+                    self.stdout.write(f"  ❌ {asset.url}")
+                    continue
+                asset.metadata = {**(asset.metadata or {}), "model": stats}
+                inspected.append(asset)
+                self.stdout.write(
+                    f"  ✅ {asset.url}: {stats['vertices']} sommets, "
+                    f"{stats['triangles']} triangles, {stats['textures']} textures"
+                )
+
+        CloudinaryAsset.objects.bulk_update(inspected, ["metadata"], batch_size=500)
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 {len(inspected)}/{len(assets)} modèles inspectés")
+        )
@@ -1,8 +1,12 @@
 # backend/Base_threlte_dv/management/commands/link_geometries_to_assets.py
 
+import re
+
 from django.core.management.base import BaseCommand
 from backend.Base_threlte_dv.models import Geometry, CloudinaryAsset
 
+PUBLIC_ID_PATTERN = re.compile(r"/dv-threlte/models/([^/]+)")
+
 
 class Command(BaseCommand):
     help = "Lie les géométries existantes aux assets Cloudinary correspondants"
@@ -13,33 +17,40 @@ class Command(BaseCommand):
         linked_count = 0
         not_found_count = 0
 
-        for geometry in Geometry.objects.all():
-            if geometry.asset:
-                self.stdout.write(
-                    f"  ✓ Geometry {geometry.id} ({geometry.name}) déjà liée"
-                )
-                continue
+        already_linked = Geometry.objects.filter(asset__isnull=False).count()
+        if already_linked:
+            self.stdout.write(f"  ✓ {already_linked} géométries déjà liées")
 
-            # Chercher un asset Cloudinary par correspondance partielle
-            # Les noms de géométrie sont souvent des IDs courts, essayer de trouver des assets correspondants
-            asset_name = (
-                geometry.name.lower().replace(" ", "").replace("(", "").replace(")", "")
-            )
+        # Correspondances exactes chargées en une requête (CloudinaryAsset.url n'est
+        # pas indexée) : URL du modèle, puis public_id extrait de l'URL
+        assets_by_url = {}
+        assets_by_public_id = {}
+        for asset in CloudinaryAsset.objects.only("id", "url", "public_id").order_by("id"):
+            assets_by_url.setdefault(asset.url, asset)
+            assets_by_public_id[asset.public_id] = asset
 
-            # Chercher d'abord par correspondance exacte dans file_name
+        for geometry in Geometry.objects.filter(asset__isnull=True).iterator():
             asset = None
-            assets = CloudinaryAsset.objects.filter(
-                asset_type="raw", file_name__icontains=asset_name
-            ).first()
 
-            if assets:
-                asset = assets
-            else:
-                # Chercher par correspondance dans public_id
-                assets = CloudinaryAsset.objects.filter(
-                    asset_type="raw", public_id__icontains=asset_name
-                ).first()
-                asset = assets
+            if geometry.model_url:
+                asset = assets_by_url.get(geometry.model_url)
+                match = PUBLIC_ID_PATTERN.search(geometry.model_url)
+                if asset is None and match:
+                    asset = assets_by_public_id.get(f"dv-threlte/models/{match.group(1)}")
+
+            # Sinon, recherche approximative par nom (plus lente, en dernier recours)
+            asset_name = (
+                geometry.name.lower().replace(" ", "").replace("(", "").replace(")", "")
+            )
+            if asset is None and asset_name:
+                asset = (
+                    CloudinaryAsset.objects.filter(
+                        asset_type="raw", file_name__icontains=asset_name
+                    ).first()
+                    or CloudinaryAsset.objects.filter(
+                        asset_type="raw", public_id__icontains=asset_name
+                    ).first()
+                )
 
             # Si toujours rien, essayer avec "bibi" pour les tests
             if not asset and "bibi" in asset_name:
@@ -65,4 +76,3 @@ class Command(BaseCommand):
                 f"🎉 Terminé : {linked_count} géométries liées, {not_found_count} non trouvées"
             )
         )
-# tst
\ No newline at end of file
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from backend.Base_threlte_dv.model_processing import (
+    STAGES,
+    get_enabled_stages,
+    pending_stages,
+    process_model_asset,
+)
+from backend.Base_threlte_dv.models import CloudinaryAsset
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue les étapes d'ingestion (LOD, compression, miniatures...) sur les "
+        "modèles GLB et images existants, en parallèle (calcul dans le pool de processus)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stage",
+            action="append",
+            choices=sorted(STAGES),
+            dest="stages",
+            help="Étape(s) à exécuter (par défaut: MODEL_PROCESSING_STAGES)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recalcule même les étapes déjà effectuées",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Modèles traités simultanément (téléchargement + envoi)",
+        )
+
+    def handle(self, *args, **options):
+        stages = [STAGES[name] for name in options["stages"] or []] or get_enabled_stages()
+        if not stages:
+            raise CommandError("Aucune étape activée")
+
+        assets = [
+            asset
+            for asset in CloudinaryAsset.objects.filter(source__isnull=True)
+            if pending_stages(asset, stages, options["force"])
+        ]
+        total = len(assets)
+        self.stdout.write(
+            f"▶️  {total} modèles à traiter ({', '.join(stage.name for stage in stages)})"
+        )
+
+        def run(asset):
+            try:
+                return process_model_asset(asset.pk, stages=stages, force=options["force"])
+            finally:
+                connections.close_all()
+
+        done = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {pool.submit(run, asset): asset for asset in assets}
+            for future in as_completed(futures):
+                asset = futures[future]
+                done += 1
+                try:
+                    results = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(f"  [{done}/{total}] ❌ {asset.public_id}: {str(e)}")
+                    continue
+                summary = ", ".join(f"{name}: {count}" for name, count in results.items())
+                self.stdout.write(f"  [{done}/{total}] ✅ {asset.public_id} ({summary or 'rien à faire'})")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 Terminé : {total - failed}/{total} modèles traités")
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from backend.Base_threlte_dv.upload_pipeline import get_session_ttl, purge_upload_sessions
+
+
+class Command(BaseCommand):
+    help = "Supprime les sessions d'upload par morceaux abandonnées et les fichiers de staging orphelins"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=int,
+            default=None,
+            metavar="SECONDES",
+            help="Inactivité au-delà de laquelle une session est abandonnée "
+            "(par défaut: UPLOAD_SESSION_TTL)",
+        )
+
+    def handle(self, *args, **options):
+        ttl = options["ttl"] if options["ttl"] is not None else get_session_ttl()
+        sessions, files = purge_upload_sessions(ttl)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {sessions} sessions abandonnées et {files} fichiers orphelins supprimés"
+            )
+        )
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.Base_threlte_dv.remote_deletion import (
+    REAP_BATCH_SIZE,
+    reap_remote_deletions,
+)
+
+
+class Command(BaseCommand):
+    help = "Supprime par lots les fichiers distants en attente (outbox RemoteDeletion)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            type=float,
+            default=0,
+            metavar="SECONDES",
+            help="Tourne en continu avec cet intervalle (par défaut: une seule passe)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while True:
+                stats = reap_remote_deletions()
+                self.stdout.write(
+                    f"🗑️ {stats['deleted']} supprimés, {stats['skipped']} ignorés, "
+                    f"{stats['retried']} à retenter, {stats['failed']} abandonnés"
+                )
+                # Lot incomplet : plus rien de dû pour l'instant
+                if sum(stats.values()) < REAP_BATCH_SIZE:
+                    break
+            if not options["loop"]:
+                break
+            time.sleep(options["loop"])
+
+        self.stdout.write(self.style.SUCCESS("✅ Suppressions distantes traitées"))
@@ -1,83 +1,56 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
-import os
-import requests
-from requests.auth import HTTPBasicAuth
+
+from backend.Base_threlte_dv.cloudinary_sync import (
+    RESOURCE_TYPES,
+    clean_cloudinary_url,
+    sync_cloudinary,
+)
 
 
 class Command(BaseCommand):
     help = "Synchronise les assets Cloudinary avec la base de données"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore le high-water mark et relit tous les assets",
+        )
+        parser.add_argument(
+            "--type",
+            action="append",
+            choices=RESOURCE_TYPES,
+            dest="resource_types",
+            help="Type(s) de ressource à synchroniser (par défaut: tous)",
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("🔄 Début de la synchronisation Cloudinary...")
 
         try:
-            # Configuration Cloudinary
-            cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME")
-            api_key = os.environ.get("CLOUDINARY_API_KEY")
-            api_secret = os.environ.get("CLOUDINARY_API_SECRET")
-
-            if not all([cloud_name, api_key, api_secret]):
+            stats = sync_cloudinary(
+                full=options["full"], resource_types=options["resource_types"]
+            )
+            if stats is None:
                 self.stdout.write(
                     self.style.ERROR("❌ Configuration Cloudinary manquante")
                 )
                 return
 
-            # Récupérer tous les types d'assets depuis l'API Cloudinary
-            resource_types = ["image", "video", "raw"]
             total_synced = 0
-
-            # Importer le modèle pour éviter les problèmes circulaires
-            from backend.Base_threlte_dv.models import CloudinaryAsset
-
-            with transaction.atomic():
-                for resource_type in resource_types:
-                    api_url = f"https://api.cloudinary.com/v1_1/{cloud_name}/resources/{resource_type}/upload"
-
-                    response = requests.get(
-                        api_url, auth=HTTPBasicAuth(api_key or "", api_secret or "")
-                    )
-                    if response.status_code != 200:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f"❌ Erreur API Cloudinary ({resource_type}): {response.status_code}"
-                            )
-                        )
-                        continue
-
-                    data = response.json()
-                    synced_count = 0
-
-                    for asset in data.get("resources", []):
-                        # Nettoyer l'URL redondante
-                        clean_url = self.clean_cloudinary_url(
-                            asset.get("secure_url", "")
-                        )
-
-                        cloudinary_asset, created = (
-                            CloudinaryAsset.objects.update_or_create(
-                                public_id=asset["public_id"],
-                                defaults={
-                                    "asset_id": asset.get("asset_id", ""),
-                                    "url": clean_url,
-                                    "asset_type": asset.get("resource_type", "raw"),
-                                    "file_name": asset.get("original_filename", ""),
-                                    "format": asset.get("format", ""),
-                                    "file_size": asset.get("bytes", 0),
-                                },
-                            )
-                        )
-
-                        if created:
-                            synced_count += 1
-                            total_synced += 1
-                            self.stdout.write(
-                                f"➕ Ajouté ({resource_type}): {asset['public_id']}"
-                            )
-
+            for resource_type, result in stats.items():
+                if "error" in result:
                     self.stdout.write(
-                        f"📊 {resource_type}: {synced_count} nouveaux assets"
+                        self.style.ERROR(
+                            f"❌ Erreur API Cloudinary ({resource_type}): {result['error']}"
+                        )
                     )
+                    continue
+                total_synced += result["created"]
+                self.stdout.write(
+                    f"📊 {resource_type}: {result['fetched']} récupérés, "
+                    f"{result['created']} nouveaux, {result['updated']} mis à jour"
+                )
 
             self.stdout.write(
                 self.style.SUCCESS(
@@ -91,21 +64,4 @@ class Command(BaseCommand):
             )
 
     def clean_cloudinary_url(self, url):
-        """
-        Nettoie les URLs Cloudinary redondantes
-        Transforme: https://res.cloudinary.com/drcok7moc/raw/upload/https:/res.cloudinary.com/drcok7moc/models/hhh_dmydkc.glb
-        En:       /models/hhh_dmydkc.glb
-        """
-        if not url:
-            return url
-
-        # Pattern à détecter et nettoyer
-        redundant_prefix = "https:/res.cloudinary.com/drcok7moc"
-
-        if redundant_prefix in url:
-            # Extraire la partie après le préfixe redondant
-            parts = url.split(redundant_prefix)
-            if len(parts) > 1:
-                return parts[1]  # Retourne "/models/hhh_dmydkc.glb"
-
-        return url
+        return clean_cloudinary_url(url)
@@ -0,0 +1,125 @@
+"""
+Histogrammes de latence en mémoire (par processus), thread-safe.
+
+Bornes cumulatives à la Prometheus (le = "less or equal") ; les quantiles
+sont estimés par interpolation linéaire dans le bucket concerné.
+`Histogram` cumule depuis le démarrage, `RollingHistogram` ne garde que les
+observations des `window` dernières secondes.
+"""
+
+import bisect
+import threading
+import time
+
+# Secondes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Un compteur par bucket + le dépassement (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        with self._lock:
+            return quantile(self.buckets, list(self.counts), self.count, q)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            total = self.sum
+        return _summary(self.buckets, counts, count, total)
+
+
+class RollingHistogram:
+    """
+    Histogramme sur une fenêtre glissante : `window` secondes découpées en
+    `slots` tranches, une tranche expirée est remise à zéro à sa réutilisation.
+    Mémorise aussi le volume (octets) observé dans la fenêtre.
+    """
+
+    def __init__(self, window=300.0, slots=10, buckets=LATENCY_BUCKETS, clock=time.monotonic):
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self.slot_length = window / slots
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Par tranche : [époque, compteurs, nombre, somme, octets]
+        self._slots = [None] * slots
+
+    def _epoch(self):
+        return int(self.clock() // self.slot_length)
+
+    def observe(self, value, size=0):
+        epoch = self._epoch()
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            position = epoch % len(self._slots)
+            slot = self._slots[position]
+            if slot is None or slot[0] != epoch:
+                slot = self._slots[position] = [epoch, [0] * (len(self.buckets) + 1), 0, 0.0, 0]
+            slot[1][index] += 1
+            slot[2] += 1
+            slot[3] += value
+            slot[4] += size
+
+    def snapshot(self):
+        oldest = self._epoch() - len(self._slots) + 1
+        counts = [0] * (len(self.buckets) + 1)
+        count = 0
+        total = 0.0
+        size = 0
+        with self._lock:
+            for slot in self._slots:
+                if slot is None or slot[0] < oldest:
+                    continue
+                counts = [a + b for a, b in zip(counts, slot[1])]
+                count += slot[2]
+                total += slot[3]
+                size += slot[4]
+        return {**_summary(self.buckets, counts, count, total), "bytes": size, "window": self.window}
+
+
+def quantile(buckets, counts, count, q):
+    """Quantile estimé d'après les compteurs par bucket (+Inf en dernier)"""
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        if seen + bucket_count >= rank and bucket_count:
+            if index == len(buckets):
+                # Au-delà de la dernière borne : on ne peut pas interpoler
+                return buckets[-1]
+            lower = buckets[index - 1] if index > 0 else 0.0
+            return lower + (buckets[index] - lower) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return buckets[-1]
+
+
+def _summary(buckets, counts, count, total):
+    cumulative = []
+    running = 0
+    for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+        running += bucket_count
+        cumulative.append([bound, running])
+    return {
+        "count": count,
+        "sum": round(total, 6),
+        "buckets": cumulative,
+        "p50": quantile(buckets, counts, count, 0.5),
+        "p95": quantile(buckets, counts, count, 0.95),
+        "p99": quantile(buckets, counts, count, 0.99),
+    }
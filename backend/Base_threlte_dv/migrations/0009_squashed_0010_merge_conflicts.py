@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Remplace les deux migrations 0009 parallèles et leur fusion : toutes deux
+    ajoutent geometry.model_url, ce qui échoue ("duplicate column") sur une
+    base neuve. Les bases ayant déjà appliqué 0009/0010 ne sont pas touchées
+    (migration squashée considérée comme appliquée).
+    """
+
+    replaces = [
+        ("Base_threlte_dv", "0009_add_model_url_field"),
+        ("Base_threlte_dv", "0009_remove_geometry_asset_remove_geometry_model_file_and_more"),
+        ("Base_threlte_dv", "0010_merge_conflicts"),
+    ]
+
+    dependencies = [
+        ("Base_threlte_dv", "0008_remove_geometry_model_url_geometry_asset_and_more"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="geometry",
+            name="asset",
+        ),
+        migrations.RemoveField(
+            model_name="geometry",
+            name="model_file",
+        ),
+        migrations.AddField(
+            model_name="geometry",
+            name="model_url",
+            field=models.URLField(
+                blank=True,
+                help_text="URL du modèle 3D sur Cloudinary",
+                max_length=1024,
+                null=True,
+            ),
+        ),
+    ]
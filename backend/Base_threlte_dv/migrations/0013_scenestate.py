@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+def create_scene_state(apps, schema_editor):
+    SceneState = apps.get_model('Base_threlte_dv', 'SceneState')
+    SceneState.objects.get_or_create(pk=1, defaults={'version': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0012_alter_geometry_model_type_alter_geometry_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SceneState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_scene_state, migrations.RunPython.noop),
+    ]
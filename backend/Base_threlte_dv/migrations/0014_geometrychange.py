@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+def mark_existing_scene_compacted(apps, schema_editor):
+    # Les géométries existantes n'ont pas d'entrée dans le journal :
+    # tout client avec since < version courante doit faire une resynchronisation complète.
+    SceneState = apps.get_model('Base_threlte_dv', 'SceneState')
+    state, _ = SceneState.objects.get_or_create(pk=1)
+    state.version += 1
+    state.compacted_version = state.version
+    state.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0013_scenestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeometryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(db_index=True)),
+                ('geometry_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['version', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='scenestate',
+            name='compacted_version',
+            field=models.PositiveBigIntegerField(default=0, help_text="Les changements jusqu'à cette version ont été purgés du journal"),
+        ),
+        migrations.RunPython(mark_existing_scene_compacted, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0014_geometrychange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geometry',
+            name='upload_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='geometry',
+            name='upload_status',
+            field=models.CharField(choices=[('ready', 'Prêt'), ('pending', "En cours d'upload"), ('failed', "Échec de l'upload")], default='ready', help_text="État de l'upload asynchrone du fichier associé", max_length=10),
+        ),
+    ]
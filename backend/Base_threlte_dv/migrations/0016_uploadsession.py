@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:02
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0015_geometry_upload_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.PositiveBigIntegerField(help_text='Taille annoncée en octets')),
+                ('received_bytes', models.PositiveBigIntegerField(default=0)),
+                ('crc32', models.PositiveBigIntegerField(default=0, help_text='CRC32 glissant des octets reçus')),
+                ('staged_path', models.CharField(max_length=1024)),
+                ('status', models.CharField(choices=[('open', 'Ouvert'), ('complete', 'Terminé')], default='open', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('geometry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Base_threlte_dv.geometry')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0016_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cloudinaryasset',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 du contenu (déduplication des uploads)', max_length=64, null=True, unique=True),
+        ),
+    ]
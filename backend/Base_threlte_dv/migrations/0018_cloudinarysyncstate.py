@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0017_cloudinaryasset_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CloudinarySyncState',
+            fields=[
+                ('resource_type', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('last_created_at', models.DateTimeField(blank=True, help_text='created_at du dernier asset synchronisé', null=True)),
+                ('last_count', models.PositiveIntegerField(default=0)),
+                ('last_synced_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0018_cloudinarysyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geometry',
+            name='asset',
+            field=models.ForeignKey(blank=True, help_text='Fichier stocké associé (taille, format, hash)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='geometries', to='Base_threlte_dv.cloudinaryasset'),
+        ),
+    ]
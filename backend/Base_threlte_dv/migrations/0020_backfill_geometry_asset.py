@@ -0,0 +1,64 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+PUBLIC_ID_PATTERN = re.compile(r"/dv-threlte/models/([^/]+)")
+
+
+def backfill_geometry_asset(apps, schema_editor):
+    Geometry = apps.get_model('Base_threlte_dv', 'Geometry')
+    CloudinaryAsset = apps.get_model('Base_threlte_dv', 'CloudinaryAsset')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Geometry.objects.filter(
+                id__gt=last_id, asset__isnull=True, model_url__isnull=False
+            )
+            .exclude(model_url='')
+            .order_by('id')
+            .only('id', 'model_url')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        # Correspondance par URL exacte, sinon par public_id extrait de l'URL
+        public_ids = {}
+        for geometry in batch:
+            match = PUBLIC_ID_PATTERN.search(geometry.model_url)
+            if match:
+                public_ids[geometry.id] = f"dv-threlte/models/{match.group(1)}"
+
+        by_url = dict(
+            CloudinaryAsset.objects.filter(
+                url__in=[g.model_url for g in batch]
+            ).values_list('url', 'id')
+        )
+        by_public_id = dict(
+            CloudinaryAsset.objects.filter(
+                public_id__in=list(public_ids.values())
+            ).values_list('public_id', 'id')
+        )
+
+        linked = []
+        for geometry in batch:
+            asset_id = by_url.get(geometry.model_url) or by_public_id.get(
+                public_ids.get(geometry.id)
+            )
+            if asset_id:
+                geometry.asset_id = asset_id
+                linked.append(geometry)
+        Geometry.objects.bulk_update(linked, ['asset'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0019_geometry_asset'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_geometry_asset, migrations.RunPython.noop),
+    ]
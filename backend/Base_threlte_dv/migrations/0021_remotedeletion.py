@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0020_backfill_geometry_asset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('backend', models.CharField(help_text='Nom du backend de stockage', max_length=20)),
+                ('resource_type', models.CharField(default='raw', max_length=20)),
+                ('key', models.CharField(help_text="public_id / clé de l'objet", max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('done', 'Supprimé'), ('failed', 'Abandonné')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['next_attempt_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='Base_threlt_status_f1c192_idx')],
+            },
+        ),
+    ]
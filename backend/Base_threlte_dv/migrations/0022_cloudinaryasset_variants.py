@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0021_remotedeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cloudinaryasset',
+            name='source',
+            field=models.ForeignKey(blank=True, help_text='Asset source dont celui-ci est une variante', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='Base_threlte_dv.cloudinaryasset'),
+        ),
+        migrations.AddField(
+            model_name='cloudinaryasset',
+            name='variant',
+            field=models.CharField(blank=True, default='', help_text='Nom de la variante (ex: lod1)', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='cloudinaryasset',
+            constraint=models.UniqueConstraint(condition=models.Q(('source__isnull', False)), fields=('source', 'variant'), name='unique_asset_variant'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL exécuté uniquement sur la base `vendor` (sqlite, postgresql)"""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Recherche plein texte (voir backend/search.py) : name (A), type (B), model_type (C)
+POSTGRESQL_SQL = [
+    """ALTER TABLE "Base_threlte_dv_geometry" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce("name", '')), 'A')
+        || setweight(to_tsvector('simple', coalesce("type", '')), 'B')
+        || setweight(to_tsvector('simple', coalesce("model_type", '')), 'C')
+    ) STORED""",
+    'CREATE INDEX "Base_threlte_dv_geometry_search_vector" ON "Base_threlte_dv_geometry" USING GIN (search_vector)',
+]
+POSTGRESQL_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS "Base_threlte_dv_geometry_search_vector"',
+    'ALTER TABLE "Base_threlte_dv_geometry" DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_SQL = [
+    """CREATE VIRTUAL TABLE "Base_threlte_dv_geometry_fts" USING fts5(
+        "name", "type", "model_type",
+        content="Base_threlte_dv_geometry", content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER "Base_threlte_dv_geometry_fts_insert" AFTER INSERT ON "Base_threlte_dv_geometry" BEGIN
+        INSERT INTO "Base_threlte_dv_geometry_fts" (rowid, "name", "type", "model_type")
+        VALUES (new.id, new."name", new."type", new."model_type");
+    END""",
+    """CREATE TRIGGER "Base_threlte_dv_geometry_fts_delete" AFTER DELETE ON "Base_threlte_dv_geometry" BEGIN
+        INSERT INTO "Base_threlte_dv_geometry_fts" ("Base_threlte_dv_geometry_fts", rowid, "name", "type", "model_type")
+        VALUES ('delete', old.id, old."name", old."type", old."model_type");
+    END""",
+    """CREATE TRIGGER "Base_threlte_dv_geometry_fts_update" AFTER UPDATE OF "name", "type", "model_type"
+    ON "Base_threlte_dv_geometry" BEGIN
+        INSERT INTO "Base_threlte_dv_geometry_fts" ("Base_threlte_dv_geometry_fts", rowid, "name", "type", "model_type")
+        VALUES ('delete', old.id, old."name", old."type", old."model_type");
+        INSERT INTO "Base_threlte_dv_geometry_fts" (rowid, "name", "type", "model_type")
+        VALUES (new.id, new."name", new."type", new."model_type");
+    END""",
+    # Indexation des lignes existantes
+    """INSERT INTO "Base_threlte_dv_geometry_fts" ("Base_threlte_dv_geometry_fts") VALUES ('rebuild')""",
+]
+SQLITE_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS "Base_threlte_dv_geometry_fts_insert"',
+    'DROP TRIGGER IF EXISTS "Base_threlte_dv_geometry_fts_delete"',
+    'DROP TRIGGER IF EXISTS "Base_threlte_dv_geometry_fts_update"',
+    'DROP TABLE IF EXISTS "Base_threlte_dv_geometry_fts"',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0022_cloudinaryasset_variants'),
+    ]
+
+    operations = [
+        VendorRunSQL("postgresql", POSTGRESQL_SQL, POSTGRESQL_REVERSE_SQL),
+        VendorRunSQL("sqlite", SQLITE_SQL, SQLITE_REVERSE_SQL),
+    ]
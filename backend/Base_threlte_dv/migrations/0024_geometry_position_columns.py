@@ -0,0 +1,70 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def coordinate(position, axis):
+    try:
+        value = float((position or {}).get(axis, 0.0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def backfill_position_columns(apps, schema_editor):
+    Geometry = apps.get_model('Base_threlte_dv', 'Geometry')
+
+    last_id = 0
+    while True:
+        batch = list(
+            Geometry.objects.filter(id__gt=last_id).order_by('id').only('id', 'position')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for geometry in batch:
+            geometry.position_x = coordinate(geometry.position, 'x')
+            geometry.position_y = coordinate(geometry.position, 'y')
+            geometry.position_z = coordinate(geometry.position, 'z')
+        Geometry.objects.bulk_update(batch, ['position_x', 'position_y', 'position_z'])
+
+
+def restore_search_triggers(apps, schema_editor):
+    # Ajout de colonnes NOT NULL : SQLite reconstruit la table et perd les
+    # triggers de recherche créés par 0023 (post_migrate ne passe qu'en fin de migrate)
+    from backend.search import repair_search_triggers
+
+    repair_search_triggers(schema_editor.connection, [apps.get_model('Base_threlte_dv', 'Geometry')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Base_threlte_dv', '0023_geometry_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geometry',
+            name='position_x',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='geometry',
+            name='position_y',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='geometry',
+            name='position_z',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='geometry',
+            index=models.Index(fields=['position_x', 'position_y', 'position_z'], name='geometry_position_idx'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_position_columns, migrations.RunPython.noop),
+    ]
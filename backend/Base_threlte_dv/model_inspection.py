@@ -0,0 +1,399 @@
+"""
+Inspection des modèles GLB/glTF à l'ingestion (pur Python, sans dépendance).
+
+Seuls l'en-tête GLB et le chunk JSON sont lus ; le chunk BIN n'est jamais chargé
+(on ne lit que son en-tête de 8 octets pour connaître sa taille). Un flux HTTP
+peut donc être inspecté sans télécharger la géométrie ni les textures.
+
+Les statistiques sont enregistrées dans `CloudinaryAsset.metadata["model"]` :
+sommets, triangles, matériaux, textures, boîte englobante (repère de la scène),
+extensions (Draco, meshopt) et répartition des octets.
+"""
+
+import json
+import logging
+import math
+import os
+import struct
+
+import requests
+
+from .storage_backends import backend_name_for_url
+from .storage_metrics import measure
+
+logger = logging.getLogger(__name__)
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+READ_BLOCK_SIZE = 64 * 1024
+MAX_JSON_SIZE = 64 * 1024 * 1024
+
+MODEL_FORMATS = ("glb", "gltf")
+DRACO_EXTENSION = "KHR_draco_mesh_compression"
+MESHOPT_EXTENSIONS = ("EXT_meshopt_compression", "KHR_meshopt_compression")
+
+# Modes de primitive glTF
+MODE_TRIANGLES = 4
+MODE_TRIANGLE_STRIP = 5
+MODE_TRIANGLE_FAN = 6
+
+
+class ModelInspectionError(ValueError):
+    """Fichier qui n'est pas un GLB/glTF valide"""
+
+
+def _read_exact(stream, size):
+    """Lit exactement `size` octets par blocs (flux réseau compris)"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        block = stream.read(min(READ_BLOCK_SIZE, remaining))
+        if not block:
+            raise ModelInspectionError("Fichier tronqué")
+        parts.append(block)
+        remaining -= len(block)
+    return b"".join(parts)
+
+
+def read_glb_json(stream):
+    """
+    Lit l'en-tête GLB et le chunk JSON.
+    Retourne (document glTF, octets JSON, octets BIN, taille déclarée du fichier).
+    """
+    header = _read_exact(stream, 12)
+    magic, version, total_length = struct.unpack("<4sII", header)
+    if magic != GLB_MAGIC:
+        raise ModelInspectionError("En-tête GLB invalide")
+    if version != 2:
+        raise ModelInspectionError(f"Version GLB non supportée: {version}")
+
+    json_length, chunk_type = struct.unpack("<II", _read_exact(stream, 8))
+    if chunk_type != CHUNK_JSON:
+        raise ModelInspectionError("Le premier chunk GLB doit être du JSON")
+    if json_length > MAX_JSON_SIZE:
+        raise ModelInspectionError(f"Chunk JSON trop volumineux ({json_length} octets)")
+    document = _parse_json(_read_exact(stream, json_length))
+
+    bin_length = 0
+    if total_length > 12 + 8 + json_length:
+        # En-tête du chunk BIN uniquement : son contenu n'est pas lu
+        bin_length, chunk_type = struct.unpack("<II", _read_exact(stream, 8))
+        if chunk_type != CHUNK_BIN:
+            bin_length = 0
+    return document, json_length, bin_length, total_length
+
+
+def _parse_json(raw):
+    try:
+        document = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ModelInspectionError(f"JSON glTF invalide: {e}")
+    if not isinstance(document, dict):
+        raise ModelInspectionError("Le JSON glTF doit être un objet")
+    return document
+
+
+def _identity():
+    return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def _multiply(a, b):
+    """Produit de matrices 4x4 stockées en colonnes (convention glTF)"""
+    return [
+        sum(a[k * 4 + row] * b[col * 4 + k] for k in range(4))
+        for col in range(4)
+        for row in range(4)
+    ]
+
+
+def _node_matrix(node):
+    if "matrix" in node:
+        return [float(v) for v in node["matrix"]]
+    tx, ty, tz = node.get("translation", (0.0, 0.0, 0.0))
+    qx, qy, qz, qw = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    sx, sy, sz = node.get("scale", (1.0, 1.0, 1.0))
+    # T * R * S, en colonnes
+    return [
+        (1 - 2 * (qy * qy + qz * qz)) * sx,
+        (2 * (qx * qy + qz * qw)) * sx,
+        (2 * (qx * qz - qy * qw)) * sx,
+        0.0,
+        (2 * (qx * qy - qz * qw)) * sy,
+        (1 - 2 * (qx * qx + qz * qz)) * sy,
+        (2 * (qy * qz + qx * qw)) * sy,
+        0.0,
+        (2 * (qx * qz + qy * qw)) * sz,
+        (2 * (qy * qz - qx * qw)) * sz,
+        (1 - 2 * (qx * qx + qy * qy)) * sz,
+        0.0,
+        tx,
+        ty,
+        tz,
+        1.0,
+    ]
+
+
+def _transform_point(m, p):
+    x, y, z = p
+    return (
+        m[0] * x + m[4] * y + m[8] * z + m[12],
+        m[1] * x + m[5] * y + m[9] * z + m[13],
+        m[2] * x + m[6] * y + m[10] * z + m[14],
+    )
+
+
+def _mesh_local_bounds(document, mesh):
+    """Boîte englobante locale d'un mesh d'après min/max des accesseurs POSITION"""
+    accessors = document.get("accessors", [])
+    lo = [math.inf] * 3
+    hi = [-math.inf] * 3
+    for primitive in mesh.get("primitives", []):
+        index = primitive.get("attributes", {}).get("POSITION")
+        if index is None or index >= len(accessors):
+            continue
+        accessor = accessors[index]
+        if "min" not in accessor or "max" not in accessor:
+            continue
+        for axis in range(3):
+            lo[axis] = min(lo[axis], accessor["min"][axis])
+            hi[axis] = max(hi[axis], accessor["max"][axis])
+    if lo[0] == math.inf:
+        return None
+    return lo, hi
+
+
+def compute_bounds(document):
+    """Boîte englobante dans le repère de la scène (transformations des nœuds appliquées)"""
+    meshes = document.get("meshes", [])
+    nodes = document.get("nodes", [])
+    local_bounds = [_mesh_local_bounds(document, mesh) for mesh in meshes]
+
+    lo = [math.inf] * 3
+    hi = [-math.inf] * 3
+
+    def extend(bounds, matrix):
+        (x0, y0, z0), (x1, y1, z1) = bounds
+        for corner in (
+            (x, y, z) for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)
+        ):
+            point = _transform_point(matrix, corner)
+            for axis in range(3):
+                lo[axis] = min(lo[axis], point[axis])
+                hi[axis] = max(hi[axis], point[axis])
+
+    scenes = document.get("scenes", [])
+    if scenes and nodes:
+        scene = scenes[document.get("scene", 0)] if document.get("scene", 0) < len(scenes) else scenes[0]
+        stack = [(index, _identity()) for index in scene.get("nodes", [])]
+        visited = set()
+        while stack:
+            index, parent = stack.pop()
+            if index in visited or index >= len(nodes):
+                continue
+            visited.add(index)
+            node = nodes[index]
+            matrix = _multiply(parent, _node_matrix(node))
+            mesh_index = node.get("mesh")
+            if mesh_index is not None and mesh_index < len(local_bounds) and local_bounds[mesh_index]:
+                extend(local_bounds[mesh_index], matrix)
+            stack.extend((child, matrix) for child in node.get("children", []))
+    else:
+        for bounds in local_bounds:
+            if bounds:
+                extend(bounds, _identity())
+
+    if lo[0] == math.inf:
+        return None
+    return {
+        "min": [round(v, 6) for v in lo],
+        "max": [round(v, 6) for v in hi],
+        "size": [round(hi[axis] - lo[axis], 6) for axis in range(3)],
+    }
+
+
+def _primitive_triangles(document, primitive, vertex_count):
+    accessors = document.get("accessors", [])
+    indices = primitive.get("indices")
+    count = vertex_count
+    if indices is not None and indices < len(accessors):
+        count = accessors[indices].get("count", 0)
+    mode = primitive.get("mode", MODE_TRIANGLES)
+    if mode == MODE_TRIANGLES:
+        return count // 3
+    if mode in (MODE_TRIANGLE_STRIP, MODE_TRIANGLE_FAN):
+        return max(count - 2, 0)
+    return 0
+
+
+def _buffer_view_size(view):
+    # meshopt : la taille réellement stockée est celle de l'extension
+    for name in MESHOPT_EXTENSIONS:
+        extension = view.get("extensions", {}).get(name)
+        if extension:
+            return extension.get("byteLength", view.get("byteLength", 0))
+    return view.get("byteLength", 0)
+
+
+def byte_breakdown(document, buffer_bytes):
+    """Répartit les octets des buffers entre images, géométrie, animations et autres"""
+    accessors = document.get("accessors", [])
+    views = document.get("bufferViews", [])
+
+    def accessor_view(index):
+        if index is not None and index < len(accessors):
+            return accessors[index].get("bufferView")
+        return None
+
+    image_views = {image.get("bufferView") for image in document.get("images", [])}
+    geometry_views = set()
+    for mesh in document.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            geometry_views.update(
+                accessor_view(index) for index in primitive.get("attributes", {}).values()
+            )
+            geometry_views.add(accessor_view(primitive.get("indices")))
+            for target in primitive.get("targets", []):
+                geometry_views.update(accessor_view(index) for index in target.values())
+            draco = primitive.get("extensions", {}).get(DRACO_EXTENSION)
+            if draco:
+                geometry_views.add(draco.get("bufferView"))
+    animation_views = set()
+    for animation in document.get("animations", []):
+        for sampler in animation.get("samplers", []):
+            animation_views.add(accessor_view(sampler.get("input")))
+            animation_views.add(accessor_view(sampler.get("output")))
+
+    totals = {"images": 0, "geometry": 0, "animation": 0}
+    for index, view in enumerate(views):
+        size = _buffer_view_size(view)
+        if index in image_views:
+            totals["images"] += size
+        elif index in geometry_views:
+            totals["geometry"] += size
+        elif index in animation_views:
+            totals["animation"] += size
+    totals["other"] = max(buffer_bytes - sum(totals.values()), 0)
+    return totals
+
+
+def summarize(document, json_bytes, buffer_bytes, total_bytes, file_format):
+    """Statistiques d'un document glTF déjà chargé"""
+    accessors = document.get("accessors", [])
+    meshes = document.get("meshes", [])
+
+    vertices = 0
+    triangles = 0
+    primitives = 0
+    for mesh in meshes:
+        for primitive in mesh.get("primitives", []):
+            primitives += 1
+            index = primitive.get("attributes", {}).get("POSITION")
+            count = accessors[index].get("count", 0) if index is not None and index < len(accessors) else 0
+            vertices += count
+            triangles += _primitive_triangles(document, primitive, count)
+
+    extensions = sorted(set(document.get("extensionsUsed", [])))
+    return {
+        "format": file_format,
+        "generator": document.get("asset", {}).get("generator", ""),
+        "meshes": len(meshes),
+        "primitives": primitives,
+        "vertices": vertices,
+        "triangles": triangles,
+        "nodes": len(document.get("nodes", [])),
+        "materials": len(document.get("materials", [])),
+        "textures": len(document.get("textures", [])),
+        "images": len(document.get("images", [])),
+        "animations": len(document.get("animations", [])),
+        "bbox": compute_bounds(document),
+        "extensions": extensions,
+        "draco": DRACO_EXTENSION in extensions,
+        "meshopt": any(name in extensions for name in MESHOPT_EXTENSIONS),
+        "bytes": {
+            "total": total_bytes,
+            "json": json_bytes,
+            "bin": buffer_bytes,
+            **byte_breakdown(document, buffer_bytes),
+        },
+    }
+
+
+def inspect_stream(stream, file_format="glb", total_bytes=None):
+    """Inspecte un flux binaire (fichier ouvert, UploadedFile, réponse HTTP brute)"""
+    if file_format == "gltf":
+        raw = stream.read(MAX_JSON_SIZE + 1)
+        if len(raw) > MAX_JSON_SIZE:
+            raise ModelInspectionError("Fichier glTF trop volumineux")
+        document = _parse_json(raw)
+        json_bytes, total_bytes = len(raw), total_bytes or len(raw)
+        buffer_bytes = None
+    else:
+        document, json_bytes, buffer_bytes, declared = read_glb_json(stream)
+        total_bytes = total_bytes or declared
+
+    # JSON syntaxiquement valide mais de structure inattendue (index texte,
+    # min/max trop courts, listes à la place d'objets...) : le fichier est
+    # illisible, pas le serveur en erreur
+    try:
+        if buffer_bytes is None:
+            buffer_bytes = sum(
+                buffer.get("byteLength", 0) for buffer in document.get("buffers", [])
+            )
+        return summarize(document, json_bytes, buffer_bytes, total_bytes, file_format)
+    except (TypeError, ValueError, KeyError, IndexError, AttributeError) as e:
+        raise ModelInspectionError(f"Structure glTF invalide: {type(e).__name__}: {e}")
+
+
+def model_format(filename):
+    ext = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return ext if ext in MODEL_FORMATS else None
+
+
+def inspect_model(source, filename=None):
+    """
+    Inspecte un modèle depuis un chemin ou un objet fichier.
+    Retourne None si le fichier n'est pas un modèle 3D ou s'il est illisible.
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    file_format = model_format(filename or (source if is_path else getattr(source, "name", "")))
+    if file_format is None:
+        return None
+
+    try:
+        if is_path:
+            with open(source, "rb") as fh:
+                return inspect_stream(fh, file_format, os.path.getsize(source))
+        source.seek(0)
+        try:
+            return inspect_stream(source, file_format, getattr(source, "size", None))
+        finally:
+            source.seek(0)
+    except (ModelInspectionError, OSError, struct.error) as e:
+        logger.warning(f"⚠️ Inspection du modèle impossible ({filename or source}): {str(e)}")
+        return None
+
+
+def inspect_remote_model(url, filename=None):
+    """Inspecte un modèle distant en ne téléchargeant que l'en-tête et le JSON"""
+    file_format = model_format(filename or url.split("?")[0])
+    if file_format is None:
+        return None
+    try:
+        with measure(backend_name_for_url(url), "inspect") as call, requests.get(
+            url, stream=True, timeout=30
+        ) as response:
+            response.raise_for_status()
+            total = response.headers.get("Content-Length")
+            response.raw.decode_content = True
+            try:
+                return inspect_stream(
+                    response.raw, file_format, int(total) if total and total.isdigit() else None
+                )
+            finally:
+                # Seuls l'en-tête et le JSON sont lus
+                call["bytes"] = response.raw.tell()
+    except (ModelInspectionError, requests.RequestException, struct.error) as e:
+        logger.warning(f"⚠️ Inspection du modèle impossible ({url}): {str(e)}")
+        return None
+
@@ -0,0 +1,373 @@
+"""
+Étapes d'ingestion des modèles 3D (et des images), après l'upload.
+
+Chaque étape (textures, LOD, compression, miniature...) est une fonction pure exécutée dans un pool de
+processus (calcul CPU, hors du processus qui sert l'API). Les fichiers produits
+sont envoyés au backend de stockage et enregistrés comme variantes de l'asset
+source (CloudinaryAsset.source / variant), puis les géométries liées sont
+republiées (journal de scène + SSE) pour que les clients les découvrent.
+
+Les clés de stockage des variantes dérivent du hash du fichier source : une
+variante déjà produite pour un contenu donné n'est jamais recalculée.
+"""
+
+import logging
+import multiprocessing
+import os
+import shlex
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import checks
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .compression import CLI_CODECS, CODECS, compress_model
+from .lod import generate_lods
+from .model_inspection import inspect_model, model_format
+from .models import CloudinaryAsset
+from .remote_deletion import cancel_remote_deletions
+from .scene_version import coalesce_asset_changes
+from .storage_backends import backend_for_asset, get_storage_backend
+from .textures import transcode_textures
+from .thumbnails import render_thumbnail
+from .upload_pipeline import MODELS_FOLDER, get_staging_dir, hash_file, submit_task
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = ("jpg", "jpeg", "png", "webp", "gif")
+
+
+class ModelStage:
+    """
+    Étape d'ingestion. `compute(source_path, output_dir, options)` s'exécute dans
+    le pool de processus et retourne une liste de {"variant", "path", "metadata"}.
+    """
+
+    name = ""
+    compute = None
+    # Vrai si la variante produite remplace le fichier source pour les étapes suivantes
+    transforms_source = False
+
+    def options(self):
+        return {}
+
+    def accepts(self, asset):
+        """Formats traités par l'étape (GLB par défaut)"""
+        return is_glb(asset)
+
+    def is_done(self, asset):
+        return False
+
+    def finalize(self, asset, outputs):
+        """Hook exécuté dans le processus principal une fois les variantes stockées"""
+
+
+class TextureStage(ModelStage):
+    name = "textures"
+    compute = staticmethod(transcode_textures)
+    transforms_source = True
+
+    def options(self):
+        return {
+            "max_size": getattr(settings, "MODEL_TEXTURE_MAX_SIZE", 2048),
+            "quality": getattr(settings, "MODEL_TEXTURE_QUALITY", 85),
+            "cache_dir": getattr(settings, "MODEL_TEXTURE_CACHE_DIR", None)
+            or os.path.join(get_staging_dir(), "textures"),
+        }
+
+    def is_done(self, asset):
+        done = (asset.metadata or {}).get("textures", {})
+        return done.get("max_size") == self.options()["max_size"]
+
+    def finalize(self, asset, outputs):
+        if outputs:
+            result = dict(outputs[0]["metadata"])
+        else:
+            result = {"max_size": self.options()["max_size"], "saved": 0, "textures": []}
+        asset.metadata = {**(asset.metadata or {}), "textures": result}
+        asset.save(update_fields=["metadata"])
+
+
+class LodStage(ModelStage):
+    name = "lod"
+    compute = staticmethod(generate_lods)
+
+    def options(self):
+        return {
+            "ratios": getattr(settings, "MODEL_LOD_RATIOS", [0.5, 0.25, 0.1]),
+            "min_triangles": getattr(settings, "MODEL_LOD_MIN_TRIANGLES", 5000),
+        }
+
+    def is_done(self, asset):
+        return "lod" in (asset.metadata or {})
+
+    def finalize(self, asset, outputs):
+        # Mémorisé même sans LOD (modèle trop léger) : l'étape n'est pas rejouée
+        asset.metadata = {
+            **(asset.metadata or {}),
+            "lod": {"levels": [output["metadata"] for output in outputs]},
+        }
+        asset.save(update_fields=["metadata"])
+
+
+class CompressionStage(ModelStage):
+    name = "compression"
+    compute = staticmethod(compress_model)
+
+    def codec(self):
+        return getattr(settings, "MODEL_COMPRESSION_CODEC", "quantize")
+
+    def command(self):
+        return shlex.split(getattr(settings, "MODEL_COMPRESSION_CLI", "npx gltf-transform"))
+
+    def options(self):
+        return {"codec": self.codec(), "command": self.command(), "fallback": True}
+
+    def is_done(self, asset):
+        done = (asset.metadata or {}).get("compression", {})
+        # Un repli sur "quantize" (CLI en échec) n'est pas le codec demandé : rejoué
+        return done.get("requested_codec") == self.codec() and "fallback_reason" not in done
+
+    def finalize(self, asset, outputs):
+        if outputs:
+            result = dict(outputs[0]["metadata"])
+        else:
+            # Déjà compressé ou aucun gain : le modèle source reste servi
+            result = {"codec": None, "original_bytes": asset.file_size, "bytes": None}
+        result["requested_codec"] = self.codec()
+        asset.metadata = {**(asset.metadata or {}), "compression": result}
+        asset.save(update_fields=["metadata"])
+
+
+class ThumbnailStage(ModelStage):
+    name = "thumbnail"
+    compute = staticmethod(render_thumbnail)
+
+    def options(self):
+        return {
+            "size": getattr(settings, "MODEL_THUMBNAIL_SIZE", 256),
+            "quality": getattr(settings, "MODEL_THUMBNAIL_QUALITY", 80),
+        }
+
+    def accepts(self, asset):
+        # Modèles GLB et images (image_plane)
+        return is_glb(asset) or is_image(asset)
+
+    def is_done(self, asset):
+        done = (asset.metadata or {}).get("thumbnail", {})
+        return done.get("size") == self.options()["size"]
+
+    def finalize(self, asset, outputs):
+        result = dict(outputs[0]["metadata"]) if outputs else {"bytes": None}
+        result["size"] = self.options()["size"]
+        asset.metadata = {**(asset.metadata or {}), "thumbnail": result}
+        asset.save(update_fields=["metadata"])
+
+
+STAGES = {
+    stage.name: stage
+    for stage in [TextureStage(), LodStage(), CompressionStage(), ThumbnailStage()]
+}
+
+
+def get_enabled_stages():
+    names = getattr(
+        settings, "MODEL_PROCESSING_STAGES", ["textures", "lod", "compression", "thumbnail"]
+    )
+    return [STAGES[name] for name in names if name in STAGES]
+
+
+@checks.register()
+def check_compression_codec(app_configs, **kwargs):
+    stage = STAGES["compression"]
+    codec = stage.codec()
+    if codec not in CODECS:
+        return [
+            checks.Error(
+                f"MODEL_COMPRESSION_CODEC inconnu : {codec!r}",
+                hint=f"Valeurs possibles : {', '.join(CODECS)}",
+                id="Base_threlte_dv.E001",
+            )
+        ]
+    enabled = getattr(settings, "MODEL_PROCESSING", True) and stage in get_enabled_stages()
+    command = stage.command()
+    if enabled and codec in CLI_CODECS and not (command and shutil.which(command[0])):
+        return [
+            checks.Warning(
+                f"Codec {codec!r} demandé mais MODEL_COMPRESSION_CLI ({' '.join(command)}) "
+                "est introuvable : les modèles seront seulement quantifiés.",
+                hint="Installer @gltf-transform/cli ou MODEL_COMPRESSION_CODEC=quantize",
+                id="Base_threlte_dv.W002",
+            )
+        ]
+    return []
+
+
+def pending_stages(asset, stages, force=False):
+    """Étapes applicables à l'asset et pas encore effectuées (toutes si force)"""
+    return [
+        stage
+        for stage in stages
+        if stage.accepts(asset) and (force or not stage.is_done(asset))
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_processing_pool():
+    executor_path = getattr(
+        settings, "MODEL_PROCESSING_EXECUTOR", "concurrent.futures.ProcessPoolExecutor"
+    )
+    workers = getattr(settings, "MODEL_PROCESSING_WORKERS", 2)
+    executor_class = import_string(executor_path)
+    if issubclass(executor_class, ProcessPoolExecutor):
+        # "spawn" : pas de fork d'un serveur multi-threadé
+        return executor_class(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return executor_class(max_workers=workers)
+
+
+@receiver(setting_changed)
+def reset_processing_pool(setting, **kwargs):
+    if setting in ("MODEL_PROCESSING_EXECUTOR", "MODEL_PROCESSING_WORKERS"):
+        get_processing_pool.cache_clear()
+
+
+def variant_key(source_hash, variant, extension="glb"):
+    return f"{MODELS_FOLDER}/variants/{source_hash}-{variant}.{extension}"
+
+
+def download_to_staging(asset):
+    """Télécharge le fichier d'un asset dans le staging (flux du backend, par blocs)"""
+    ext = os.path.splitext((asset.file_name or asset.url).split("?")[0])[1].lower()
+    fd, path = tempfile.mkstemp(suffix=ext, dir=get_staging_dir())
+    os.close(fd)
+    try:
+        backend_for_asset(asset).download(asset.public_id, path, asset.asset_type or "raw")
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def is_glb(asset):
+    return asset.format == "glb" or model_format(asset.file_name or asset.url) == "glb"
+
+
+def is_image(asset):
+    return asset.asset_type == "image" or asset.format in IMAGE_FORMATS
+
+
+def store_variant(asset, source_hash, stage, output):
+    """Envoie une variante au stockage et l'enregistre comme asset frère"""
+    output_format = output.get("format", "glb")
+    resource_type = "raw" if output_format == "glb" else "image"
+    key = variant_key(source_hash, output["variant"], output_format)
+    backend = get_storage_backend()
+    cancel_remote_deletions(backend.name, [key])
+    result = backend.put(output["path"], key, resource_type=resource_type)
+    metadata = {stage.name: output["metadata"]}
+    stats = inspect_model(output["path"]) if output_format == "glb" else None
+    if stats is not None:
+        metadata["model"] = stats
+    variant, _ = CloudinaryAsset.objects.update_or_create(
+        source=asset,
+        variant=output["variant"],
+        defaults={
+            "public_id": result["key"],
+            "url": result["url"],
+            "asset_type": resource_type,
+            "file_name": os.path.basename(key),
+            "format": output_format,
+            "file_size": result.get("bytes"),
+            "metadata": metadata,
+        },
+    )
+    return variant
+
+
+def process_model_asset(asset_id, source_path=None, stages=None, force=False):
+    """
+    Exécute les étapes d'ingestion sur un asset (source locale si fournie,
+    sinon téléchargée). Retourne {nom d'étape: nombre de variantes produites}.
+
+    Une étape qui transforme le fichier (textures) alimente les suivantes ;
+    si elle produit un nouveau fichier, les étapes suivantes sont rejouées.
+    """
+    asset = CloudinaryAsset.objects.filter(pk=asset_id, source__isnull=True).first()
+    if asset is None:
+        return {}
+
+    stages = [stage for stage in stages or get_enabled_stages() if stage.accepts(asset)]
+    pending = pending_stages(asset, stages, force)
+    if not pending:
+        return {}
+
+    # Étape de transformation déjà faite et non rejouée : on repart de sa variante
+    working_asset = asset
+    for stage in stages:
+        if stage.transforms_source and stage not in pending:
+            variant = asset.variants.filter(variant=stage.name).first()
+            if variant is not None:
+                working_asset = variant
+                source_path = None
+
+    downloaded = source_path is None
+    if downloaded:
+        source_path = download_to_staging(working_asset)
+    output_dir = tempfile.mkdtemp(dir=get_staging_dir())
+    results = {}
+    try:
+        source_hash = asset.content_hash or hash_file(source_path)
+        pool = get_processing_pool()
+        working_path = source_path
+        changed = False
+        # Variantes et métadonnées écrites par les étapes : une seule
+        # republication des géométries liées (voir scene_version)
+        with coalesce_asset_changes():
+            for stage in stages:
+                if stage not in pending and not changed:
+                    continue
+                stage_dir = os.path.join(output_dir, stage.name)
+                os.makedirs(stage_dir, exist_ok=True)
+                try:
+                    outputs = pool.submit(
+                        stage.compute, working_path, stage_dir, stage.options()
+                    ).result()
+                except Exception as e:
+                    logger.error(
+                        f"❌ Étape {stage.name} échouée pour {asset.public_id}: {str(e)}",
+                        exc_info=True,
+                    )
+                    continue
+
+                for output in outputs:
+                    store_variant(asset, source_hash, stage, output)
+                stage.finalize(asset, outputs)
+                results[stage.name] = len(outputs)
+                logger.info(
+                    f"✅ Étape {stage.name}: {len(outputs)} variantes pour {asset.public_id}"
+                )
+
+                if stage.transforms_source and outputs:
+                    working_path = outputs[0]["path"]
+                    changed = True
+
+        return results
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        if downloaded and os.path.exists(source_path):
+            os.remove(source_path)
+
+
+def schedule_model_processing(asset_id):
+    """Planifie les étapes d'ingestion après le commit (asset téléchargé)"""
+    if not getattr(settings, "MODEL_PROCESSING", True):
+        return
+    transaction.on_commit(lambda: submit_task(process_model_asset, asset_id))
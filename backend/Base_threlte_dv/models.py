@@ -1,8 +1,10 @@
 import random
+import uuid
 import cloudinary  # Added import for cloudinary
 from cloudinary_storage.storage import RawMediaCloudinaryStorage
 
 from django.db import models
+from django.utils import timezone
 
 from .dv_config import TYPE_CHOICES
 
@@ -18,7 +20,25 @@ def get_default_scale():
     return {"x": 1.0, "y": 1.0, "z": 1.0}
 
 
+def position_coordinates(position):
+    """(x, y, z) numériques d'une position JSON ; valeur manquante ou invalide -> 0.0"""
+    coordinates = []
+    for axis in ("x", "y", "z"):
+        try:
+            value = float((position or {}).get(axis, 0.0))
+        except (AttributeError, TypeError, ValueError):
+            value = 0.0
+        coordinates.append(value if value == value else 0.0)  # NaN -> 0.0
+    return tuple(coordinates)
+
+
 class Geometry(models.Model):
+    UPLOAD_READY = "ready"
+    UPLOAD_PENDING = "pending"
+    UPLOAD_FAILED = "failed"
+    # Copies numériques de `position`, indexées pour les requêtes spatiales
+    POSITION_COLUMNS = ("position_x", "position_y", "position_z")
+
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default="box")
     name = models.CharField(max_length=45, blank=True)
 
@@ -28,6 +48,14 @@ class Geometry(models.Model):
         null=True,
         help_text="URL du modèle 3D sur Cloudinary",
     )
+    asset = models.ForeignKey(
+        "CloudinaryAsset",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="geometries",
+        help_text="Fichier stocké associé (taille, format, hash)",
+    )
 
     # Type de fichier 3D ou Image
     model_type = models.CharField(
@@ -46,10 +74,24 @@ class Geometry(models.Model):
     position = models.JSONField(default=get_default_position)
     rotation = models.JSONField(default=get_default_rotation)
     scale = models.JSONField(default=get_default_scale) # Added scale field
+    position_x = models.FloatField(default=0.0, editable=False)
+    position_y = models.FloatField(default=0.0, editable=False)
+    position_z = models.FloatField(default=0.0, editable=False)
     color = models.CharField(max_length=7, blank=True, default="#000000")  # Couleur
     visible = models.BooleanField(
         default=True, help_text="Activer/Désactiver l'affichage de la géométrie"
     )
+    upload_status = models.CharField(
+        max_length=10,
+        choices=[
+            (UPLOAD_READY, "Prêt"),
+            (UPLOAD_PENDING, "En cours d'upload"),
+            (UPLOAD_FAILED, "Échec de l'upload"),
+        ],
+        default=UPLOAD_READY,
+        help_text="État de l'upload asynchrone du fichier associé",
+    )
+    upload_error = models.TextField(blank=True, default="")
 
     def clean(self):
         if self.color and not str(self.color).startswith("#"):
@@ -61,8 +103,103 @@ class Geometry(models.Model):
     def format_rotation(self, x, y, z):
         self.rotation = {"x": x, "y": y, "z": z}
 
+    def sync_position_columns(self):
+        """Recopie `position` dans les colonnes indexées (à faire avant bulk_update)"""
+        self.position_x, self.position_y, self.position_z = position_coordinates(self.position)
+
+    def save(self, *args, **kwargs):
+        self.sync_position_columns()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "position" in update_fields:
+            kwargs["update_fields"] = [*update_fields, *self.POSITION_COLUMNS]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ["-id"]  # Orden par défaut pour éviter les warnings de pagination
+        indexes = [
+            models.Index(
+                fields=["position_x", "position_y", "position_z"],
+                name="geometry_position_idx",
+            )
+        ]
+
+
+class SceneState(models.Model):
+    """
+    Compteur de version de la scène (ligne unique).
+    Incrémenté à chaque écriture de Geometry, il sert d'ETag pour la liste.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+    compacted_version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Les changements jusqu'à cette version ont été purgés du journal",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Scene v{self.version}"
+
+
+class GeometryChange(models.Model):
+    """
+    Journal des modifications de la scène, utilisé pour la synchronisation
+    différentielle (/api/geometries/changes/?since=<version>).
+    """
+
+    ACTION_UPSERT = "upsert"
+    ACTION_DELETE = "delete"
+
+    version = models.PositiveBigIntegerField(db_index=True)
+    # Pas de ForeignKey : les suppressions (tombstones) doivent survivre à la géométrie
+    geometry_id = models.PositiveBigIntegerField()
+    action = models.CharField(
+        max_length=10,
+        choices=[(ACTION_UPSERT, "Upsert"), (ACTION_DELETE, "Delete")],
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["version", "id"]
+
+    def __str__(self):
+        return f"v{self.version} {self.action} #{self.geometry_id}"
+
+
+class UploadSession(models.Model):
+    """
+    Upload découpé en morceaux (reprise possible après interruption).
+    Les morceaux sont écrits directement dans le fichier de staging ;
+    le CRC32 glissant est tenu à jour au fil des morceaux reçus.
+    """
+
+    STATUS_OPEN = "open"
+    STATUS_COMPLETE = "complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField(help_text="Taille annoncée en octets")
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    crc32 = models.PositiveBigIntegerField(
+        default=0, help_text="CRC32 glissant des octets reçus"
+    )
+    staged_path = models.CharField(max_length=1024)
+    status = models.CharField(
+        max_length=10,
+        choices=[(STATUS_OPEN, "Ouvert"), (STATUS_COMPLETE, "Terminé")],
+        default=STATUS_OPEN,
+    )
+    geometry = models.ForeignKey(
+        Geometry, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
 
 
 class BlobLog(models.Model):
@@ -108,18 +245,95 @@ class CloudinaryAsset(models.Model):
     file_size = models.PositiveIntegerField(
         null=True, blank=True, help_text="Taille du fichier en octets"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="SHA-256 du contenu (déduplication des uploads)",
+    )
     tags = models.JSONField(
         default=list, blank=True, help_text="Tags associés à l'asset"
     )
     metadata = models.JSONField(
         default=dict, blank=True, help_text="Métadonnées additionnelles de Cloudinary"
     )
+    # Variantes produites à l'ingestion (LOD, etc.) : assets frères du fichier source
+    source = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="variants",
+        help_text="Asset source dont celui-ci est une variante",
+    )
+    variant = models.CharField(
+        max_length=20, blank=True, default="", help_text="Nom de la variante (ex: lod1)"
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-uploaded_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "variant"],
+                condition=models.Q(source__isnull=False),
+                name="unique_asset_variant",
+            )
+        ]
         verbose_name = "Cloudinary Asset"
         verbose_name_plural = "Cloudinary Assets"
 
     def __str__(self):
-        return str(self.file_name or self.public_id)
\ No newline at end of file
+        return str(self.file_name or self.public_id)
+
+
+class CloudinarySyncState(models.Model):
+    """High-water mark de la synchronisation Cloudinary, par type de ressource"""
+
+    resource_type = models.CharField(max_length=20, primary_key=True)
+    last_created_at = models.DateTimeField(
+        null=True, blank=True, help_text="created_at du dernier asset synchronisé"
+    )
+    last_count = models.PositiveIntegerField(default=0)
+    last_synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.resource_type} (≥ {self.last_created_at})"
+
+
+class RemoteDeletion(models.Model):
+    """
+    Outbox des suppressions de fichiers distants (Cloudinary, B2...).
+    La ligne est écrite dans la même transaction que la suppression en base ;
+    le reaper supprime ensuite les fichiers par lots, hors transaction.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    backend = models.CharField(max_length=20, help_text="Nom du backend de stockage")
+    resource_type = models.CharField(max_length=20, default="raw")
+    key = models.CharField(max_length=255, help_text="public_id / clé de l'objet")
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (STATUS_PENDING, "En attente"),
+            (STATUS_DONE, "Supprimé"),
+            (STATUS_FAILED, "Abandonné"),
+        ],
+        default=STATUS_PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["next_attempt_at", "id"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.backend}:{self.key} ({self.status})"
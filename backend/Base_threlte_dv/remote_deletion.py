@@ -0,0 +1,310 @@
+"""
+Suppression différée des fichiers distants (transactional outbox).
+
+`destroy` ne fait plus d'appel réseau dans la transaction : il enregistre une
+ligne RemoteDeletion à côté de la suppression en base (`release_asset`, aussi
+utilisé quand le fichier d'une géométrie est remplacé), puis le reaper
+(déclenché après le commit, ou par la commande `reap_remote_deletions`)
+supprime les fichiers par lots :
+
+- Cloudinary : `delete_resources` (100 public_id par appel) ;
+- B2 / S3 : `DeleteObjects` (1000 clés par requête) ;
+
+Les lignes dues sont réservées par un bail (next_attempt_at repoussé), ce
+qui permet à plusieurs reapers de se partager la file. En cas d'échec, la
+ligne est retentée avec un délai exponentiel, puis abandonnée ("failed")
+après REMOTE_DELETE_MAX_ATTEMPTS essais. Après chaque passage, un Timer
+(`reap_timer`) relance le reaper à la prochaine échéance (nouvelle tentative
+ou bail expiré) ; après un redémarrage, les reprises attendent la prochaine
+suppression ou la commande. Une clé absente côté stockage compte comme
+supprimée.
+
+Aucune transaction n'est ouverte pendant les appels au stockage : les lignes
+sont réservées (bail) dans une transaction courte, supprimées côté stockage,
+puis marquées supprimées ou reprogrammées dans une seconde transaction courte.
+
+Clés réutilisées (même contenu ré-uploadé) : avant d'écrire une clé, l'upload
+annule les suppressions en attente de cette clé (`cancel_remote_deletions`).
+Juste avant l'appel au stockage, le reaper écarte les lignes annulées et les
+clés de nouveau référencées par un CloudinaryAsset ; après l'appel, il ne
+marque que les lignes encore en attente. Une annulation survenue pendant
+l'appel lui-même est signalée (le fichier ré-uploadé a pu être supprimé).
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CloudinaryAsset, RemoteDeletion
+from .storage_backends import backend_name_for_url, get_backend_by_name
+from .storage_metrics import blob_metrics
+from .upload_pipeline import submit_task
+
+logger = logging.getLogger(__name__)
+
+REAP_BATCH_SIZE = 500
+# Durée de réservation d'une ligne pendant l'appel au stockage
+LEASE_SECONDS = 300
+
+
+def get_max_attempts():
+    return getattr(settings, "REMOTE_DELETE_MAX_ATTEMPTS", 5)
+
+
+def get_retry_delay(attempts):
+    base = getattr(settings, "REMOTE_DELETE_RETRY_DELAY", 30)
+    return timedelta(seconds=base * 2 ** max(attempts - 1, 0))
+
+
+def enqueue_remote_deletion(asset):
+    """
+    Enregistre la suppression du fichier d'un asset (à appeler dans la
+    transaction qui supprime l'asset) et planifie le reaper après le commit.
+    """
+    deletion, created = RemoteDeletion.objects.get_or_create(
+        backend=backend_name_for_url(asset.url),
+        resource_type=asset.asset_type or "raw",
+        key=asset.public_id,
+        status=RemoteDeletion.STATUS_PENDING,
+    )
+    if created:
+        transaction.on_commit(schedule_reaper)
+    return deletion
+
+
+def release_asset(asset, geometry=None):
+    """
+    Supprime un asset qui n'est plus référencé (hors `geometry`) et planifie
+    la suppression distante de son fichier et de ses variantes (LOD...).
+    À appeler dans la transaction qui détache ou supprime la géométrie ;
+    retourne False si l'asset est encore partagé (déduplication).
+    """
+    others = asset.geometries.all()
+    if geometry is not None:
+        others = others.exclude(pk=geometry.pk)
+    if others.exists():
+        return False
+    for variant in asset.variants.all():
+        enqueue_remote_deletion(variant)
+    enqueue_remote_deletion(asset)
+    asset.delete()
+    return True
+
+
+def schedule_reaper():
+    submit_task(reap_remote_deletions)
+
+
+def cancel_remote_deletions(backend_name, keys):
+    """
+    À appeler avant d'écrire `keys` sur le backend : annule leurs suppressions
+    en attente (le reaper ne supprime plus une ligne annulée).
+    """
+    with transaction.atomic():
+        cancelled = RemoteDeletion.objects.filter(
+            backend=backend_name, key__in=list(keys), status=RemoteDeletion.STATUS_PENDING
+        ).update(
+            status=RemoteDeletion.STATUS_DONE,
+            last_error="Annulée : clé de nouveau utilisée",
+            updated_at=timezone.now(),
+        )
+    if cancelled:
+        logger.info(f"♻️ {cancelled} suppression(s) distante(s) annulée(s) : clé réutilisée")
+    return cancelled
+
+
+class ReapTimer:
+    """Relance le reaper à la prochaine échéance de la file (un Timer par processus)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+        self.due = None
+
+    def arm(self, due):
+        if not getattr(settings, "REMOTE_DELETE_RETRY_TIMER", True):
+            return
+        with self._lock:
+            if self._timer is not None and self.due <= due:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            delay = max((due - timezone.now()).total_seconds(), 0.0)
+            self.due = due
+            self._timer = threading.Timer(delay, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+            self.due = None
+        schedule_reaper()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self.due = None
+
+
+reap_timer = ReapTimer()
+
+
+def schedule_next_reap():
+    """Arme le Timer sur la prochaine ligne en attente ; retourne son échéance"""
+    due = (
+        RemoteDeletion.objects.filter(status=RemoteDeletion.STATUS_PENDING)
+        .order_by("next_attempt_at")
+        .values_list("next_attempt_at", flat=True)
+        .first()
+    )
+    if due is not None:
+        reap_timer.arm(due)
+    return due
+
+
+def claim_due_deletions(limit=REAP_BATCH_SIZE):
+    """Réserve les lignes dues (bail) et les retourne, sans garder de verrou"""
+    now = timezone.now()
+    with transaction.atomic():
+        deletions = list(
+            RemoteDeletion.objects.select_for_update(skip_locked=True)
+            .filter(status=RemoteDeletion.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if deletions:
+            RemoteDeletion.objects.filter(pk__in=[d.pk for d in deletions]).update(
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+                attempts=F("attempts") + 1,
+            )
+            for deletion in deletions:
+                deletion.attempts += 1
+    return deletions
+
+
+def reap_remote_deletions(limit=REAP_BATCH_SIZE):
+    """
+    Supprime les fichiers distants en attente, groupés par (backend, type).
+    Retourne {"deleted", "retried", "failed", "skipped", "conflicts"}.
+    """
+    try:
+        return _reap(limit)
+    finally:
+        schedule_next_reap()
+
+
+def _reap(limit):
+    stats = {"deleted": 0, "retried": 0, "failed": 0, "skipped": 0, "conflicts": 0}
+    deletions = claim_due_deletions(limit)
+    if not deletions:
+        return stats
+
+    groups = defaultdict(list)
+    for deletion in deletions:
+        groups[(deletion.backend, deletion.resource_type)].append(deletion)
+
+    for (backend_name, resource_type), group in groups.items():
+        group, skipped_ids = _still_deletable(group)
+        if skipped_ids:
+            _mark_done(skipped_ids)
+            stats["skipped"] += len(skipped_ids)
+        if group:
+            # Appel réseau hors de toute transaction
+            deleted_keys, error = _delete_keys(backend_name, resource_type, group)
+            _record_results(group, deleted_keys, error, stats)
+
+    logger.info(
+        f"🗑️ Suppressions distantes: {stats['deleted']} supprimées, "
+        f"{stats['retried']} à retenter, {stats['failed']} abandonnées"
+    )
+    return stats
+
+
+def _still_deletable(group):
+    """
+    Écarte les lignes annulées depuis la réservation et celles dont la clé est
+    de nouveau référencée. Retourne (lignes à supprimer, pk à marquer faites).
+    """
+    pending = set(
+        RemoteDeletion.objects.filter(
+            pk__in=[d.pk for d in group], status=RemoteDeletion.STATUS_PENDING
+        ).values_list("pk", flat=True)
+    )
+    group = [d for d in group if d.pk in pending]
+    reused = set(
+        CloudinaryAsset.objects.filter(public_id__in=[d.key for d in group]).values_list(
+            "public_id", flat=True
+        )
+    )
+    skipped_ids = [d.pk for d in group if d.key in reused]
+    return [d for d in group if d.key not in reused], skipped_ids
+
+
+def _mark_done(pks):
+    RemoteDeletion.objects.filter(pk__in=pks, status=RemoteDeletion.STATUS_PENDING).update(
+        status=RemoteDeletion.STATUS_DONE, updated_at=timezone.now()
+    )
+
+
+def _delete_keys(backend_name, resource_type, to_delete):
+    """Suppression groupée côté stockage ; retourne (clés supprimées, erreur)"""
+    # Nouvelle tentative d'une ligne déjà essayée : compte comme retry
+    blob_metrics.record_retries(
+        backend_name, "delete", sum(1 for d in to_delete if d.attempts > 1)
+    )
+    try:
+        deleted_keys = get_backend_by_name(backend_name).delete_many(
+            [d.key for d in to_delete], resource_type=resource_type
+        )
+        return deleted_keys, "Non supprimé par le stockage"
+    except Exception as e:
+        logger.error(
+            f"❌ Suppression groupée échouée ({backend_name}/{resource_type}): {str(e)}"
+        )
+        return set(), str(e)[:1000]
+
+
+def _record_results(to_delete, deleted_keys, error, stats):
+    """Marque les lignes supprimées ou les reprogramme (transaction courte)"""
+    with transaction.atomic():
+        # Seules les lignes encore en attente sont mises à jour
+        pending = set(
+            RemoteDeletion.objects.select_for_update()
+            .filter(pk__in=[d.pk for d in to_delete], status=RemoteDeletion.STATUS_PENDING)
+            .values_list("pk", flat=True)
+        )
+        done_ids = []
+        for deletion in to_delete:
+            if deletion.pk not in pending:
+                if deletion.key in deleted_keys:
+                    # Annulée pendant l'appel : un upload concurrent a réutilisé la clé
+                    stats["conflicts"] += 1
+                    logger.error(
+                        f"❌ Clé {deletion.key} réutilisée pendant sa suppression : "
+                        "fichier à vérifier"
+                    )
+                continue
+            if deletion.key in deleted_keys:
+                done_ids.append(deletion.pk)
+                continue
+            deletion.last_error = error
+            if deletion.attempts >= get_max_attempts():
+                deletion.status = RemoteDeletion.STATUS_FAILED
+                stats["failed"] += 1
+                logger.error(f"❌ Abandon de la suppression de {deletion.key}: {error}")
+            else:
+                deletion.next_attempt_at = timezone.now() + get_retry_delay(deletion.attempts)
+                stats["retried"] += 1
+            deletion.save(
+                update_fields=["status", "last_error", "next_attempt_at", "updated_at"]
+            )
+        _mark_done(done_ids)
+    stats["deleted"] += len(done_ids)
@@ -0,0 +1,292 @@
+"""
+Canal de diffusion en direct des modifications de la scène (Server-Sent Events).
+
+Les écritures de Geometry publient un événement (created/updated/visibility/deleted)
+sur un broker. Chaque abonné SSE reçoit les événements regroupés par géométrie
+sur une courte fenêtre : un objet déplacé en continu n'envoie que sa dernière position.
+
+Le broker est configurable via le setting SCENE_EVENT_BROKER (chemin d'import) :
+- InProcessBroker (défaut) : en mémoire, n'atteint que les abonnés du processus
+  qui a écrit ; réservé à un seul worker (avertissement sinon) ;
+- PostgresNotifyBroker : NOTIFY à chaque événement, un thread LISTEN par
+  processus redistribue aux abonnés locaux. Fonctionne avec plusieurs workers
+  et processus (commandes, workers d'upload) ; nécessite une connexion
+  PostgreSQL directe (pas un pooler en mode transaction).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENT_CREATED = "created"
+EVENT_UPDATED = "updated"
+EVENT_VISIBILITY = "visibility"
+EVENT_DELETED = "deleted"
+
+
+class Subscription:
+    """File d'attente d'un abonné, liée à la boucle asyncio de sa requête"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def push(self, event):
+        """Fusionne l'événement avec celui déjà en attente pour la même géométrie"""
+        previous = self.pending.pop(event["id"], None)
+        if previous is not None and event["type"] != EVENT_DELETED:
+            if previous["type"] == EVENT_CREATED:
+                # Créée puis modifiée dans la fenêtre : reste une création
+                event = {**event, "type": EVENT_CREATED}
+            elif previous["type"] == EVENT_DELETED:
+                event = {**event, "type": EVENT_CREATED}
+        self.pending[event["id"]] = event
+        self.ready.set()
+
+    async def next_batch(self, window, timeout):
+        """
+        Attend au plus `timeout` secondes un événement, puis laisse `window` secondes
+        aux modifications suivantes pour être fusionnées. Retourne [] si rien n'est arrivé.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if window:
+            await asyncio.sleep(window)
+        events = list(self.pending.values())
+        self.pending = {}
+        self.ready.clear()
+        return events
+
+
+class InProcessBroker:
+    """Broker en mémoire : diffuse aux abonnés du processus courant"""
+
+    # Les événements n'atteignent pas les abonnés des autres processus
+    cross_process = False
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Appelable depuis n'importe quel thread (vues WSGI/sync, signaux)"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Boucle fermée : client parti sans désabonnement
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+
+class PostgresNotifyBroker(InProcessBroker):
+    """
+    Broker multi-processus : `publish` envoie un NOTIFY (après le commit, comme
+    tout événement) ; dans chaque processus ayant des abonnés, un thread LISTEN
+    reçoit les événements de tous les processus et les diffuse localement.
+    """
+
+    cross_process = True
+    channel = "dv_scene_events"
+    # Limite de NOTIFY : 8000 octets par message
+    max_payload = 7900
+    reconnect_delay = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self):
+        self._ensure_listener()
+        return super().subscribe()
+
+    def publish(self, event):
+        payload = json.dumps(event, default=str)
+        if len(payload.encode()) > self.max_payload:
+            # Géométrie trop volumineuse : le client la relit via /changes/?since=
+            payload = json.dumps({**event, "geometry": None, "truncated": True}, default=str)
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def deliver(self, event):
+        """Diffusion aux abonnés du processus (thread LISTEN)"""
+        super().publish(event)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="scene-events-listen", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            # Connexion dédiée, hors du pool de Django
+            wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                wrapper.ensure_connection()
+                raw = wrapper.connection
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                logger.info(f"📡 Écoute des événements de scène (LISTEN {self.channel})")
+                while True:
+                    if not select.select([raw], [], [], 60)[0]:
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        notify = raw.notifies.pop(0)
+                        try:
+                            event = json.loads(notify.payload)
+                        except ValueError:
+                            continue
+                        self.deliver(event)
+            except Exception as e:
+                logger.error(f"❌ Écoute des événements de scène interrompue: {str(e)}")
+                time.sleep(self.reconnect_delay)
+            finally:
+                wrapper.close()
+
+
+def web_concurrency():
+    """Nombre de workers annoncé par l'environnement (gunicorn/uvicorn: WEB_CONCURRENCY)"""
+    try:
+        return int(os.environ.get("WEB_CONCURRENCY", "1"))
+    except ValueError:
+        return 1
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_path = getattr(
+        settings,
+        "SCENE_EVENT_BROKER",
+        "backend.Base_threlte_dv.scene_events.InProcessBroker",
+    )
+    broker = import_string(broker_path)()
+    if not getattr(broker, "cross_process", True) and web_concurrency() > 1:
+        logger.warning(
+            f"⚠️ SCENE_EVENT_BROKER en mémoire avec {web_concurrency()} workers : "
+            "les abonnés SSE ne reçoivent que les écritures de leur propre worker "
+            "(utiliser PostgresNotifyBroker)"
+        )
+    return broker
+
+
+@checks.register(checks.Tags.compatibility)
+def check_scene_event_broker(app_configs, **kwargs):
+    broker_path = getattr(settings, "SCENE_EVENT_BROKER", "")
+    if broker_path.endswith(".InProcessBroker") and web_concurrency() > 1:
+        return [
+            checks.Warning(
+                "SCENE_EVENT_BROKER en mémoire avec plusieurs workers (WEB_CONCURRENCY > 1) : "
+                "les événements SSE n'atteignent que les abonnés du worker qui a écrit.",
+                hint="SCENE_EVENT_BROKER=backend.Base_threlte_dv.scene_events.PostgresNotifyBroker",
+                id="Base_threlte_dv.W001",
+            )
+        ]
+    return []
+
+
+def geometry_event_type(created, update_fields):
+    if created:
+        return EVENT_CREATED
+    if update_fields and set(update_fields) == {"visible"}:
+        return EVENT_VISIBILITY
+    return EVENT_UPDATED
+
+
+def publish_geometry_event(event_type, geometry_id, version, geometry=None):
+    """Publie un événement après le commit de la transaction en cours"""
+    broker = get_broker()
+    # Pas d'abonné local : inutile de sérialiser (sauf broker multi-processus)
+    if not getattr(broker, "cross_process", True) and not broker.subscriber_count:
+        return
+
+    data = None
+    if geometry is not None and event_type != EVENT_DELETED:
+        from .serializers import GeometrySerializer
+
+        data = GeometrySerializer(geometry).data
+
+    event = {"type": event_type, "id": geometry_id, "version": version, "geometry": data}
+    transaction.on_commit(lambda: broker.publish(event))
+
+
+def format_sse(event, name="geometry", event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def scene_events_stream(request):
+    """
+    GET /api/geometries/events/ : flux SSE des modifications de la scène.
+    Nécessite un serveur ASGI (backend.asgi:application).
+    Le premier message "hello" donne la version courante ; un client en retard
+    rattrape l'écart via /api/geometries/changes/?since=<version>.
+    """
+    from .scene_version import get_scene_version
+
+    broker = get_broker()
+    subscription = broker.subscribe()
+    version = await sync_to_async(get_scene_version)()
+    window = getattr(settings, "SCENE_EVENTS_COALESCE_WINDOW", 0.1)
+    heartbeat = getattr(settings, "SCENE_EVENTS_HEARTBEAT", 15)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            yield format_sse({"version": version}, name="hello", event_id=version)
+            while True:
+                events = await subscription.next_batch(window, heartbeat)
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    yield format_sse(event, event_id=event["version"])
+        finally:
+            broker.unsubscribe(subscription)
+            logger.debug("Abonné SSE déconnecté")
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,276 @@
+"""
+Versionnement de la scène.
+
+Un compteur global (SceneState) est incrémenté à chaque écriture de Geometry.
+La liste sérialisée des géométries est mise en cache par version, ce qui permet
+de répondre 304 aux clients qui envoient un If-None-Match à jour sans scanner
+la table Geometry.
+
+Chaque incrément est aussi inscrit dans le journal GeometryChange, ce qui permet
+aux clients de ne récupérer que les géométries modifiées depuis une version.
+
+Les données servies avec une géométrie dépendent aussi de son asset
+(statistiques, compression, textures, LOD, vignette, URL servie) : toute
+écriture d'un CloudinaryAsset ou d'une de ses variantes republie les
+géométries liées (une seule version par transaction ou par bloc
+`coalesce_asset_changes`).
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.http import parse_etags
+
+from .models import CloudinaryAsset, Geometry, GeometryChange, SceneState
+from .scene_events import (
+    EVENT_DELETED,
+    EVENT_UPDATED,
+    geometry_event_type,
+    publish_geometry_event,
+)
+
+logger = logging.getLogger(__name__)
+
+SCENE_STATE_PK = 1
+SNAPSHOT_CACHE_KEY = "geometries:snapshot:v{version}"
+
+# Assets modifiés dont les géométries restent à republier (par thread)
+_asset_changes = threading.local()
+
+
+def get_scene_version():
+    """Retourne la version courante de la scène (lecture par clé primaire)"""
+    version = (
+        SceneState.objects.filter(pk=SCENE_STATE_PK)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_scene_version():
+    """Incrémente atomiquement la version de la scène et retourne la nouvelle valeur"""
+    with transaction.atomic():
+        updated = SceneState.objects.filter(pk=SCENE_STATE_PK).update(
+            version=F("version") + 1
+        )
+        if not updated:
+            # Ligne normalement créée par la migration 0013
+            SceneState.objects.get_or_create(pk=SCENE_STATE_PK, defaults={"version": 1})
+        return SceneState.objects.values_list("version", flat=True).get(
+            pk=SCENE_STATE_PK
+        )
+
+
+def record_geometry_changes(geometry_ids, action):
+    """
+    Incrémente la version de la scène et inscrit une entrée de journal par géométrie.
+    Une écriture groupée ne produit qu'une seule nouvelle version.
+    """
+    with transaction.atomic():
+        version = bump_scene_version()
+        GeometryChange.objects.bulk_create(
+            [
+                GeometryChange(version=version, geometry_id=geometry_id, action=action)
+                for geometry_id in geometry_ids
+            ]
+        )
+
+    compact_every = getattr(settings, "SCENE_CHANGELOG_COMPACT_EVERY", 100)
+    if compact_every and version % compact_every == 0:
+        compact_changes(version)
+    return version
+
+
+def compact_changes(version=None):
+    """
+    Purge les entrées du journal plus anciennes que SCENE_CHANGELOG_RETENTION versions.
+    Les clients en retard sur la version compactée recevront une resynchronisation complète.
+    """
+    if version is None:
+        version = get_scene_version()
+    threshold = version - getattr(settings, "SCENE_CHANGELOG_RETENTION", 1000)
+    if threshold <= 0:
+        return 0
+
+    with transaction.atomic():
+        deleted, _ = GeometryChange.objects.filter(version__lte=threshold).delete()
+        SceneState.objects.filter(
+            pk=SCENE_STATE_PK, compacted_version__lt=threshold
+        ).update(compacted_version=threshold)
+
+    if deleted:
+        logger.info(f"🧹 Journal de scène compacté jusqu'à v{threshold} ({deleted} entrées)")
+    return deleted
+
+
+def get_changes_since(since):
+    """
+    Retourne (version, upsert_ids, deleted_ids) pour les changements après `since`,
+    ou (version, None, None) si le journal ne couvre plus cette version
+    (compaction ou version inconnue) et qu'une resynchronisation complète est nécessaire.
+    """
+    state = (
+        SceneState.objects.filter(pk=SCENE_STATE_PK)
+        .values("version", "compacted_version")
+        .first()
+    ) or {"version": 0, "compacted_version": 0}
+    version = state["version"]
+
+    if since < state["compacted_version"] or since > version:
+        return version, None, None
+
+    # La dernière action par géométrie l'emporte
+    last_actions = {}
+    for geometry_id, action in GeometryChange.objects.filter(
+        version__gt=since, version__lte=version
+    ).values_list("geometry_id", "action"):
+        last_actions[geometry_id] = action
+
+    upsert_ids = [
+        geometry_id
+        for geometry_id, action in last_actions.items()
+        if action == GeometryChange.ACTION_UPSERT
+    ]
+    deleted_ids = [
+        geometry_id
+        for geometry_id, action in last_actions.items()
+        if action == GeometryChange.ACTION_DELETE
+    ]
+    return version, upsert_ids, deleted_ids
+
+
+def scene_etag(version):
+    return f'"scene-v{version}"'
+
+
+def etag_matches(request, etag):
+    """Vérifie si l'en-tête If-None-Match du client correspond à l'ETag courant"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return "*" in etags or etag in etags
+
+
+def get_scene_snapshot(version, build):
+    """
+    Retourne la liste sérialisée des géométries pour `version`.
+    `build` n'est appelé (requête DB + sérialisation) qu'en cas d'absence du cache.
+    """
+    key = SNAPSHOT_CACHE_KEY.format(version=version)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout=getattr(settings, "SCENE_SNAPSHOT_TTL", 300))
+        logger.debug(f"Snapshot de la scène v{version} reconstruit ({len(data)} géométries)")
+    return data
+
+
+@receiver(post_save, sender=Geometry)
+def geometry_saved(sender, instance, created, update_fields=None, **kwargs):
+    version = record_geometry_changes([instance.pk], GeometryChange.ACTION_UPSERT)
+    publish_geometry_event(
+        geometry_event_type(created, update_fields), instance.pk, version, instance
+    )
+
+
+@receiver(post_delete, sender=Geometry)
+def geometry_deleted(sender, instance, **kwargs):
+    version = record_geometry_changes([instance.pk], GeometryChange.ACTION_DELETE)
+    publish_geometry_event(EVENT_DELETED, instance.pk, version)
+
+
+def _pending_asset_changes():
+    if not hasattr(_asset_changes, "assets"):
+        _asset_changes.assets = set()
+        _asset_changes.geometries = set()
+        _asset_changes.deferred = 0
+    return _asset_changes
+
+
+def schedule_asset_republish(asset_ids=(), geometry_ids=()):
+    """
+    Republie les géométries liées à `asset_ids` (et les géométries
+    `geometry_ids`) après le commit. Les demandes d'une même transaction
+    sont regroupées en une seule version.
+    """
+    pending = _pending_asset_changes()
+    pending.assets.update(asset_ids)
+    pending.geometries.update(geometry_ids)
+    if not pending.deferred:
+        # Les rappels suivants trouvent l'ensemble déjà vidé
+        transaction.on_commit(flush_asset_republish)
+
+
+@contextmanager
+def coalesce_asset_changes():
+    """Regroupe les écritures d'assets du bloc en une seule republication"""
+    pending = _pending_asset_changes()
+    pending.deferred += 1
+    try:
+        yield
+    finally:
+        pending.deferred -= 1
+        if not pending.deferred:
+            transaction.on_commit(flush_asset_republish)
+
+
+def flush_asset_republish():
+    pending = _pending_asset_changes()
+    asset_ids, geometry_ids = pending.assets, pending.geometries
+    if not asset_ids and not geometry_ids:
+        return None
+    pending.assets, pending.geometries = set(), set()
+
+    geometries = list(
+        Geometry.objects.filter(pk__in=geometry_ids).select_related("asset")
+    ) if geometry_ids else []
+    if asset_ids:
+        geometries.extend(
+            Geometry.objects.filter(asset_id__in=asset_ids)
+            .exclude(pk__in=geometry_ids)
+            .select_related("asset")
+        )
+    if not geometries:
+        return None
+
+    with transaction.atomic():
+        version = record_geometry_changes(
+            [geometry.pk for geometry in geometries], GeometryChange.ACTION_UPSERT
+        )
+    for geometry in geometries:
+        publish_geometry_event(EVENT_UPDATED, geometry.pk, version, geometry)
+    return version
+
+
+@receiver(post_save, sender=CloudinaryAsset)
+def asset_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and instance.source_id is None):
+        # Nouvel asset source : aucune géométrie ne le référence encore
+        return
+    schedule_asset_republish(asset_ids=[instance.source_id or instance.pk])
+
+
+@receiver(pre_delete, sender=CloudinaryAsset)
+def asset_deleting(sender, instance, **kwargs):
+    # on_delete=SET_NULL vide Geometry.asset avant post_delete : on note les liens
+    if instance.source_id is None:
+        instance._linked_geometry_ids = list(
+            Geometry.objects.filter(asset_id=instance.pk).values_list("pk", flat=True)
+        )
+
+
+@receiver(post_delete, sender=CloudinaryAsset)
+def asset_deleted(sender, instance, **kwargs):
+    if instance.source_id is not None:
+        schedule_asset_republish(asset_ids=[instance.source_id])
+    else:
+        schedule_asset_republish(geometry_ids=getattr(instance, "_linked_geometry_ids", ()))
@@ -1,25 +1,122 @@
 import json
 import logging
-import cloudinary.uploader
+import math
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from .models import Geometry, CloudinaryAsset
 from .dv_config import TYPE_CHOICES
+from .model_inspection import inspect_model
+from .model_processing import schedule_model_processing
+from .remote_deletion import cancel_remote_deletions, release_asset
+from .storage_backends import get_storage_backend
+from .upload_pipeline import (
+    content_key,
+    discard_staged,
+    find_asset_by_hash,
+    hash_file,
+    hash_uploaded_file,
+    schedule_upload,
+    stage_upload,
+)
 
 logger = logging.getLogger(__name__)
 
+class AssetSummarySerializer(serializers.ModelSerializer):
+    """Métadonnées du fichier associé, exposées dans la liste des géométries"""
+
+    # Statistiques GLB/glTF (sommets, triangles, textures, bbox, octets...) ou null
+    model_stats = serializers.SerializerMethodField()
+    # Codec et tailles avant/après compression, ou null
+    compression = serializers.SerializerMethodField()
+    # Gain par texture après conversion WebP, ou null
+    textures = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CloudinaryAsset
+        fields = [
+            'id', 'public_id', 'asset_type', 'format', 'file_size',
+            'model_stats', 'compression', 'textures'
+        ]
+
+    def get_model_stats(self, obj):
+        return (obj.metadata or {}).get("model")
+
+    def get_compression(self, obj):
+        return (obj.metadata or {}).get("compression")
+
+    def get_textures(self, obj):
+        return (obj.metadata or {}).get("textures")
+
+
 class GeometrySerializer(serializers.ModelSerializer):
     type = serializers.ChoiceField(choices=TYPE_CHOICES, required=False)
     model_type = serializers.CharField(required=False, allow_blank=True)
     color_picker = serializers.CharField(write_only=True, required=False)
     model_file = serializers.FileField(write_only=True, required=False)
+    asset = AssetSummarySerializer(read_only=True)
+    lods = serializers.SerializerMethodField()
+    # Aperçu WebP (quelques Ko) pour les sélecteurs, ou null
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Geometry
         fields = [
             'id', 'name', 'type', 'model_url', 'model_type',
             'position', 'rotation', 'scale', 'color', 'visible',
+            'upload_status', 'upload_error', 'asset', 'lods', 'thumbnail_url',
             'color_picker', 'model_file'
         ]
+        read_only_fields = ['upload_status', 'upload_error']
+
+    def served_variant(self, obj):
+        """
+        Variante servie à la place du modèle source : compressée (Draco/meshopt/
+        quantifiée, textures comprises) sinon textures WebP, si elle existe
+        """
+        if obj.asset is None:
+            return None
+        preferred = ["textures"]
+        if getattr(settings, "MODEL_SERVE_COMPRESSED", True):
+            preferred.insert(0, "compressed")
+        # variants.all() : servi par le prefetch_related de la vue
+        variants = {variant.variant: variant for variant in obj.asset.variants.all()}
+        for name in preferred:
+            if name in variants:
+                return variants[name]
+        return None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        served = self.served_variant(instance)
+        data["original_model_url"] = data.get("model_url")
+        if served is not None:
+            data["model_url"] = served.url
+        return data
+
+    def get_lods(self, obj):
+        """Niveaux de détail, du plus détaillé au plus léger (le modèle source est model_url)"""
+        if obj.asset is None:
+            return []
+        lods = []
+        for variant in obj.asset.variants.all():
+            lod = (variant.metadata or {}).get("lod")
+            if lod:
+                lods.append({
+                    "level": lod["level"],
+                    "url": variant.url,
+                    "triangles": lod["triangles"],
+                    "file_size": variant.file_size,
+                })
+        return sorted(lods, key=lambda lod: lod["level"])
+
+    def get_thumbnail_url(self, obj):
+        if obj.asset is None:
+            return None
+        for variant in obj.asset.variants.all():
+            if variant.variant == "thumbnail":
+                return variant.url
+        return None
 
     def to_internal_value(self, data):
         # Multipart form data (QueryDict) sends everything as strings.
@@ -52,42 +149,110 @@ class GeometrySerializer(serializers.ModelSerializer):
             value = "#" + value
         return value
 
-    def handle_cloudinary_upload(self, model_file, validated_data):
-        filename = model_file.name
+    def classify_upload(self, filename, validated_data):
+        """Déduit type/model_type de l'extension et retourne le resource_type Cloudinary"""
         ext = filename.split('.')[-1].lower()
-        
+
         is_image = ext in ['jpg', 'jpeg', 'png', 'webp', 'gif', 'svg']
-        resource_type = 'image' if is_image else 'raw'
-        folder = "dv-threlte/models"
 
         # Determine model_type and type based on extension
         if is_image:
             validated_data["type"] = "image_plane"
         elif ext in ["glb", "gltf"]:
             validated_data["type"] = "gltf_model"
-        
+
         validated_data["model_type"] = ext
+        return 'image' if is_image else 'raw'
+
+    def upload_async(self, model_file, validated_data):
+        """
+        Copie le fichier dans le staging et marque la géométrie "pending".
+        Retourne la fonction à appeler avec l'id de la Geometry sauvegardée.
+        """
+        staged_path, content_hash = stage_upload(model_file)
+        return self.schedule_staged_upload(
+            staged_path, model_file.name, validated_data, content_hash
+        )
+
+    def schedule_staged_upload(self, staged_path, filename, validated_data, content_hash=None):
+        resource_type = self.classify_upload(filename, validated_data)
+        if content_hash is None:
+            content_hash = hash_file(staged_path)
 
-        upload_result = cloudinary.uploader.upload(
-            model_file,
-            folder=folder,
-            resource_type=resource_type,
-            public_id=filename.split('.')[0],
-            overwrite=True,
-            invalidate=True
+        # Contenu déjà stocké : on réutilise l'asset, sans upload
+        asset = find_asset_by_hash(content_hash)
+        if asset is not None:
+            logger.info(f"♻️ Fichier déjà présent ({content_hash[:12]}): {asset.public_id}")
+            discard_staged(staged_path)
+            validated_data["model_url"] = asset.url
+            validated_data["asset"] = asset
+            validated_data["upload_status"] = Geometry.UPLOAD_READY
+            validated_data["upload_error"] = ""
+            return lambda geometry_id: None
+
+        validated_data["upload_status"] = Geometry.UPLOAD_PENDING
+        validated_data["upload_error"] = ""
+        return lambda geometry_id: schedule_upload(
+            geometry_id, staged_path, filename, resource_type, content_hash
         )
-        return upload_result, resource_type, folder
+
+    def upload_sync(self, model_file, validated_data):
+        """Envoie le fichier au backend de stockage pendant la requête ; retourne l'asset"""
+        filename = model_file.name
+        resource_type = self.classify_upload(filename, validated_data)
+
+        # Clé adressée par contenu : deux fichiers différents ne s'écrasent plus
+        content_hash = hash_uploaded_file(model_file)
+        asset = find_asset_by_hash(content_hash)
+        if asset is not None:
+            logger.info(f"♻️ Fichier déjà présent ({content_hash[:12]}): {asset.public_id}")
+            validated_data["asset"] = asset
+            return asset
+
+        model_stats = inspect_model(model_file, filename)
+        backend = get_storage_backend()
+        cancel_remote_deletions(backend.name, [content_key(content_hash)])
+        result = backend.put(model_file, content_key(content_hash), resource_type=resource_type)
+        asset, _ = CloudinaryAsset.objects.update_or_create(
+            public_id=result["key"],
+            defaults={
+                "url": result["url"],
+                "asset_type": resource_type,
+                "file_name": filename,
+                "format": filename.split('.')[-1].lower(),
+                "file_size": result.get("bytes") or model_file.size,
+                "content_hash": content_hash,
+                **({"metadata": {"model": model_stats}} if model_stats else {}),
+            },
+        )
+        validated_data["asset"] = asset
+        # Upload synchrone : le fichier n'est pas conservé, les étapes le téléchargent
+        schedule_model_processing(asset.pk)
+        return asset
 
     def create(self, validated_data):
         model_file = validated_data.pop("model_file", None)
         color_picker = validated_data.pop("color_picker", None)
+        # (chemin, nom) d'un fichier déjà en staging (upload par morceaux)
+        staged_upload = validated_data.pop("staged_upload", None)
 
         if color_picker:
             validated_data["color"] = color_picker
 
+        if staged_upload:
+            schedule = self.schedule_staged_upload(*staged_upload, validated_data)
+            instance = Geometry.objects.create(**validated_data)
+            schedule(instance.pk)
+            return instance
+
+        if model_file and getattr(settings, "UPLOAD_ASYNC", True):
+            schedule = self.upload_async(model_file, validated_data)
+            instance = Geometry.objects.create(**validated_data)
+            schedule(instance.pk)
+            return instance
+
         if model_file:
-            upload_result, resource_type, folder = self.handle_cloudinary_upload(model_file, validated_data)
-            validated_data["model_url"] = upload_result["secure_url"]
+            validated_data["model_url"] = self.upload_sync(model_file, validated_data).url
 
         return Geometry.objects.create(**validated_data)
 
@@ -95,21 +260,95 @@ class GeometrySerializer(serializers.ModelSerializer):
         model_file = validated_data.pop("model_file", None)
         color_picker = validated_data.pop("color_picker", None)
 
+        # Le client renvoie l'URL servie (variante optimisée) : le source ne change pas
+        served = self.served_variant(instance)
+        if served is not None and validated_data.get("model_url") == served.url:
+            validated_data.pop("model_url")
+
         if color_picker:
             instance.color = color_picker
 
-        if model_file:
-            upload_result, resource_type, folder = self.handle_cloudinary_upload(model_file, validated_data)
-            instance.model_url = upload_result["secure_url"]
+        schedule = None
+        if model_file and getattr(settings, "UPLOAD_ASYNC", True):
+            schedule = self.upload_async(model_file, validated_data)
+        elif model_file:
+            instance.model_url = self.upload_sync(model_file, validated_data).url
             instance.type = validated_data.get("type", instance.type)
             instance.model_type = validated_data.get("model_type", instance.model_type)
 
+        previous = instance.asset
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        
-        instance.save()
+
+        with transaction.atomic():
+            instance.save()
+            # Fichier remplacé (upload synchrone ou contenu dédupliqué) : même
+            # chemin que destroy pour l'ancien asset et ses variantes ; en
+            # asynchrone, process_upload s'en charge à la bascule
+            if previous is not None and previous.pk != instance.asset_id:
+                release_asset(previous, instance)
+        if schedule:
+            schedule(instance.pk)
         return instance
 
+class FiniteFloatField(serializers.FloatField):
+    """FloatField refusant NaN et ±Infinity (dont les dépassements comme 1e400)"""
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail("invalid")
+        return value
+
+
+class Vector3Serializer(serializers.Serializer):
+    """Vecteur {x, y, z} partiel : les axes absents gardent leur valeur actuelle"""
+
+    AXES = ("x", "y", "z")
+
+    x = FiniteFloatField(required=False)
+    y = FiniteFloatField(required=False)
+    z = FiniteFloatField(required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = sorted(set(data) - set(self.AXES))
+            if unknown:
+                raise serializers.ValidationError(
+                    {key: ["Axe inconnu (x, y ou z attendu)"] for key in unknown}
+                )
+        values = dict(super().to_internal_value(data))
+        if not values:
+            raise serializers.ValidationError("Au moins un axe (x, y ou z) attendu")
+        return values
+
+
+class GeometryBulkUpdateSerializer(serializers.Serializer):
+    """Élément d'une mise à jour groupée (PATCH /api/geometries/bulk/)"""
+
+    BULK_FIELDS = ["position", "rotation", "scale", "visible", "color"]
+    # Fusionnés axe par axe avec la valeur existante
+    VECTOR_FIELDS = ("position", "rotation", "scale")
+
+    id = serializers.IntegerField()
+    position = Vector3Serializer(required=False)
+    rotation = Vector3Serializer(required=False)
+    scale = Vector3Serializer(required=False)
+    visible = serializers.BooleanField(required=False)
+    color = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_color(self, value):
+        # Longueur vérifiée après l'ajout du "#" (colonne max_length=7)
+        if value and not value.startswith("#"):
+            value = "#" + value
+        max_length = Geometry._meta.get_field("color").max_length
+        if len(value) > max_length:
+            raise serializers.ValidationError(
+                f"Couleur trop longue ({max_length} caractères maximum, \"#\" compris)"
+            )
+        return value
+
+
 class CloudinaryAssetSerializer(serializers.ModelSerializer):
     class Meta:
         model = CloudinaryAsset
@@ -1,125 +1,143 @@
 """
-Django signals pour synchroniser automatiquement les assets Cloudinary
+Hooks d'événements sur les CloudinaryAsset.
+
+Les receivers sont limités au sender CloudinaryAsset : les autres modèles
+(sessions, admin, taggit, films...) ne passent plus par ces fonctions.
+Chaque création/suppression émet le signal `cloudinary_assets_changed`
+avec la liste des public_id concernés ; les opérations groupées
+(bulk_create/bulk_update de la synchronisation) émettent un seul événement
+pour tout le lot via `emit_assets_changed`.
+
+Les créations et suppressions unitaires sont regroupées par transaction :
+un `queryset.delete()` ou une suppression en cascade (variantes d'un asset)
+envoie post_delete pour chaque ligne, mais un seul événement par action est
+émis au commit. Le lot en cours est gardé dans un état local au thread et
+un seul callback on_commit est inscrit à sa création ; ce callback le retire
+de l'état avant d'émettre.
 """
 
-import os
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-import requests
-import json
+import logging
+import threading
 
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
 
-@receiver(post_save, sender=None)
-def cloudinary_asset_saved(sender, instance, created, **kwargs):
-    """
-    Déclenché quand un CloudinaryAsset est créé ou modifié
-    """
-    if sender.__name__ == "CloudinaryAsset" and created:
-        print(f"✅ Nouvel asset Cloudinary ajouté: {instance.public_id}")
+from .models import CloudinaryAsset
 
+logger = logging.getLogger(__name__)
 
-@receiver(post_delete, sender=None)
-def cloudinary_asset_deleted(sender, instance, **kwargs):
-    """
-    Déclenché quand un CloudinaryAsset est supprimé
-    """
-    if sender.__name__ == "CloudinaryAsset":
-        print(f"🗑️ Asset Cloudinary supprimé: {instance.public_id}")
+ASSET_CREATED = "created"
+ASSET_UPDATED = "updated"
+ASSET_DELETED = "deleted"
 
+# Arguments : action (created/updated/deleted), public_ids (liste)
+cloudinary_assets_changed = Signal()
 
-def sync_cloudinary_assets():
-    """
-    Synchronise manuellement tous les assets Cloudinary avec la base de données
-    """
-    try:
-        # Configuration Cloudinary
-        cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME")
-        api_key = os.environ.get("CLOUDINARY_API_KEY")
-        api_secret = os.environ.get("CLOUDINARY_API_SECRET")
-
-        if not all([cloud_name, api_key, api_secret]):
-            print("❌ Configuration Cloudinary manquante")
-            return False
-
-        # Récupérer tous les assets depuis l'API Cloudinary
-        api_url = f"https://api.cloudinary.com/v1_1/{cloud_name}/resources/image/upload"
-
-        # Utiliser basic auth correctement
-        from requests.auth import HTTPBasicAuth
-
-        response = requests.get(
-            api_url, auth=HTTPBasicAuth(api_key or "", api_secret or "")
-        )
-        if response.status_code != 200:
-            print(f"❌ Erreur API Cloudinary: {response.status_code}")
-            return False
-
-        data = response.json()
-        synced_count = 0
-
-        # Importer le modèle ici pour éviter les problèmes circulaires
-        from .models import CloudinaryAsset
-
-        for asset in data.get("resources", []):
-            # Nettoyer l'URL redondante
-            clean_url = clean_cloudinary_url(asset.get("secure_url", ""))
-
-            cloudinary_asset, created = CloudinaryAsset.objects.update_or_create(
-                public_id=asset["public_id"],
-                defaults={
-                    "asset_id": asset.get("asset_id", ""),
-                    "url": clean_url,
-                    "asset_type": asset.get("resource_type", "raw"),
-                    "file_name": asset.get("original_filename", ""),
-                    "format": asset.get("format", ""),
-                    "file_size": asset.get("bytes", 0),
-                },
-            )
-
-            if created:
-                synced_count += 1
-                print(f"➕ Ajouté: {asset['public_id']}")
-
-        print(f"✅ Synchronisation terminée: {synced_count} nouveaux assets")
-        return True
 
-    except Exception as e:
-        print(f"❌ Erreur synchronisation Cloudinary: {str(e)}")
-        return False
+def emit_assets_changed(action, public_ids):
+    """Émet un événement unique pour un lot d'assets"""
+    public_ids = list(public_ids)
+    if not public_ids:
+        return
+    logger.info(
+        f"cloudinary_asset.{action} count={len(public_ids)}",
+        extra={
+            "event": f"cloudinary_asset.{action}",
+            "count": len(public_ids),
+            "public_ids": public_ids[:50],
+        },
+    )
+    cloudinary_assets_changed.send(
+        sender=CloudinaryAsset, action=action, public_ids=public_ids
+    )
+
+
+# Lot en cours par connexion (les connexions Django sont propres à chaque thread)
+_pending = threading.local()
+
+
+def _pending_batches():
+    if not hasattr(_pending, "batches"):
+        _pending.batches = {}
+    return _pending.batches
 
-    except Exception as e:
-        print(f"❌ Erreur synchronisation Cloudinary: {str(e)}")
-        return False
 
+class PendingAssetEvents:
+    """Événements d'une transaction, émis en une fois par action au commit"""
 
+    def __init__(self, using):
+        self.using = using
+        # Liste des callbacks on_commit au moment de l'inscription du lot
+        self.commit_hooks = None
+        self.public_ids = {}
 
-def clean_cloudinary_url(url):
+    def add(self, action, public_id):
+        self.public_ids.setdefault(action, []).append(public_id)
+
+    def is_pending(self, connection):
+        """
+        Django remplace sa liste de callbacks à chaque commit ou rollback
+        (savepoint compris) : si elle a changé, rien ne garantit que ce lot
+        sera encore émis, un nouveau lot est ouvert.
+        """
+        return connection.run_on_commit is self.commit_hooks
+
+    def __call__(self):
+        batches = _pending_batches()
+        if batches.get(self.using) is self:
+            del batches[self.using]
+        for action, public_ids in self.public_ids.items():
+            emit_assets_changed(action, public_ids)
+
+
+def queue_asset_event(action, public_id, using=DEFAULT_DB_ALIAS):
     """
-    Nettoie les URLs Cloudinary redondantes
-    Transforme: https://res.cloudinary.com/drcok7moc/raw/upload/https:/res.cloudinary.com/drcok7moc/models/hhh_dmydkc.glb
-    En:       /models/hhh_dmydkc.glb
+    Ajoute l'asset à l'événement groupé de la transaction en cours (émis au
+    commit, abandonné avec elle en cas de rollback) ; hors transaction, émet
+    immédiatement.
     """
-    if not url:
-        return url
-
-    # Pattern à détecter et nettoyer
-    redundant_prefix = "https:/res.cloudinary.com/drcok7moc"
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        emit_assets_changed(action, [public_id])
+        return
+    batches = _pending_batches()
+    pending = batches.get(using)
+    if pending is None or not pending.is_pending(connection):
+        pending = PendingAssetEvents(using)
+        transaction.on_commit(pending, using=using)
+        pending.commit_hooks = connection.run_on_commit
+        batches[using] = pending
+    pending.add(action, public_id)
+
+
+@receiver(post_save, sender=CloudinaryAsset)
+def cloudinary_asset_saved(sender, instance, created, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Déclenché quand un CloudinaryAsset est créé ou modifié
+    """
+    if created:
+        queue_asset_event(ASSET_CREATED, instance.public_id, using)
 
-    if redundant_prefix in url:
-        # Extraire la partie après le préfixe redondant
-        parts = url.split(redundant_prefix)
-        if len(parts) > 1:
-            return parts[1]  # Retourne "/models/hhh_dmydkc.glb"
 
-    return url
+@receiver(post_delete, sender=CloudinaryAsset)
+def cloudinary_asset_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Déclenché quand un CloudinaryAsset est supprimé (aussi pour chaque ligne
+    d'un queryset.delete() ou d'une cascade : regroupés par queue_asset_event)
+    """
+    queue_asset_event(ASSET_DELETED, instance.public_id, using)
 
-    # Pattern à détecter et nettoyer
-    redundant_prefix = "https:/res.cloudinary.com/drcok7moc"
 
-    if redundant_prefix in url:
-        # Extraire la partie après le préfixe redondant
-        parts = url.split(redundant_prefix)
-        if len(parts) > 1:
-            return parts[1]  # Retourne "/models/hhh_dmydkc.glb"
+def sync_cloudinary_assets():
+    """
+    Synchronise manuellement tous les assets Cloudinary avec la base de données
+    """
+    from .cloudinary_sync import sync_cloudinary
 
-    return url
+    try:
+        stats = sync_cloudinary(full=True)
+    except Exception as e:
+        logger.error(f"❌ Erreur synchronisation Cloudinary: {str(e)}", exc_info=True)
+        return False
+    return stats is not None
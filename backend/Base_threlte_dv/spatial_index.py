@@ -0,0 +1,245 @@
+"""
+Index spatial des géométries (requêtes par proximité et par boîte).
+
+Les positions sont recopiées dans des colonnes numériques indexées
+(position_x/y/z, voir Geometry.save) ; en mémoire, une grille uniforme
+(cellules de SPATIAL_GRID_CELL_SIZE unités) associe chaque cellule aux
+géométries qu'elle contient.
+
+La grille suit le journal de scène (GeometryChange) : avant chaque requête,
+elle compare sa version à celle de la scène et n'applique que les
+géométries créées, déplacées ou supprimées depuis (une lecture par clé
+primaire si rien n'a changé). Elle reste donc à jour dans chaque processus,
+quelle que soit l'origine de l'écriture, et n'est reconstruite entièrement
+qu'au premier usage ou si le journal a été compacté.
+
+Au-delà de SPATIAL_MAX_IDS résultats, la requête passe par l'index SQL
+sur les colonnes plutôt que par une liste d'ids.
+"""
+
+import logging
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Geometry
+from .scene_version import get_changes_since, get_scene_version
+
+logger = logging.getLogger(__name__)
+
+POSITION_VALUES = ("id", "position_x", "position_y", "position_z")
+
+
+class UniformGrid:
+    """Grille uniforme : cellule (i, j, k) -> {id: (x, y, z)}"""
+
+    def __init__(self, cell_size=10.0):
+        self.cell_size = float(cell_size)
+        self.cells = defaultdict(dict)
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def cell(self, point):
+        return tuple(math.floor(value / self.cell_size) for value in point)
+
+    def insert(self, item_id, point):
+        previous = self.points.get(item_id)
+        if previous is not None:
+            if previous == point:
+                return
+            self.remove(item_id)
+        self.points[item_id] = point
+        self.cells[self.cell(point)][item_id] = point
+
+    def remove(self, item_id):
+        point = self.points.pop(item_id, None)
+        if point is None:
+            return
+        key = self.cell(point)
+        cell = self.cells[key]
+        cell.pop(item_id, None)
+        if not cell:
+            del self.cells[key]
+
+    def _candidate_cells(self, low, high):
+        low_cell, high_cell = self.cell(low), self.cell(high)
+        spans = [h - l + 1 for l, h in zip(low_cell, high_cell)]
+        # Grande boîte : parcourir les cellules occupées plutôt que la plage
+        if spans[0] * spans[1] * spans[2] > len(self.cells):
+            return [
+                cell
+                for key, cell in self.cells.items()
+                if all(l <= k <= h for k, l, h in zip(key, low_cell, high_cell))
+            ]
+        return [
+            self.cells[key]
+            for key in (
+                (i, j, k)
+                for i in range(low_cell[0], high_cell[0] + 1)
+                for j in range(low_cell[1], high_cell[1] + 1)
+                for k in range(low_cell[2], high_cell[2] + 1)
+            )
+            if key in self.cells
+        ]
+
+    def within_box(self, low, high):
+        """Ids dont la position est dans la boîte [low, high] (bornes incluses)"""
+        return [
+            item_id
+            for cell in self._candidate_cells(low, high)
+            for item_id, point in cell.items()
+            if all(l <= v <= h for v, l, h in zip(point, low, high))
+        ]
+
+    def within_radius(self, center, radius):
+        """Ids à une distance <= radius de center"""
+        low = tuple(c - radius for c in center)
+        high = tuple(c + radius for c in center)
+        limit = radius * radius
+        return [
+            item_id
+            for cell in self._candidate_cells(low, high)
+            for item_id, point in cell.items()
+            if sum((v - c) ** 2 for v, c in zip(point, center)) <= limit
+        ]
+
+
+class SceneSpatialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.grid = None
+        self.version = None
+
+    def get_cell_size(self):
+        return getattr(settings, "SPATIAL_GRID_CELL_SIZE", 10.0)
+
+    def _rebuild(self, version):
+        grid = UniformGrid(self.get_cell_size())
+        for item_id, *point in Geometry.objects.values_list(*POSITION_VALUES).iterator():
+            grid.insert(item_id, tuple(point))
+        self.grid = grid
+        self.version = version
+        logger.info(f"🧭 Index spatial reconstruit: {len(grid)} géométries (v{version})")
+
+    def _apply_changes(self):
+        version, upsert_ids, deleted_ids = get_changes_since(self.version)
+        if upsert_ids is None:
+            self._rebuild(version)
+            return
+        for item_id in deleted_ids:
+            self.grid.remove(item_id)
+        found = set()
+        for item_id, *point in Geometry.objects.filter(id__in=upsert_ids).values_list(
+            *POSITION_VALUES
+        ):
+            self.grid.insert(item_id, tuple(point))
+            found.add(item_id)
+        # Supprimées depuis sans que le journal ne l'ait encore inscrit
+        for item_id in set(upsert_ids) - found:
+            self.grid.remove(item_id)
+        self.version = version
+
+    def sync(self):
+        version = get_scene_version()
+        with self._lock:
+            if self.grid is None or self.grid.cell_size != float(self.get_cell_size()):
+                self._rebuild(version)
+            elif version != self.version:
+                self._apply_changes()
+            return self.grid
+
+    def within_box(self, low, high):
+        grid = self.sync()
+        with self._lock:
+            return grid.within_box(low, high)
+
+    def within_radius(self, center, radius):
+        grid = self.sync()
+        with self._lock:
+            return grid.within_radius(center, radius)
+
+    def reset(self):
+        with self._lock:
+            self.grid = None
+            self.version = None
+
+
+spatial_index = SceneSpatialIndex()
+
+
+def _parse_floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        raise ValidationError({name: f"{count} nombres séparés par des virgules attendus"})
+    return numbers
+
+
+def _distance_squared(center):
+    terms = [
+        (F(column) - value) * (F(column) - value)
+        for column, value in zip(Geometry.POSITION_COLUMNS, center)
+    ]
+    return terms[0] + terms[1] + terms[2]
+
+
+def _box_filter(low, high):
+    return {
+        **{f"{column}__gte": value for column, value in zip(Geometry.POSITION_COLUMNS, low)},
+        **{f"{column}__lte": value for column, value in zip(Geometry.POSITION_COLUMNS, high)},
+    }
+
+
+class SpatialFilterBackend(BaseFilterBackend):
+    """
+    ?near=x,y,z&radius=r : géométries à moins de r de (x, y, z), les plus
+    proches d'abord ; ?bbox=minx,miny,minz,maxx,maxy,maxz : géométries dans
+    la boîte.
+    """
+
+    def _grid_ids(self, query, *args):
+        """Ids trouvés par la grille, ou None pour passer par l'index SQL"""
+        if not getattr(settings, "SPATIAL_INDEX_ENABLED", True):
+            return None
+        ids = query(*args)
+        return ids if len(ids) <= getattr(settings, "SPATIAL_MAX_IDS", 5000) else None
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if "near" in params:
+            center = _parse_floats(params["near"], 3, "near")
+            (radius,) = _parse_floats(params.get("radius", ""), 1, "radius")
+            if radius < 0:
+                raise ValidationError({"radius": "Le rayon doit être positif"})
+            low = [c - radius for c in center]
+            high = [c + radius for c in center]
+
+            ids = self._grid_ids(spatial_index.within_radius, center, radius)
+            if ids is not None:
+                queryset = queryset.filter(id__in=ids)
+            else:
+                queryset = queryset.filter(**_box_filter(low, high))
+            return queryset.alias(distance_squared=_distance_squared(center)).filter(
+                distance_squared__lte=radius * radius
+            ).order_by("distance_squared", "id")
+
+        if "bbox" in params:
+            bounds = _parse_floats(params["bbox"], 6, "bbox")
+            low, high = bounds[:3], bounds[3:]
+            if any(l > h for l, h in zip(low, high)):
+                raise ValidationError({"bbox": "Bornes minimales supérieures aux maximales"})
+            ids = self._grid_ids(spatial_index.within_box, low, high)
+            if ids is not None:
+                return queryset.filter(id__in=ids)
+            return queryset.filter(**_box_filter(low, high))
+
+        return queryset
@@ -0,0 +1,560 @@
+"""
+Backends de stockage des fichiers (modèles 3D, images).
+
+Interface commune (toutes les E/S de fichiers passent par le backend actif) :
+- `put(source, key, resource_type)` : envoie un chemin ou un fichier ouvert,
+  retourne {"url", "key", "bytes", "resource_type"} ;
+- `open(key, resource_type)` : flux binaire en lecture (à fermer après usage) ;
+- `head(key, resource_type)` : {"key", "url", "bytes", "content_type"} ou None ;
+- `delete(key)` / `delete_many(keys, resource_type)` : suppression idempotente,
+  par lots ; delete_many retourne l'ensemble des clés traitées.
+
+Chaque appel est mesuré (durée, octets, issue, retries) par storage_metrics.
+
+Chaque backend est instancié une fois par processus et garde ses clients
+(session HTTP, client boto3) : les connexions sont réutilisées d'une requête
+à l'autre et partagées entre les threads du pool d'upload.
+
+Le backend actif est choisi par BLOB_STORAGE_BACKEND : nom court
+("cloudinary", "s3", "local", "django", "fake") ou chemin d'import ; sinon
+S3 (B2) si USE_B2_STORAGE, Cloudinary par défaut.
+"""
+
+import io
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .storage_metrics import INSTRUMENTED_METHODS, blob_metrics, instrumented
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    ".glb": "model/gltf-binary",
+    ".gltf": "model/gltf+json",
+    ".hdr": "image/vnd.radiance",
+}
+STREAM_BLOCK_SIZE = 1024 * 1024
+# Opérations S3 (boto3) -> opération blob, pour le décompte des retries
+S3_OPERATIONS = {
+    "PutObject": "put",
+    "CreateMultipartUpload": "put",
+    "UploadPart": "put",
+    "CompleteMultipartUpload": "put",
+    "GetObject": "get",
+    "HeadObject": "head",
+    "DeleteObjects": "delete",
+}
+
+
+def _source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    return getattr(source, "size", None)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _content_type(key):
+    ext = os.path.splitext(key)[1].lower()
+    return CONTENT_TYPES.get(ext) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def _pool_size():
+    return getattr(settings, "BLOB_POOL_CONNECTIONS", 20)
+
+
+class _ResponseStream(io.RawIOBase):
+    """Corps d'une réponse HTTP en flux ; close() rend la connexion au pool"""
+
+    def __init__(self, response):
+        self.response = response
+        response.raw.decode_content = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.response.raw.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.response.close()
+        super().close()
+
+
+class StorageBackend:
+    name = "base"
+    # Nombre maximum de clés par appel de suppression groupée
+    delete_batch_size = 100
+
+    def __init_subclass__(cls, **kwargs):
+        # Instrumente les méthodes d'E/S redéfinies par chaque backend
+        super().__init_subclass__(**kwargs)
+        for method_name, (operation, size) in INSTRUMENTED_METHODS.items():
+            method = cls.__dict__.get(method_name)
+            if method is not None and not getattr(method, "instrumented", False):
+                setattr(cls, method_name, instrumented(method, operation, size))
+
+    def put(self, source, key, resource_type="raw"):
+        raise NotImplementedError
+
+    def open(self, key, resource_type="raw"):
+        raise NotImplementedError
+
+    def head(self, key, resource_type="raw"):
+        raise NotImplementedError
+
+    def delete(self, key, resource_type="raw"):
+        return key in self.delete_many([key], resource_type)
+
+    def delete_many(self, keys, resource_type="raw"):
+        raise NotImplementedError
+
+    def download(self, key, path, resource_type="raw"):
+        """Copie un fichier stocké vers un chemin local (par blocs) ; retourne la taille"""
+        stream = self.open(key, resource_type)
+        try:
+            with open(path, "wb") as fh:
+                shutil.copyfileobj(stream, fh, STREAM_BLOCK_SIZE)
+                return fh.tell()
+        finally:
+            stream.close()
+
+
+StorageBackend.download = instrumented(
+    StorageBackend.download, *INSTRUMENTED_METHODS["download"]
+)
+
+
+class CloudinaryBackend(StorageBackend):
+    """
+    API Cloudinary (public_id = key, ex: dv-threlte/models/<hash>).
+    Le SDK garde ses propres pools urllib3 (upload, Admin API) ; les lectures
+    passent par une session requests partagée.
+    """
+
+    name = "cloudinary"
+
+    def __init__(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_size())
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, key, resource_type="raw"):
+        import cloudinary.utils
+
+        return cloudinary.utils.cloudinary_url(key, resource_type=resource_type, secure=True)[0]
+
+    def put(self, source, key, resource_type="raw"):
+        import cloudinary.uploader
+
+        result = cloudinary.uploader.upload(
+            source,
+            resource_type=resource_type,
+            public_id=key,
+            overwrite=True,
+            invalidate=True,
+        )
+        return {
+            "url": result["secure_url"],
+            "key": result.get("public_id", key),
+            "bytes": result.get("bytes") or _source_size(source),
+            "resource_type": resource_type,
+        }
+
+    def open(self, key, resource_type="raw"):
+        response = self.session.get(self.url(key, resource_type), stream=True, timeout=60)
+        response.raise_for_status()
+        return _ResponseStream(response)
+
+    def head(self, key, resource_type="raw"):
+        import cloudinary.api
+        from cloudinary.exceptions import NotFound
+
+        try:
+            resource = cloudinary.api.resource(key, resource_type=resource_type)
+        except NotFound:
+            return None
+        return {
+            "key": resource["public_id"],
+            "url": resource["secure_url"],
+            "bytes": resource.get("bytes"),
+            "content_type": _content_type(resource["secure_url"]),
+        }
+
+    def delete_many(self, keys, resource_type="raw"):
+        import cloudinary.api
+
+        done = set()
+        for batch in _chunks(list(keys), self.delete_batch_size):
+            result = cloudinary.api.delete_resources(
+                batch, resource_type=resource_type, invalidate=True
+            )
+            for key, outcome in result.get("deleted", {}).items():
+                if outcome in ("deleted", "not_found"):
+                    done.add(key)
+        return done
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    Stockage S3-compatible (Backblaze B2) : un client boto3 unique, thread-safe,
+    avec un pool de BLOB_POOL_CONNECTIONS connexions ; upload multipart au-delà
+    de BLOB_MULTIPART_THRESHOLD. Réglages AWS_* (voir USE_B2_STORAGE).
+    """
+
+    name = "s3"
+    delete_batch_size = 1000
+
+    def __init__(self):
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME", None)
+        self.endpoint_url = getattr(settings, "AWS_S3_ENDPOINT_URL", None)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=getattr(settings, "BLOB_MULTIPART_THRESHOLD", 16 * 1024 * 1024),
+            multipart_chunksize=8 * 1024 * 1024,
+            max_concurrency=4,
+        )
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Création paresseuse : pas de connexion tant qu'aucun fichier n'est lu/écrit
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.session.Session().client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=getattr(settings, "AWS_ACCESS_KEY_ID", None),
+                        aws_secret_access_key=getattr(settings, "AWS_SECRET_ACCESS_KEY", None),
+                        region_name=getattr(settings, "AWS_S3_REGION_NAME", None),
+                        config=Config(
+                            max_pool_connections=_pool_size(),
+                            retries={"max_attempts": 5, "mode": "standard"},
+                        ),
+                    )
+                    self._client.meta.events.register("after-call.s3", self._count_retries)
+        return self._client
+
+    def _count_retries(self, parsed, model, **kwargs):
+        # Les retries sont faits par botocore (y compris pour chaque part multipart)
+        attempts = (parsed or {}).get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        blob_metrics.record_retries(
+            self.name, S3_OPERATIONS.get(model.name, model.name.lower()), attempts
+        )
+
+    def url(self, key, resource_type="raw"):
+        return f"{self.endpoint_url}/{self.bucket}/{key}"
+
+    def put(self, source, key, resource_type="raw"):
+        extra_args = {"ContentType": _content_type(getattr(source, "name", None) or str(source))}
+        if isinstance(source, (str, os.PathLike)):
+            self.client.upload_file(
+                str(source), self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config
+            )
+        else:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            self.client.upload_fileobj(
+                source, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config
+            )
+        return {
+            "url": self.url(key),
+            "key": key,
+            "bytes": _source_size(source),
+            "resource_type": resource_type,
+        }
+
+    def open(self, key, resource_type="raw"):
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+
+    def head(self, key, resource_type="raw"):
+        from botocore.exceptions import ClientError
+
+        try:
+            result = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {
+            "key": key,
+            "url": self.url(key),
+            "bytes": result.get("ContentLength"),
+            "content_type": result.get("ContentType"),
+        }
+
+    def delete_many(self, keys, resource_type="raw"):
+        # DeleteObjects : jusqu'à 1000 clés par requête
+        done = set()
+        for batch in _chunks(list(keys), self.delete_batch_size):
+            result = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            failed = {error["Key"] for error in result.get("Errors", [])}
+            done.update(key for key in batch if key not in failed)
+        return done
+
+
+class LocalStorageBackend(StorageBackend):
+    """Système de fichiers local (développement) : MEDIA_ROOT, servi sous BLOB_LOCAL_URL"""
+
+    name = "local"
+
+    def __init__(self):
+        self.root = str(getattr(settings, "MEDIA_ROOT", None) or settings.BASE_DIR / "media")
+        self.base_url = getattr(settings, "BLOB_LOCAL_URL", "http://localhost:8000/media/")
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Clé hors du stockage: {key}")
+        return path
+
+    def url(self, key, resource_type="raw"):
+        return f"{self.base_url.rstrip('/')}/{key}"
+
+    def put(self, source, key, resource_type="raw"):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, "rb") as src:
+                    shutil.copyfileobj(src, fh, STREAM_BLOCK_SIZE)
+            else:
+                if hasattr(source, "seek"):
+                    source.seek(0)
+                for chunk in source.chunks() if hasattr(source, "chunks") else iter(
+                    lambda: source.read(STREAM_BLOCK_SIZE), b""
+                ):
+                    fh.write(chunk)
+        os.replace(tmp_path, path)
+        return {
+            "url": self.url(key),
+            "key": key,
+            "bytes": os.path.getsize(path),
+            "resource_type": resource_type,
+        }
+
+    def open(self, key, resource_type="raw"):
+        return open(self.path(key), "rb")
+
+    def head(self, key, resource_type="raw"):
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        return {
+            "key": key,
+            "url": self.url(key),
+            "bytes": os.path.getsize(path),
+            "content_type": _content_type(key),
+        }
+
+    def delete_many(self, keys, resource_type="raw"):
+        keys = list(keys)
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+        return set(keys)
+
+
+class DjangoStorageBackend(StorageBackend):
+    """Passe par default_storage (assets historiques enregistrés sous ce nom)"""
+
+    name = "django"
+
+    def put(self, source, key, resource_type="raw"):
+        from django.core.files.storage import default_storage
+
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as fh:
+                saved_key = default_storage.save(key, File(fh))
+        else:
+            saved_key = default_storage.save(key, source)
+        return {
+            "url": default_storage.url(saved_key),
+            "key": saved_key,
+            "bytes": _source_size(source),
+            "resource_type": resource_type,
+        }
+
+    def open(self, key, resource_type="raw"):
+        from django.core.files.storage import default_storage
+
+        return default_storage.open(key, "rb")
+
+    def head(self, key, resource_type="raw"):
+        from django.core.files.storage import default_storage
+
+        if not default_storage.exists(key):
+            return None
+        return {
+            "key": key,
+            "url": default_storage.url(key),
+            "bytes": default_storage.size(key),
+            "content_type": _content_type(key),
+        }
+
+    def delete_many(self, keys, resource_type="raw"):
+        from django.core.files.storage import default_storage
+
+        keys = list(keys)
+        bucket = getattr(default_storage, "bucket", None)
+        if bucket is None:
+            # FileSystemStorage : pas d'API groupée, delete() ignore les fichiers absents
+            for key in keys:
+                default_storage.delete(key)
+            return set(keys)
+
+        # S3Boto3Storage (B2) : DeleteObjects, jusqu'à 1000 clés par requête
+        client = bucket.meta.client
+        done = set()
+        for batch in _chunks(keys, 1000):
+            result = client.delete_objects(
+                Bucket=bucket.name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            failed = {error["Key"] for error in result.get("Errors", [])}
+            done.update(key for key in batch if key not in failed)
+        return done
+
+
+class FakeStorageBackend(StorageBackend):
+    """Backend en mémoire pour les tests : aucun appel réseau"""
+
+    name = "fake"
+    base_url = "https://fake-storage.local"
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, source, key, resource_type="raw"):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as fh:
+                data = fh.read()
+        else:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            data = source.read()
+        with self._lock:
+            self.objects[key] = data
+        return {
+            "url": f"{self.base_url}/{key}",
+            "key": key,
+            "bytes": len(data),
+            "resource_type": resource_type,
+        }
+
+    def open(self, key, resource_type="raw"):
+        with self._lock:
+            if key not in self.objects:
+                raise FileNotFoundError(key)
+            return io.BytesIO(self.objects[key])
+
+    def head(self, key, resource_type="raw"):
+        with self._lock:
+            data = self.objects.get(key)
+        if data is None:
+            return None
+        return {
+            "key": key,
+            "url": f"{self.base_url}/{key}",
+            "bytes": len(data),
+            "content_type": _content_type(key),
+        }
+
+    def delete_many(self, keys, resource_type="raw"):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self.objects.pop(key, None)
+        return set(keys)
+
+
+BACKEND_CLASSES = {
+    CloudinaryBackend.name: CloudinaryBackend,
+    S3StorageBackend.name: S3StorageBackend,
+    LocalStorageBackend.name: LocalStorageBackend,
+    DjangoStorageBackend.name: DjangoStorageBackend,
+    FakeStorageBackend.name: FakeStorageBackend,
+}
+
+
+def _default_backend_name():
+    backend_path = getattr(settings, "BLOB_STORAGE_BACKEND", None)
+    if backend_path:
+        return backend_path
+    if getattr(settings, "USE_B2_STORAGE", False):
+        return S3StorageBackend.name
+    return CloudinaryBackend.name
+
+
+@lru_cache(maxsize=None)
+def _backend_instance(name):
+    """Une instance (et ses clients) par backend et par processus"""
+    backend_class = BACKEND_CLASSES.get(name) or import_string(name)
+    backend = backend_class()
+    logger.info(f"Backend de stockage: {backend.name}")
+    return backend
+
+
+def get_storage_backend():
+    return _backend_instance(_default_backend_name())
+
+
+def get_backend_by_name(name):
+    """Backend ayant stocké un fichier (peut différer du backend actif)"""
+    backend = get_storage_backend()
+    if backend.name == name:
+        return backend
+    return _backend_instance(name)
+
+
+def backend_name_for_url(url):
+    """Devine le backend d'un fichier d'après son URL (assets historiques)"""
+    if url and "res.cloudinary.com" in url:
+        return CloudinaryBackend.name
+    return get_storage_backend().name
+
+
+def backend_for_asset(asset):
+    """Backend qui sert le fichier d'un CloudinaryAsset"""
+    return get_backend_by_name(backend_name_for_url(asset.url))
+
+
+@receiver(setting_changed)
+def reset_storage_backend(setting, **kwargs):
+    if setting in ("BLOB_STORAGE_BACKEND", "USE_B2_STORAGE", "BLOB_POOL_CONNECTIONS"):
+        _backend_instance.cache_clear()
@@ -1,11 +1,8 @@
+import io
 import os
-import boto3
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
-import cloudinary
-import cloudinary.uploader
-from botocore.exceptions import NoCredentialsError, ClientError
+
+from .storage_backends import get_storage_backend
 
 
 class StorageManager:
@@ -25,7 +22,13 @@ class StorageManager:
 
     def get_storage_info(self):
         """Retourne les informations du stockage actuel"""
-        info = {"backend": self.current_backend, "configured": True, "details": {}}
+        info = {
+            "backend": self.current_backend,
+            # Backend réellement utilisé pour les fichiers (BLOB_STORAGE_BACKEND)
+            "blob_backend": get_storage_backend().name,
+            "configured": True,
+            "details": {},
+        }
 
         if self.current_backend == "b2":
             info["details"] = {
@@ -60,7 +63,7 @@ class StorageManager:
                 info["error"] = "Cloudinary credentials manquantes"
         else:
             info["details"] = {
-                "media_root": getattr(settings, "MEDIA_ROOT", None),
+                "media_root": str(getattr(settings, "MEDIA_ROOT", "") or ""),
                 "media_url": getattr(settings, "MEDIA_URL", None),
             }
 
@@ -69,25 +72,26 @@ class StorageManager:
     def test_storage(self):
         """Teste le stockage actuel"""
         try:
-            # Créer un fichier de test
-            test_content = "Test de stockage - " + str(self.current_backend)
-            test_filename = f"storage-test/{self.current_backend}-test.txt"
-
-            # Sauvegarder le fichier
-            file_path = default_storage.save(test_filename, ContentFile(test_content))
+            backend = get_storage_backend()
+            # Créer un fichier de test (put / head / delete du backend actif)
+            test_content = f"Test de stockage - {backend.name}".encode()
+            test_filename = f"storage-test/{backend.name}-test.txt"
+            result = backend.put(io.BytesIO(test_content), test_filename)
 
-            # Vérifier l'URL
-            file_url = default_storage.url(file_path)
+            # Vérifier que le fichier est lisible
+            head = backend.head(result["key"])
+            if head is None:
+                raise RuntimeError(f"Fichier de test introuvable: {result['key']}")
 
             # Nettoyer
-            if default_storage.exists(file_path):
-                default_storage.delete(file_path)
+            backend.delete(result["key"])
 
             return {
                 "success": True,
                 "backend": self.current_backend,
-                "test_file": file_path,
-                "test_url": file_url,
+                "blob_backend": backend.name,
+                "test_file": result["key"],
+                "test_url": result["url"],
                 "message": f"Test {self.current_backend} réussi",
             }
 
@@ -138,9 +142,21 @@ class StorageManager:
 
         # Retourne les variables d'environnement à définir
         env_config = {
-            "b2": {"USE_B2_STORAGE": "True", "USE_CLOUDINARY": "False"},
-            "cloudinary": {"USE_B2_STORAGE": "False", "USE_CLOUDINARY": "True"},
-            "local": {"USE_B2_STORAGE": "False", "USE_CLOUDINARY": "False"},
+            "b2": {
+                "USE_B2_STORAGE": "True",
+                "USE_CLOUDINARY": "False",
+                "BLOB_STORAGE_BACKEND": "s3",
+            },
+            "cloudinary": {
+                "USE_B2_STORAGE": "False",
+                "USE_CLOUDINARY": "True",
+                "BLOB_STORAGE_BACKEND": "cloudinary",
+            },
+            "local": {
+                "USE_B2_STORAGE": "False",
+                "USE_CLOUDINARY": "False",
+                "BLOB_STORAGE_BACKEND": "local",
+            },
         }
 
         return {
@@ -0,0 +1,238 @@
+"""
+Métriques des opérations de stockage (par processus, en mémoire).
+
+Chaque opération blob (put, get, download, head, delete, list, inspect) est
+mesurée par backend : durée (histogramme cumulé + fenêtre glissante de
+STORAGE_METRICS_WINDOW secondes), octets transférés, tentatives rejouées
+(retries) et issue (success / not_found / error).
+
+Les backends sont instrumentés à la source (voir StorageBackend), donc tout
+ce qui passe par eux est compté : upload des vues et serializers, traitement
+des modèles, commandes de synchronisation, StorageManager, sonde.
+Exposé en format texte Prometheus sur /api/storage/metrics/.
+"""
+
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .metrics import Histogram, RollingHistogram
+
+PREFIX = "dv_blob"
+OUTCOMES = ("success", "not_found", "error")
+
+
+class OperationMetrics:
+    """Compteurs d'une opération sur un backend"""
+
+    def __init__(self, window):
+        self.duration = Histogram()
+        self.recent = RollingHistogram(window=window)
+        self._lock = threading.Lock()
+        self.outcomes = Counter()
+        self.bytes = 0
+        self.retries = 0
+
+    def observe(self, elapsed, outcome, size):
+        self.duration.observe(elapsed)
+        self.recent.observe(elapsed, size)
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.bytes += size
+
+    def add_retries(self, count):
+        with self._lock:
+            self.retries += count
+
+    def snapshot(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            size = self.bytes
+            retries = self.retries
+        return {
+            "outcomes": outcomes,
+            "bytes": size,
+            "retries": retries,
+            "duration": self.duration.snapshot(),
+            "recent": self.recent.snapshot(),
+        }
+
+
+class BlobMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+
+    def get(self, backend, operation):
+        key = (backend, operation)
+        metrics = self.operations.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self.operations.setdefault(
+                    key, OperationMetrics(getattr(settings, "STORAGE_METRICS_WINDOW", 300.0))
+                )
+        return metrics
+
+    def record(self, backend, operation, elapsed, outcome="success", size=0):
+        self.get(backend, operation).observe(elapsed, outcome, size or 0)
+
+    def record_retries(self, backend, operation, count):
+        if count:
+            self.get(backend, operation).add_retries(count)
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+
+    def snapshot(self):
+        with self._lock:
+            operations = dict(self.operations)
+        return {key: metrics.snapshot() for key, metrics in sorted(operations.items())}
+
+
+blob_metrics = BlobMetrics()
+
+
+@contextmanager
+def measure(backend, operation):
+    """
+    Mesure un bloc : `call["bytes"]` et `call["outcome"]` peuvent être
+    renseignés par l'appelant ; une exception compte comme "error".
+    """
+    call = {"bytes": 0, "outcome": "success"}
+    started = time.perf_counter()
+    try:
+        yield call
+    except FileNotFoundError:
+        call["outcome"] = "not_found"
+        raise
+    except Exception:
+        call["outcome"] = "error"
+        raise
+    finally:
+        blob_metrics.record(
+            backend, operation, time.perf_counter() - started, call["outcome"], call["bytes"]
+        )
+
+
+def _put_size(result):
+    return result.get("bytes") or 0
+
+
+def _download_size(result):
+    return result or 0
+
+
+def _no_size(result):
+    return 0
+
+
+# Méthode du backend -> (opération, octets transférés d'après le résultat)
+INSTRUMENTED_METHODS = {
+    "put": ("put", _put_size),
+    "open": ("get", _no_size),
+    "download": ("download", _download_size),
+    "head": ("head", _no_size),
+    "delete_many": ("delete", _no_size),
+}
+
+
+def instrumented(method, operation, size=_no_size):
+    """Enveloppe une méthode de StorageBackend (self.name = label backend)"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with measure(self.name, operation) as call:
+            result = method(self, *args, **kwargs)
+            if operation == "head" and result is None:
+                call["outcome"] = "not_found"
+            call["bytes"] = size(result)
+            return result
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_prometheus(snapshot=None):
+    """Format texte d'exposition Prometheus 0.0.4"""
+    snapshot = blob_metrics.snapshot() if snapshot is None else snapshot
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    family("operations_total", "counter", "Opérations de stockage par backend, opération et issue.")
+    for (backend, operation), data in snapshot.items():
+        for outcome in OUTCOMES:
+            if outcome in data["outcomes"]:
+                labels = _labels(backend=backend, operation=operation, outcome=outcome)
+                lines.append(f"{PREFIX}_operations_total{labels} {data['outcomes'][outcome]}")
+
+    family("bytes_total", "counter", "Octets transférés par backend et opération.")
+    for (backend, operation), data in snapshot.items():
+        labels = _labels(backend=backend, operation=operation)
+        lines.append(f"{PREFIX}_bytes_total{labels} {data['bytes']}")
+
+    family("retries_total", "counter", "Tentatives rejouées (SDK ou file de reprise).")
+    for (backend, operation), data in snapshot.items():
+        labels = _labels(backend=backend, operation=operation)
+        lines.append(f"{PREFIX}_retries_total{labels} {data['retries']}")
+
+    family("operation_duration_seconds", "histogram", "Durée des opérations de stockage.")
+    for (backend, operation), data in snapshot.items():
+        duration = data["duration"]
+        for bound, cumulative in duration["buckets"]:
+            labels = _labels(backend=backend, operation=operation, le=bound)
+            lines.append(f"{PREFIX}_operation_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(backend=backend, operation=operation)
+        lines.append(f"{PREFIX}_operation_duration_seconds_sum{labels} {_number(duration['sum'])}")
+        lines.append(f"{PREFIX}_operation_duration_seconds_count{labels} {duration['count']}")
+
+    family(
+        "operation_duration_window_seconds",
+        "summary",
+        "Durée des opérations sur la fenêtre glissante (STORAGE_METRICS_WINDOW).",
+    )
+    for (backend, operation), data in snapshot.items():
+        recent = data["recent"]
+        for quantile, key in ((0.5, "p50"), (0.95, "p95"), (0.99, "p99")):
+            labels = _labels(backend=backend, operation=operation, quantile=quantile)
+            lines.append(f"{PREFIX}_operation_duration_window_seconds{labels} {_number(recent[key])}")
+        labels = _labels(backend=backend, operation=operation)
+        lines.append(f"{PREFIX}_operation_duration_window_seconds_sum{labels} {_number(recent['sum'])}")
+        lines.append(f"{PREFIX}_operation_duration_window_seconds_count{labels} {recent['count']}")
+
+    family(
+        "throughput_window_bytes_per_second",
+        "gauge",
+        "Débit moyen pendant les transferts sur la fenêtre glissante.",
+    )
+    for (backend, operation), data in snapshot.items():
+        recent = data["recent"]
+        if recent["bytes"] and recent["sum"]:
+            labels = _labels(backend=backend, operation=operation)
+            throughput = recent["bytes"] / recent["sum"]
+            lines.append(f"{PREFIX}_throughput_window_bytes_per_second{labels} {_number(throughput)}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,162 @@
+"""
+Sonde de stockage en arrière-plan.
+
+Un thread vérifie chaque backend toutes les STORAGE_PROBE_INTERVAL secondes
+(lecture `head` d'un fichier témoin, écrit seulement s'il manque) et garde
+en mémoire le dernier résultat, les derniers succès/échecs et un histogramme
+de latence par backend. /api/storage/status/ et /health/ servent ce résultat
+en cache : aucune requête réseau pendant la requête HTTP.
+
+Le thread démarre au premier appel de `get_storage_health()` (pas pendant les
+commandes de gestion ni les migrations).
+"""
+
+import io
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import Histogram
+from .storage_backends import get_backend_by_name, get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+SENTINEL_KEY = "storage-probe/sentinel.txt"
+
+
+class BackendProbe:
+    """État d'un backend : dernier résultat et histogramme de latence"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = Histogram()
+        self.ok = None
+        self.latency_ms = None
+        self.last_checked = None
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = ""
+        self.consecutive_failures = 0
+
+    def record(self, ok, elapsed, error=""):
+        now = timezone.now().isoformat()
+        self.latency.observe(elapsed)
+        self.ok = ok
+        self.latency_ms = round(elapsed * 1000, 1)
+        self.last_checked = now
+        if ok:
+            self.last_success = now
+            self.consecutive_failures = 0
+        else:
+            self.last_failure = now
+            self.last_error = error[:500]
+            self.consecutive_failures += 1
+
+    def snapshot(self):
+        latency = self.latency.snapshot()
+        return {
+            "ok": self.ok,
+            "latency_ms": self.latency_ms,
+            "last_checked": self.last_checked,
+            "last_success": self.last_success,
+            "last_failure": self.last_failure,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "latency": {
+                "count": latency["count"],
+                "p50_ms": _ms(latency["p50"]),
+                "p95_ms": _ms(latency["p95"]),
+                "p99_ms": _ms(latency["p99"]),
+                "buckets": latency["buckets"],
+            },
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def check_backend(backend):
+    """Lecture du fichier témoin (créé au besoin) ; lève une exception en cas d'échec"""
+    if backend.head(SENTINEL_KEY) is None:
+        backend.put(io.BytesIO(b"storage probe"), SENTINEL_KEY)
+
+
+class StorageProber:
+    def __init__(self, check=check_backend):
+        self.check = check
+        self.probes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def get_interval(self):
+        return getattr(settings, "STORAGE_PROBE_INTERVAL", 60.0)
+
+    def backend_names(self):
+        names = getattr(settings, "STORAGE_PROBE_BACKENDS", None)
+        return list(names) if names else [get_storage_backend().name]
+
+    def probe(self, name):
+        with self._lock:
+            state = self.probes.setdefault(name, BackendProbe(name))
+        started = time.perf_counter()
+        try:
+            self.check(get_backend_by_name(name))
+        except Exception as e:
+            state.record(False, time.perf_counter() - started, str(e))
+            logger.warning(f"⚠️ Sonde de stockage {name} en échec: {str(e)}")
+        else:
+            state.record(True, time.perf_counter() - started)
+        return state
+
+    def probe_all(self):
+        for name in self.backend_names():
+            self.probe(name)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"❌ Sonde de stockage: {str(e)}", exc_info=True)
+            self._stop.wait(self.get_interval())
+
+    def ensure_started(self):
+        if not getattr(settings, "STORAGE_PROBE_ENABLED", True):
+            return False
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._loop, name="storage-prober", daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self._lock:
+            probes = dict(self.probes)
+        backends = {name: state.snapshot() for name, state in probes.items()}
+        results = [state["ok"] for state in backends.values()]
+        return {
+            # None tant qu'aucune sonde n'a abouti
+            "ok": all(results) if results and None not in results else None,
+            "interval": self.get_interval(),
+            "backends": backends,
+        }
+
+
+storage_prober = StorageProber()
+
+
+def get_storage_health():
+    """Dernier état connu des backends (ne bloque jamais)"""
+    running = storage_prober.ensure_started()
+    return {**storage_prober.snapshot(), "running": running}
@@ -2,8 +2,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from .storage_manager import storage_manager
+from .storage_metrics import render_prometheus
+from .storage_probe import get_storage_health
 import json
 
 
@@ -99,20 +101,35 @@ def storage_test(request):
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def storage_status(request):
-    """API pour obtenir un statut complet du système de stockage"""
+    """
+    API pour obtenir un statut complet du système de stockage.
+    Le test vient de la sonde en arrière-plan (résultat en cache) ; POST
+    /api/storage/test/ force un vrai aller-retour.
+    """
     try:
         # Récupérer les informations actuelles
         current_info = storage_manager.get_storage_info()
         available_backends = storage_manager.list_available_backends()
 
-        # Tester le stockage actuel
-        test_result = storage_manager.test_storage()
+        # Dernière sonde du backend actif
+        health = get_storage_health()
+        probe = health["backends"].get(current_info["blob_backend"], {})
+        test_result = {
+            "success": probe.get("ok"),
+            "backend": current_info["backend"],
+            "blob_backend": current_info["blob_backend"],
+            "latency_ms": probe.get("latency_ms"),
+            "checked_at": probe.get("last_checked"),
+            "error": probe.get("last_error", ""),
+            "cached": True,
+        }
 
         # Combiner toutes les informations
         status_data = {
             "current": current_info,
             "available": available_backends,
             "test": test_result,
+            "probes": health,
             "summary": {
                 "backend": current_info["backend"],
                 "configured": current_info["configured"],
@@ -130,3 +147,13 @@ def storage_status(request):
             {"error": str(e), "message": "Erreur lors de la récupération du statut"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
+
+
+def storage_metrics(request):
+    """
+    Métriques des opérations de stockage (durée, octets, retries, issue par
+    backend et opération), au format texte Prometheus.
+    """
+    return HttpResponse(
+        render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,3 +1,1838 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.http import HttpResponse
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from backend.profiling_middleware import ProfilingMiddleware, request_profiles
+
+from . import auto_sync_signals, cloudinary_sync, remote_deletion, scene_events
+from .compression import compress_model
+from .glb import GLB, TARGET_ARRAY_BUFFER
+from .lod import generate_lods
+from .model_inspection import ModelInspectionError, inspect_stream
+from .model_processing import STAGES, check_compression_codec, process_model_asset
+from .models import (
+    CloudinaryAsset,
+    CloudinarySyncState,
+    Geometry,
+    RemoteDeletion,
+    UploadSession,
+)
+from .scene_events import (
+    EVENT_CREATED,
+    EVENT_DELETED,
+    EVENT_UPDATED,
+    EVENT_VISIBILITY,
+    InProcessBroker,
+)
+from .scene_version import compact_changes, get_scene_version
+from .signals import (
+    ASSET_CREATED,
+    ASSET_DELETED,
+    PendingAssetEvents,
+    cloudinary_assets_changed,
+)
+from .spatial_index import spatial_index
+from .storage_backends import (
+    FakeStorageBackend,
+    LocalStorageBackend,
+    StorageBackend,
+    _backend_instance,
+    get_storage_backend,
+)
+from .storage_metrics import blob_metrics, render_prometheus
+from .storage_probe import SENTINEL_KEY, StorageProber, storage_prober
+from .textures import transcode_textures
+from .thumbnails import render_thumbnail
+from .upload_pipeline import (
+    InlineExecutor,
+    content_key,
+    process_upload,
+    purge_upload_sessions,
+)
+from .upload_views import UploadSessionView
+
+# Aucun appel réseau ni thread : stockage en mémoire, workers exécutés en ligne
+PIPELINE_SETTINGS = {
+    "BLOB_STORAGE_BACKEND": "fake",
+    "UPLOAD_EXECUTOR": "backend.Base_threlte_dv.upload_pipeline.InlineExecutor",
+    "UPLOAD_ASYNC": True,
+    "MODEL_PROCESSING": False,
+    "CLOUDINARY_AUTO_SYNC": False,
+    "REMOTE_DELETE_RETRY_TIMER": False,
+    "STORAGE_PROBE_ENABLED": False,
+}
+
+
+@override_settings(**PIPELINE_SETTINGS)
+class PipelineTestCase(TestCase):
+    """Backend de stockage neuf, cache vidé et staging temporaire pour chaque test"""
+
+    def setUp(self):
+        # Snapshot et index spatial suivent la version de scène, qui repart de 0
+        cache.clear()
+        spatial_index.reset()
+        _backend_instance.cache_clear()
+        self.staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.staging_dir, ignore_errors=True)
+        staging = override_settings(UPLOAD_STAGING_DIR=self.staging_dir)
+        staging.enable()
+        self.addCleanup(staging.disable)
+
+    def create_geometry(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Geometry.objects.create(**{"name": "cube", "type": "box", **fields})
+
+    def upload(self, content, name="chair.glb"):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/geometries/",
+                {"name": "chair", "model_file": SimpleUploadedFile(name, content)},
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return Geometry.objects.get(pk=response.json()["id"])
+
+
+class SceneSnapshotTests(PipelineTestCase):
+    def get_list(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get("/api/geometries/", **headers)
+
+    def test_etag_round_trip(self):
+        self.create_geometry()
+        response = self.get_list()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        etag = response["ETag"]
+
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        self.create_geometry(name="sphere")
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_filtered_list_bypasses_snapshot(self):
+        self.create_geometry()
+        response = self.client.get("/api/geometries/?visible=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+    def test_asset_changes_invalidate_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            asset = CloudinaryAsset.objects.create(
+                public_id="models/chair", url="https://fake-storage.local/chair", asset_type="raw"
+            )
+        geometry = self.create_geometry(asset=asset)
+        etag = self.get_list()["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asset.metadata = {"model": {"triangles": 12}}
+            asset.save(update_fields=["metadata"])
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        # Nouvelle variante (LOD) : l'URL servie peut changer
+        with self.captureOnCommitCallbacks(execute=True):
+            CloudinaryAsset.objects.create(
+                public_id="models/chair_lod1", url="https://fake-storage.local/lod1",
+                source=asset, variant="lod1",
+            )
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asset.delete()
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        geometry.refresh_from_db()
+        self.assertIsNone(geometry.asset_id)
+
+
+class GeometryChangesTests(PipelineTestCase):
+    def get_changes(self, since):
+        return self.client.get(f"/api/geometries/changes/?since={since}")
+
+    def test_since_requires_integer(self):
+        self.assertEqual(self.client.get("/api/geometries/changes/").status_code, 400)
+        self.assertEqual(self.get_changes("abc").status_code, 400)
+
+    def test_delta_since_version(self):
+        kept = self.create_geometry(name="kept")
+        removed_id = self.create_geometry(name="removed").pk
+        since = get_scene_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.visible = False
+            kept.save(update_fields=["visible"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Geometry.objects.filter(pk=removed_id).delete()
+        added = self.create_geometry(name="added")
+
+        data = self.get_changes(since).json()
+        self.assertFalse(data["full"])
+        self.assertEqual(data["version"], get_scene_version())
+        self.assertEqual(sorted(g["id"] for g in data["upserts"]), [kept.pk, added.pk])
+        self.assertEqual(data["deleted"], [removed_id])
+
+        data = self.get_changes(data["version"]).json()
+        self.assertEqual((data["upserts"], data["deleted"]), ([], []))
+
+    @override_settings(SCENE_CHANGELOG_RETENTION=2, SCENE_CHANGELOG_COMPACT_EVERY=0)
+    def test_compacted_log_returns_full_scene(self):
+        for index in range(4):
+            self.create_geometry(name=f"g{index}")
+        compact_changes()
+
+        data = self.get_changes(0).json()
+        self.assertTrue(data["full"])
+        self.assertEqual(len(data["geometries"]), 4)
+        # Version future (base restaurée) : resynchronisation complète aussi
+        self.assertTrue(self.get_changes(get_scene_version() + 1).json()["full"])
+        # Versions encore couvertes par le journal
+        self.assertFalse(self.get_changes(get_scene_version() - 2).json()["full"])
+
+
+class RecordingBroker(InProcessBroker):
+    """Broker de test : garde les événements publiés"""
+
+    cross_process = True
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+        super().publish(event)
+
+
+class SceneEventsTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = RecordingBroker()
+        patcher = mock.patch.object(scene_events, "get_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [(event["type"], event["id"]) for event in self.broker.events]
+
+    def test_writes_publish_after_commit(self):
+        geometry = self.create_geometry()
+        self.assertEqual(self.broker.events[0]["geometry"]["name"], "cube")
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(f"/api/geometries/{geometry.pk}/toggle-visibility/")
+            # Rien n'est publié avant le commit
+            self.assertEqual(len(self.broker.events), 1)
+        for callback in callbacks:
+            callback()
+
+        geometry_id = geometry.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            geometry.delete()
+
+        self.assertEqual(
+            self.published(),
+            [
+                (EVENT_CREATED, geometry_id),
+                (EVENT_VISIBILITY, geometry_id),
+                (EVENT_DELETED, geometry_id),
+            ],
+        )
+        self.assertIsNone(self.broker.events[-1]["geometry"])
+
+    def test_subscriber_coalesces_per_geometry(self):
+        broker = InProcessBroker()
+
+        async def receive():
+            subscription = broker.subscribe()
+            broker.publish({"type": EVENT_CREATED, "id": 1, "version": 1})
+            broker.publish({"type": EVENT_UPDATED, "id": 1, "version": 2})
+            broker.publish({"type": EVENT_UPDATED, "id": 2, "version": 3})
+            broker.publish({"type": EVENT_DELETED, "id": 2, "version": 4})
+            batch = await subscription.next_batch(0, 1)
+            broker.unsubscribe(subscription)
+            return batch
+
+        batch = {event["id"]: event for event in asyncio.run(receive())}
+        # Créée puis déplacée dans la fenêtre : une seule création, dernière version
+        self.assertEqual((batch[1]["type"], batch[1]["version"]), (EVENT_CREATED, 2))
+        self.assertEqual(batch[2]["type"], EVENT_DELETED)
+        self.assertEqual(broker.subscriber_count, 0)
+
+    def test_in_process_broker_with_several_workers(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "4"}):
+            warnings = scene_events.check_scene_event_broker(None)
+        self.assertEqual([warning.id for warning in warnings], ["Base_threlte_dv.W001"])
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "1"}):
+            self.assertEqual(scene_events.check_scene_event_broker(None), [])
+
+
+class GeometrySearchTests(PipelineTestCase):
+    def test_prefix_search(self):
+        self.create_geometry(name="Chaise")
+        self.create_geometry(name="Chaise longue")
+        self.create_geometry(name="Table")
+
+        results = self.client.get("/api/geometries/?search=chai").json()
+        self.assertEqual(len(results), 2)
+        self.assertNotIn("ETag", self.client.get("/api/geometries/?search=chai"))
+
+
+class SpatialFilterTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.near = self.create_geometry(name="proche", position={"x": 1, "y": 0, "z": 0})
+        self.middle = self.create_geometry(name="milieu", position={"x": 3, "y": 4, "z": 0})
+        self.far = self.create_geometry(name="loin", position={"x": 50, "y": 0, "z": 0})
+
+    def ids(self, query):
+        response = self.client.get(f"/api/geometries/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return [geometry["id"] for geometry in response.json()]
+
+    def test_near_orders_by_distance_and_bbox_includes_bounds(self):
+        self.assertEqual(self.ids("near=0,0,0&radius=5"), [self.near.pk, self.middle.pk])
+        self.assertEqual(self.ids("near=50,0,0&radius=0"), [self.far.pk])
+        self.assertEqual(
+            sorted(self.ids("bbox=1,0,0,3,4,0")), sorted([self.near.pk, self.middle.pk])
+        )
+        self.assertEqual(self.ids("bbox=-10,-10,-10,0,0,0"), [])
+        # Combinable avec la recherche plein texte
+        self.assertEqual(self.ids("search=loin&near=0,0,0&radius=5"), [])
+        self.assertEqual(self.ids("search=milieu&near=0,0,0&radius=5"), [self.middle.pk])
+
+    def test_sql_fallback_above_max_ids(self):
+        queries = {}
+        for max_ids in (5000, 1):
+            with override_settings(SPATIAL_MAX_IDS=max_ids), CaptureQueriesContext(
+                connection
+            ) as captured:
+                results = (
+                    self.ids("near=0,0,0&radius=5"),
+                    sorted(self.ids("bbox=0,0,0,60,10,0")),
+                )
+            queries[max_ids] = " ".join(query["sql"] for query in captured)
+            with self.subTest(max_ids=max_ids):
+                self.assertEqual(
+                    results,
+                    (
+                        [self.near.pk, self.middle.pk],
+                        sorted([self.near.pk, self.middle.pk, self.far.pk]),
+                    ),
+                )
+        # Liste d'ids de la grille, sinon bornes sur les colonnes indexées
+        self.assertNotIn('"position_x" >=', queries[5000])
+        self.assertIn('"position_x" >=', queries[1])
+
+    def test_grid_follows_bulk_updates_and_deletes(self):
+        self.assertEqual(self.ids("near=50,0,0&radius=1"), [self.far.pk])
+        grid = spatial_index.grid
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                "/api/geometries/bulk/",
+                data=json.dumps(
+                    [
+                        {"id": self.far.pk, "position": {"x": 0}},
+                        {"id": self.near.pk, "position": {"x": 49}},
+                    ]
+                ),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.ids("near=50,0,0&radius=1"), [self.near.pk])
+        self.assertEqual(self.ids("near=0,0,0&radius=1"), [self.far.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/geometries/{self.far.pk}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.ids("near=0,0,0&radius=1"), [])
+        self.assertNotIn(self.far.pk, spatial_index.grid.points)
+
+        # Changements appliqués à la grille existante, sans reconstruction
+        self.assertIs(spatial_index.grid, grid)
+        self.assertEqual(spatial_index.version, get_scene_version())
+
+    def test_malformed_parameters_are_rejected(self):
+        invalid = [
+            "near=0,0&radius=1",
+            "near=0,0,a&radius=1",
+            "near=0,0,0",
+            "near=0,0,0&radius=-1",
+            "near=0,0,0&radius=nan",
+            "near=0,0,inf&radius=1",
+            "bbox=0,0,0,1,1",
+            "bbox=0,0,0,1,1,x",
+            "bbox=2,0,0,1,1,1",
+        ]
+        for query in invalid:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/api/geometries/?{query}").status_code, 400)
+
+
+class GeometryBulkUpdateTests(PipelineTestCase):
+    def bulk_patch(self, body):
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return self.client.patch(
+            "/api/geometries/bulk/", data=body, content_type="application/json"
+        )
+
+    def test_rejects_invalid_vectors_and_colors(self):
+        geometry = self.create_geometry(position={"x": 1, "y": 2, "z": 3})
+        invalid = [
+            [{"id": geometry.pk, "position": {"x": "nan"}}],
+            [{"id": geometry.pk, "position": {"w": 1}}],
+            [{"id": geometry.pk, "position": {}}],
+            [{"id": geometry.pk, "color": "1234567"}],
+            [{"position": {"x": 1}}],
+            {"id": geometry.pk},
+        ]
+        for body in invalid:
+            with self.subTest(body=body):
+                self.assertEqual(self.bulk_patch(body).status_code, 400)
+        # Débordement : 1e400 vaut inf une fois décodé
+        body = '[{"id": %d, "position": {"x": 1e400}}]' % geometry.pk
+        self.assertEqual(self.bulk_patch(body).status_code, 400)
+
+        geometry.refresh_from_db()
+        self.assertEqual(geometry.position, {"x": 1, "y": 2, "z": 3})
+
+    def test_unknown_ids_change_nothing(self):
+        geometry = self.create_geometry()
+        version = get_scene_version()
+        response = self.bulk_patch(
+            [{"id": geometry.pk, "visible": False}, {"id": geometry.pk + 100, "visible": False}]
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["ids"], [geometry.pk + 100])
+        geometry.refresh_from_db()
+        self.assertTrue(geometry.visible)
+        self.assertEqual(get_scene_version(), version)
+
+    def test_partial_vectors_merge_into_one_version(self):
+        first = self.create_geometry(position={"x": 1, "y": 2, "z": 3})
+        second = self.create_geometry(name="sphere")
+        version = get_scene_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk_patch(
+                [
+                    {"id": first.pk, "color": "123456"},
+                    {"id": first.pk, "position": {"x": 5}},
+                    {"id": first.pk, "position": {"z": 7}},
+                    {"id": second.pk, "visible": False},
+                ]
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"version": version + 1, "updated": 2})
+
+        first.refresh_from_db()
+        self.assertEqual(first.position, {"x": 5.0, "y": 2, "z": 7.0})
+        self.assertEqual((first.position_x, first.position_z), (5.0, 7.0))
+        self.assertEqual(first.color, "#123456")
+        self.assertFalse(Geometry.objects.get(pk=second.pk).visible)
+
+        changes = self.client.get(f"/api/geometries/changes/?since={version}").json()
+        self.assertEqual(sorted(g["id"] for g in changes["upserts"]), [first.pk, second.pk])
+
+
+def make_glb(payload=None):
+    """GLB minimal : en-tête et un chunk JSON"""
+    document = json.dumps({"asset": {"version": "2.0"}, **(payload or {})}).encode()
+    document += b" " * (-len(document) % 4)
+    chunk = struct.pack("<II", len(document), 0x4E4F534A) + document
+    return struct.pack("<4sII", b"glTF", 2, 12 + len(chunk)) + chunk
+
+
+STAGE_COMPUTES = (transcode_textures, generate_lods, compress_model, render_thumbnail)
+
+
+def make_mesh_glb(cells=16, texture_size=None):
+    """GLB avec une grille de 2 * cells² triangles (normales, UV) et une texture PNG optionnelle"""
+    steps = np.linspace(0.0, 1.0, cells + 1)
+    x, y = np.meshgrid(steps, steps)
+    z = 0.1 * np.sin(6 * x) * np.cos(6 * y)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3).astype(np.float32)
+    normals = np.tile(np.array([0, 0, 1], dtype=np.float32), (len(positions), 1))
+    uvs = np.stack([x, y], axis=-1).reshape(-1, 2).astype(np.float32)
+    corners = (np.arange(cells)[:, None] * (cells + 1) + np.arange(cells)).reshape(-1)
+    faces = np.concatenate([
+        np.stack([corners, corners + 1, corners + cells + 2], axis=1),
+        np.stack([corners, corners + cells + 2, corners + cells + 1], axis=1),
+    ])
+
+    glb = GLB({"asset": {"version": "2.0"}, "scene": 0, "scenes": [{"nodes": [0]}]}, [])
+    primitive = {
+        "attributes": {
+            "POSITION": glb.add_accessor(positions, TARGET_ARRAY_BUFFER, with_bounds=True),
+            "NORMAL": glb.add_accessor(normals, TARGET_ARRAY_BUFFER),
+            "TEXCOORD_0": glb.add_accessor(uvs, TARGET_ARRAY_BUFFER),
+        },
+        "indices": glb.add_indices(faces, len(positions)),
+        "mode": 4,
+    }
+    if texture_size:
+        pixels = np.random.default_rng(0).integers(0, 256, (texture_size, texture_size, 3))
+        image = io.BytesIO()
+        Image.fromarray(pixels.astype(np.uint8), "RGB").save(image, "PNG")
+        glb.document["images"] = [
+            {"bufferView": glb.add_view(image.getvalue()), "mimeType": "image/png"}
+        ]
+        glb.document["textures"] = [{"source": 0}]
+        glb.document["materials"] = [
+            {"pbrMetallicRoughness": {"baseColorTexture": {"index": 0}}}
+        ]
+        primitive["material"] = 0
+    glb.document["meshes"] = [{"primitives": [primitive]}]
+    glb.document["nodes"] = [{"mesh": 0}]
+    return glb.to_bytes()
+
+
+class WorkerModulesTests(SimpleTestCase):
+    def test_importable_without_django_settings(self):
+        # Les workers "spawn" importent ces modules sans django.setup()
+        modules = ["glb", "lod", "compression", "textures", "thumbnails"]
+        code = "; ".join(
+            [f"import backend.Base_threlte_dv.{name}" for name in modules]
+            + ["from django.conf import settings", "assert not settings.configured"]
+        )
+        env = {key: value for key, value in os.environ.items() if key != "DJANGO_SETTINGS_MODULE"}
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class ModelStageTestCase(SimpleTestCase):
+    """Étapes d'ingestion appelées directement, comme dans un worker du pool"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+
+    def source(self, content=None, **kwargs):
+        path = os.path.join(self.output_dir, "source.glb")
+        with open(path, "wb") as fh:
+            fh.write(content or make_mesh_glb(**kwargs))
+        return path
+
+    def inspect(self, path):
+        with open(path, "rb") as fh:
+            return inspect_stream(fh)
+
+
+class LodTests(ModelStageTestCase):
+    def test_triangle_counts_per_level(self):
+        ratios = [0.5, 0.25, 0.1]
+        outputs = generate_lods(
+            self.source(cells=32), self.output_dir, {"ratios": ratios, "min_triangles": 0}
+        )
+        self.assertEqual([output["variant"] for output in outputs], ["lod1", "lod2", "lod3"])
+        for output, ratio in zip(outputs, ratios):
+            metadata = output["metadata"]
+            self.assertEqual(metadata["source_triangles"], 2048)
+            # Nombre visé atteint à la résolution de grille près
+            self.assertLessEqual(metadata["triangles"], 2048 * ratio)
+            self.assertGreater(metadata["triangles"], 2048 * ratio * 0.75)
+            stats = self.inspect(output["path"])
+            self.assertEqual(
+                (stats["triangles"], stats["vertices"]),
+                (metadata["triangles"], metadata["vertices"]),
+            )
+
+    def test_light_models_are_skipped(self):
+        options = {"ratios": [0.5], "min_triangles": 5000}
+        self.assertEqual(generate_lods(self.source(cells=4), self.output_dir, options), [])
+
+
+class CompressionTests(ModelStageTestCase):
+    def test_quantized_output_is_a_valid_glb(self):
+        source = self.source(cells=16)
+        outputs = compress_model(source, self.output_dir, {"codec": "quantize"})
+        self.assertEqual(len(outputs), 1)
+        metadata = outputs[0]["metadata"]
+        self.assertEqual(metadata["codec"], "quantize")
+        self.assertLess(metadata["bytes"], metadata["original_bytes"])
+
+        glb = GLB.load(outputs[0]["path"])
+        self.assertIn("KHR_mesh_quantization", glb.document["extensionsRequired"])
+        attributes = glb.document["meshes"][0]["primitives"][0]["attributes"]
+        self.assertEqual(glb.document["accessors"][attributes["POSITION"]]["componentType"], 5123)
+        # Même maillage, même boîte une fois la déquantification (nœud enfant) appliquée
+        before, after = self.inspect(source), self.inspect(outputs[0]["path"])
+        self.assertEqual(
+            (after["vertices"], after["triangles"]), (before["vertices"], before["triangles"])
+        )
+        np.testing.assert_allclose(after["bbox"]["min"], before["bbox"]["min"], atol=1e-4)
+        np.testing.assert_allclose(after["bbox"]["max"], before["bbox"]["max"], atol=1e-4)
+
+        # Déjà compressé : rien à produire
+        self.assertEqual(
+            compress_model(outputs[0]["path"], self.output_dir, {"codec": "quantize"}), []
+        )
+
+
+class TextureTests(ModelStageTestCase):
+    def test_textures_are_resized_to_webp(self):
+        options = {"max_size": 32, "quality": 80, "cache_dir": self.output_dir}
+        outputs = transcode_textures(self.source(texture_size=64), self.output_dir, options)
+        self.assertEqual(len(outputs), 1)
+        report = outputs[0]["metadata"]["textures"][0]
+        self.assertEqual((report["size_before"], report["size_after"]), ([64, 64], [32, 32]))
+
+        glb = GLB.load(outputs[0]["path"])
+        self.assertIn("EXT_texture_webp", glb.document["extensionsRequired"])
+        image = glb.document["images"][0]
+        self.assertEqual(image["mimeType"], "image/webp")
+        self.assertEqual(
+            glb.document["textures"][0], {"extensions": {"EXT_texture_webp": {"source": 0}}}
+        )
+        with Image.open(io.BytesIO(glb.views[image["bufferView"]])) as webp:
+            self.assertEqual((webp.format, webp.size), ("WEBP", (32, 32)))
+
+        # Deuxième passage : image servie par le cache (hash du contenu)
+        outputs = transcode_textures(self.source(texture_size=64), self.output_dir, options)
+        self.assertTrue(outputs[0]["metadata"]["textures"][0]["cached"])
+
+    def test_model_without_texture_is_skipped(self):
+        self.assertEqual(transcode_textures(self.source(), self.output_dir, {}), [])
+
+
+class ThumbnailTests(ModelStageTestCase):
+    def test_model_thumbnail(self):
+        outputs = render_thumbnail(self.source(), self.output_dir, {"size": 64, "quality": 80})
+        self.assertEqual([(o["variant"], o["format"]) for o in outputs], [("thumbnail", "webp")])
+        self.assertEqual(outputs[0]["metadata"]["triangles"], 512)
+        with Image.open(outputs[0]["path"]) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (64, 64)))
+
+    def test_image_thumbnail_keeps_aspect_ratio(self):
+        path = os.path.join(self.output_dir, "plane.png")
+        Image.new("RGB", (200, 100), "red").save(path)
+        outputs = render_thumbnail(path, self.output_dir, {"size": 64})
+        with Image.open(outputs[0]["path"]) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (64, 32)))
+
+    def test_unreadable_file_is_skipped(self):
+        path = os.path.join(self.output_dir, "notes.txt")
+        with open(path, "w") as fh:
+            fh.write("pas une image")
+        self.assertEqual(render_thumbnail(path, self.output_dir, {}), [])
+
+
+class CompressionCodecTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source_path = os.path.join(self.staging_dir, "grid.glb")
+        with open(self.source_path, "wb") as fh:
+            fh.write(make_mesh_glb())
+
+    def test_cli_failure_is_recorded_and_retried(self):
+        with override_settings(
+            MODEL_COMPRESSION_CODEC="draco", MODEL_COMPRESSION_CLI="dv-threlte-missing-cli"
+        ):
+            stage = STAGES["compression"]
+            outputs = stage.compute(self.source_path, self.staging_dir, stage.options())
+            metadata = outputs[0]["metadata"]
+            # Repli : le codec réellement utilisé est enregistré, pas celui demandé
+            self.assertEqual(metadata["codec"], "quantize")
+            self.assertIn("dv-threlte-missing-cli", metadata["fallback_reason"])
+
+            asset = CloudinaryAsset.objects.create(
+                public_id="models/grid", url="https://fake-storage.local/grid"
+            )
+            stage.finalize(asset, outputs)
+            self.assertEqual(asset.metadata["compression"]["requested_codec"], "draco")
+            self.assertFalse(stage.is_done(asset))
+
+        with override_settings(MODEL_COMPRESSION_CODEC="quantize"):
+            stage.finalize(asset, stage.compute(self.source_path, self.staging_dir, stage.options()))
+            self.assertTrue(stage.is_done(asset))
+
+    def test_system_check_reports_missing_cli(self):
+        self.assertEqual(settings.MODEL_COMPRESSION_CODEC, "quantize")
+        self.assertEqual(check_compression_codec(None), [])
+        with override_settings(
+            MODEL_PROCESSING=True,
+            MODEL_COMPRESSION_CODEC="draco",
+            MODEL_COMPRESSION_CLI="dv-threlte-missing-cli",
+        ):
+            self.assertEqual(
+                [message.id for message in check_compression_codec(None)],
+                ["Base_threlte_dv.W002"],
+            )
+        with override_settings(MODEL_COMPRESSION_CODEC="zstd"):
+            self.assertEqual(
+                [message.id for message in check_compression_codec(None)],
+                ["Base_threlte_dv.E001"],
+            )
+
+
+class AsyncUploadTests(PipelineTestCase):
+    def test_upload_runs_in_worker(self):
+        content = make_glb()
+        geometry = self.upload(content)
+
+        self.assertEqual(geometry.upload_status, Geometry.UPLOAD_READY)
+        self.assertEqual(geometry.type, "gltf_model")
+        asset = geometry.asset
+        self.assertEqual(asset.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(geometry.model_url, asset.url)
+        self.assertEqual(get_storage_backend().objects[asset.public_id], content)
+        self.assertEqual(asset.metadata["model"]["format"], "glb")
+        # Fichier de staging supprimé après l'envoi
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+    def test_failed_upload_marks_geometry(self):
+        with mock.patch.object(
+            FakeStorageBackend, "put", side_effect=RuntimeError("stockage indisponible")
+        ), self.assertLogs("backend.Base_threlte_dv.upload_pipeline", "ERROR"):
+            geometry = self.upload(make_glb())
+
+        self.assertEqual(geometry.upload_status, Geometry.UPLOAD_FAILED)
+        self.assertEqual(geometry.upload_error, "stockage indisponible")
+        self.assertIsNone(geometry.asset_id)
+        self.assertFalse(CloudinaryAsset.objects.exists())
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+
+class ModelInspectionTests(PipelineTestCase):
+    def test_stats_and_bbox(self):
+        stats = inspect_stream(io.BytesIO(make_mesh_glb(cells=4, texture_size=8)))
+        self.assertEqual(
+            {key: stats[key] for key in ("meshes", "primitives", "vertices", "triangles")},
+            {"meshes": 1, "primitives": 1, "vertices": 25, "triangles": 32},
+        )
+        self.assertEqual((stats["materials"], stats["textures"], stats["images"]), (1, 1, 1))
+        self.assertEqual(stats["bbox"]["min"][:2], [0.0, 0.0])
+        self.assertEqual(stats["bbox"]["max"][:2], [1.0, 1.0])
+        self.assertGreater(stats["bytes"]["bin"], 0)
+
+        # Transformation du nœud appliquée à la boîte de l'accessor
+        stats = inspect_stream(io.BytesIO(make_glb({
+            "accessors": [
+                {"count": 3, "type": "VEC3", "componentType": 5126,
+                 "min": [-1, -1, -1], "max": [1, 1, 1]},
+            ],
+            "meshes": [{"primitives": [{"attributes": {"POSITION": 0}}]}],
+            "nodes": [{"mesh": 0, "translation": [10, 0, 0], "scale": [2, 2, 2]}],
+            "scenes": [{"nodes": [0]}],
+        })))
+        self.assertEqual(stats["triangles"], 1)
+        self.assertEqual(
+            stats["bbox"],
+            {"min": [8.0, -2.0, -2.0], "max": [12.0, 2.0, 2.0], "size": [4.0, 4.0, 4.0]},
+        )
+
+    def test_upload_records_stats(self):
+        geometry = self.upload(make_mesh_glb(cells=4))
+        self.assertEqual(geometry.asset.metadata["model"]["triangles"], 32)
+
+    def test_invalid_json_is_rejected(self):
+        document = b"{pas du json}   "
+        content = (
+            struct.pack("<4sII", b"glTF", 2, 20 + len(document))
+            + struct.pack("<II", len(document), 0x4E4F534A)
+            + document
+        )
+        with self.assertRaisesMessage(ModelInspectionError, "JSON glTF invalide"):
+            inspect_stream(io.BytesIO(content))
+        with self.assertRaisesMessage(ModelInspectionError, "Structure glTF invalide"):
+            inspect_stream(io.BytesIO(make_glb({"meshes": "cube"})))
+
+        # Upload accepté, mais sans statistiques
+        with self.assertLogs("backend.Base_threlte_dv.model_inspection", "WARNING"):
+            geometry = self.upload(content)
+        self.assertEqual(geometry.upload_status, Geometry.UPLOAD_READY)
+        self.assertNotIn("model", geometry.asset.metadata or {})
+
+
+@override_settings(
+    MODEL_PROCESSING=True,
+    MODEL_PROCESSING_EXECUTOR="backend.Base_threlte_dv.upload_pipeline.InlineExecutor",
+    MODEL_PROCESSING_STAGES=["textures", "lod", "compression", "thumbnail"],
+    MODEL_LOD_MIN_TRIANGLES=0,
+    MODEL_TEXTURE_MAX_SIZE=32,
+    MODEL_COMPRESSION_CODEC="quantize",
+    MODEL_THUMBNAIL_SIZE=64,
+)
+class ModelProcessingTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = override_settings(
+            MODEL_TEXTURE_CACHE_DIR=os.path.join(self.staging_dir, "textures")
+        )
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.computed = []
+        submit = InlineExecutor.submit
+
+        def recording_submit(executor, fn, *args, **kwargs):
+            if fn in STAGE_COMPUTES:
+                self.computed.append(fn.__name__)
+            return submit(executor, fn, *args, **kwargs)
+
+        patcher = mock.patch.object(InlineExecutor, "submit", recording_submit)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stages_run_in_order_and_are_served(self):
+        geometry = self.upload(make_mesh_glb(cells=32, texture_size=64))
+        self.assertEqual(
+            self.computed,
+            ["transcode_textures", "generate_lods", "compress_model", "render_thumbnail"],
+        )
+
+        asset = geometry.asset
+        variants = {variant.variant: variant for variant in asset.variants.all()}
+        self.assertEqual(
+            set(variants), {"textures", "lod1", "lod2", "lod3", "compressed", "thumbnail"}
+        )
+        objects = get_storage_backend().objects
+        self.assertTrue(all(variant.public_id in objects for variant in variants.values()))
+        # Étapes suivantes alimentées par la variante "textures"
+        for name in ("lod1", "compressed"):
+            glb = GLB.from_bytes(objects[variants[name].public_id])
+            self.assertIn("EXT_texture_webp", glb.extensions_used)
+
+        data = self.client.get(f"/api/geometries/{geometry.pk}/").json()
+        self.assertEqual(data["model_url"], variants["compressed"].url)
+        self.assertEqual(data["original_model_url"], asset.url)
+        self.assertEqual([lod["level"] for lod in data["lods"]], [1, 2, 3])
+        self.assertEqual(data["lods"][0]["url"], variants["lod1"].url)
+        self.assertEqual(
+            data["lods"][0]["triangles"], variants["lod1"].metadata["lod"]["triangles"]
+        )
+        self.assertEqual(data["thumbnail_url"], variants["thumbnail"].url)
+        self.assertEqual(data["asset"]["compression"]["codec"], "quantize")
+
+        # Rejoué : toutes les étapes sont faites, rien n'est recalculé
+        self.computed.clear()
+        stored = dict(objects)
+        self.assertEqual(process_model_asset(asset.pk), {})
+        self.assertEqual(self.computed, [])
+        self.assertEqual(asset.variants.count(), 6)
+        self.assertEqual(get_storage_backend().objects, stored)
+
+
+class ChunkedUploadTests(PipelineTestCase):
+    def open_session(self, size, filename="chair.glb"):
+        response = self.client.post(
+            "/api/uploads/", {"filename": filename, "size": size}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def put_chunk(self, session_id, data, start, total, crc=None):
+        headers = {"HTTP_CONTENT_RANGE": f"bytes {start}-{start + len(data) - 1}/{total}"}
+        if crc is not None:
+            headers["HTTP_X_CHUNK_CRC32"] = crc
+        return self.client.put(
+            f"/api/uploads/{session_id}/",
+            data=data,
+            content_type="application/octet-stream",
+            **headers,
+        )
+
+    def finalize(self, session_id, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f"/api/uploads/{session_id}/finalize/", data, content_type="application/json"
+            )
+
+    def test_crc_mismatch_then_resume(self):
+        content = make_glb({"scene": 0})
+        head, tail = content[:16], content[16:]
+        session_id = self.open_session(len(content))
+        self.assertEqual(self.put_chunk(session_id, head, 0, len(content)).status_code, 200)
+
+        # Morceau corrompu en transit : rejeté, l'offset ne bouge pas
+        response = self.put_chunk(session_id, tail, 16, len(content), crc="00000000")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["offset"], 16)
+
+        # Reprise : le client relit l'offset et renvoie la suite
+        offset = self.client.get(f"/api/uploads/{session_id}/").json()["offset"]
+        response = self.put_chunk(
+            session_id, content[offset:], offset, len(content),
+            crc=f"{zlib.crc32(content[offset:]):08x}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["crc32"], f"{zlib.crc32(content):08x}")
+
+        self.assertEqual(self.finalize(session_id, crc32="deadbeef").status_code, 422)
+        response = self.finalize(session_id, crc32=f"{zlib.crc32(content):08x}")
+        self.assertEqual(response.status_code, 201, response.content)
+
+        geometry = Geometry.objects.get(pk=response.json()["id"])
+        self.assertEqual(geometry.name, "chair")
+        self.assertEqual(geometry.upload_status, Geometry.UPLOAD_READY)
+        self.assertEqual(get_storage_backend().objects[geometry.asset.public_id], content)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.status, UploadSession.STATUS_COMPLETE)
+        self.assertEqual(self.finalize(session_id).status_code, 409)
+
+    def test_rejects_out_of_range_and_out_of_order_chunks(self):
+        session_id = self.open_session(10)
+        self.assertEqual(self.put_chunk(session_id, b"0123456789AB", 0, 12).status_code, 416)
+        self.assertEqual(self.put_chunk(session_id, b"01234", 0, 12).status_code, 416)
+        self.assertEqual(self.put_chunk(session_id, b"56789", 5, 10).status_code, 409)
+        self.assertEqual(self.put_chunk(session_id, b"01234", 0, 10).status_code, 200)
+        # Morceau déjà reçu (réponse perdue, client qui renvoie)
+        self.assertEqual(self.put_chunk(session_id, b"01234", 0, 10).status_code, 409)
+        # Incomplet : pas de finalisation
+        self.assertEqual(self.finalize(session_id).status_code, 409)
+
+    def test_finalize_requires_crc(self):
+        session_id = self.open_session(5)
+        self.assertEqual(self.put_chunk(session_id, b"01234", 0, 5).status_code, 200)
+        self.assertEqual(self.finalize(session_id).status_code, 400)
+        self.assertEqual(
+            self.finalize(session_id, crc32=f"{zlib.crc32(b'01234'):08x}").status_code, 201
+        )
+
+    def test_body_streamed_without_lock(self):
+        session_id = self.open_session(10)
+        staged_path = UploadSession.objects.get(pk=session_id).staged_path
+        depth = len(connection.atomic_blocks)
+        write_chunk = UploadSessionView._write_chunk
+        depths = []
+
+        def racing_write_chunk(view, *args):
+            depths.append(len(connection.atomic_blocks))
+            result = write_chunk(view, *args)
+            # Renvoi concurrent du même morceau, arrivé le premier
+            UploadSession.objects.filter(pk=session_id).update(received_bytes=5)
+            return result
+
+        with mock.patch.object(UploadSessionView, "_write_chunk", racing_write_chunk):
+            response = self.put_chunk(session_id, b"abcde", 0, 10)
+        self.assertEqual(depths, [depth])
+        # Compare-and-set perdu : 409, fichier de staging intact, pas de fichier temporaire
+        self.assertEqual((response.status_code, response.json()["offset"]), (409, 5))
+        with open(staged_path, "rb") as fh:
+            self.assertEqual(fh.read(), b"")
+        self.assertEqual(os.listdir(self.staging_dir), [os.path.basename(staged_path)])
+
+    def test_purge_abandoned_sessions(self):
+        stale_id = self.open_session(10)
+        active_id = self.open_session(10)
+        UploadSession.objects.filter(pk=stale_id).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+        stale = UploadSession.objects.get(pk=stale_id)
+        orphan = os.path.join(self.staging_dir, "orphan.glb")
+        open(orphan, "wb").close()
+        os.utime(orphan, (0, 0))
+
+        self.assertEqual(purge_upload_sessions(ttl=3600), (1, 1))
+        self.assertFalse(UploadSession.objects.filter(pk=stale_id).exists())
+        self.assertFalse(os.path.exists(stale.staged_path))
+        self.assertFalse(os.path.exists(orphan))
+        active = UploadSession.objects.get(pk=active_id)
+        self.assertTrue(os.path.exists(active.staged_path))
+
+
+class DeduplicationTests(PipelineTestCase):
+    def test_same_content_reuses_asset(self):
+        content = make_glb()
+        with mock.patch.object(
+            FakeStorageBackend, "put", autospec=True, side_effect=FakeStorageBackend.put
+        ) as put:
+            first = self.upload(content)
+            second = self.upload(content, name="copy.glb")
+        self.assertEqual(put.call_count, 1)
+        self.assertEqual(second.upload_status, Geometry.UPLOAD_READY)
+        self.assertEqual(second.asset_id, first.asset_id)
+        self.assertEqual(second.model_url, first.model_url)
+        self.assertEqual(CloudinaryAsset.objects.count(), 1)
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+    @override_settings(UPLOAD_ASYNC=False)
+    def test_same_content_reuses_asset_without_worker(self):
+        first = self.upload(make_glb())
+        second = self.upload(make_glb())
+        third = self.upload(make_glb({"scene": 0}))
+        self.assertEqual(second.asset_id, first.asset_id)
+        self.assertNotEqual(third.asset_id, first.asset_id)
+        self.assertEqual(len(get_storage_backend().objects), 2)
+
+    def test_shared_file_survives_geometry_deletion(self):
+        first = self.upload(make_glb())
+        second = self.upload(make_glb())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/geometries/{first.pk}/").status_code, 204)
+        self.assertFalse(RemoteDeletion.objects.exists())
+        second.refresh_from_db()
+        self.assertIn(second.asset.public_id, get_storage_backend().objects)
+
+
+def cloudinary_resource(public_id, created_at, **fields):
+    return {
+        "public_id": public_id,
+        "secure_url": f"https://res.cloudinary.com/demo/raw/upload/{public_id}",
+        "resource_type": "raw",
+        "original_filename": public_id.rsplit("/", 1)[-1],
+        "format": "",
+        "bytes": 10,
+        "created_at": created_at,
+        **fields,
+    }
+
+
+class CloudinarySyncTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.listing = []
+        self.requests = []
+        patchers = [
+            mock.patch.object(
+                cloudinary_sync, "get_cloudinary_credentials", return_value=("demo", "k", "s")
+            ),
+            mock.patch.object(cloudinary_sync, "fetch_resources", side_effect=self.fetch),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, auth, cloud_name, resource_type, start_at=None):
+        self.requests.append(start_at)
+        return [
+            resource
+            for resource in self.listing
+            if start_at is None or parse_datetime(resource["created_at"]) >= start_at
+        ]
+
+    def sync(self, full=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return cloudinary_sync.sync_cloudinary(full=full, resource_types=["raw"])["raw"]
+
+    def test_high_water_mark(self):
+        self.listing = [
+            cloudinary_resource("models/a", "2026-01-01T10:00:00Z"),
+            cloudinary_resource("models/b", "2026-01-02T10:00:00Z"),
+        ]
+        self.assertEqual(self.sync()["created"], 2)
+        mark = CloudinarySyncState.objects.get(resource_type="raw").last_created_at
+        self.assertEqual(mark, parse_datetime("2026-01-02T10:00:00Z"))
+
+        self.listing.append(cloudinary_resource("models/c", "2026-01-03T10:00:00Z"))
+        stats = self.sync()
+        # Seuls les assets depuis le dernier created_at sont demandés
+        self.assertEqual(self.requests[-1], mark)
+        self.assertEqual((stats["fetched"], stats["created"], stats["unchanged"]), (2, 1, 1))
+        self.assertEqual(
+            CloudinarySyncState.objects.get(resource_type="raw").last_created_at,
+            parse_datetime("2026-01-03T10:00:00Z"),
+        )
+
+        stats = self.sync(full=True)
+        self.assertIsNone(self.requests[-1])
+        self.assertEqual((stats["fetched"], stats["created"], stats["unchanged"]), (3, 0, 3))
+        self.assertEqual(CloudinaryAsset.objects.count(), 3)
+
+    def test_concurrently_created_rows_are_not_counted(self):
+        self.listing = [
+            cloudinary_resource("models/a", "2026-01-01T10:00:00Z"),
+            cloudinary_resource("models/b", "2026-01-01T10:00:00Z"),
+        ]
+        events = []
+
+        def record(sender, action, public_ids, **kwargs):
+            events.append((action, public_ids))
+
+        cloudinary_assets_changed.connect(record)
+        self.addCleanup(cloudinary_assets_changed.disconnect, record)
+        insert_assets = cloudinary_sync.insert_assets
+
+        def racing_insert(assets):
+            # Upload de "models/b" entre la lecture des assets existants et l'insertion
+            CloudinaryAsset.objects.create(
+                public_id="models/b", url="https://fake-storage.local/b", content_hash="b"
+            )
+            return insert_assets(assets)
+
+        with mock.patch.object(cloudinary_sync, "insert_assets", side_effect=racing_insert):
+            stats = self.sync()
+        self.assertEqual(stats["created"], 1)
+        self.assertIn((ASSET_CREATED, ["models/a"]), events)
+        self.assertEqual(
+            CloudinaryAsset.objects.get(public_id="models/b").url, "https://fake-storage.local/b"
+        )
+
+    def test_pipeline_assets_are_not_clobbered(self):
+        CloudinaryAsset.objects.create(
+            public_id="models/chair", url="https://fake-storage.local/chair",
+            file_name="chair.glb", format="glb", content_hash="abc", asset_type="raw",
+        )
+        CloudinaryAsset.objects.create(
+            public_id="models/old", url="https://res.cloudinary.com/demo/old",
+            file_name="old", format="png", asset_type="image",
+        )
+        self.listing = [
+            cloudinary_resource("models/chair", "2026-01-01T10:00:00Z", asset_id="a1"),
+            cloudinary_resource(
+                "models/old", "2026-01-01T10:00:00Z", resource_type="image",
+                original_filename="renamed",
+            ),
+        ]
+        self.assertEqual(self.sync()["updated"], 2)
+
+        chair = CloudinaryAsset.objects.get(public_id="models/chair")
+        # Asset du pipeline : nom, format et URL font foi, seuls les vides sont complétés
+        self.assertEqual(
+            (chair.url, chair.file_name, chair.format, chair.asset_id),
+            ("https://fake-storage.local/chair", "chair.glb", "glb", "a1"),
+        )
+        old = CloudinaryAsset.objects.get(public_id="models/old")
+        # Format vide côté Cloudinary : la valeur connue est conservée
+        self.assertEqual((old.file_name, old.format), ("renamed", "png"))
+
+        self.assertEqual(self.sync(full=True)["unchanged"], 2)
+
+
+class SyncSchedulerTests(PipelineTestCase):
+    window = 0.05
+
+    def make_scheduler(self, run=None):
+        self.runs = []
+        self.ran = threading.Semaphore(0)
+
+        def counting_run():
+            self.runs.append(threading.current_thread().name)
+            if run is not None:
+                run()
+            self.ran.release()
+
+        return cloudinary_sync.SyncScheduler(run=counting_run, window=self.window)
+
+    def wait_for_runs(self, count):
+        for _ in range(count):
+            self.assertTrue(self.ran.acquire(timeout=5))
+        # Aucune exécution supplémentaire après plusieurs fenêtres
+        self.assertFalse(self.ran.acquire(timeout=self.window * 4))
+        self.assertEqual(len(self.runs), count)
+
+    @override_settings(CLOUDINARY_AUTO_SYNC=True)
+    def test_commit_triggers_are_debounced(self):
+        scheduler = self.make_scheduler()
+        with mock.patch.object(auto_sync_signals, "sync_scheduler", scheduler):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                for name in ("a", "b", "c"):
+                    CloudinaryAsset.objects.create(
+                        public_id=f"models/{name}", url=f"https://fake-storage.local/{name}"
+                    )
+            self.assertEqual(callbacks.count(scheduler.trigger), 3)
+            self.wait_for_runs(1)
+
+    def test_trigger_during_sync_runs_once_more(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_run():
+            if len(self.runs) == 1:
+                # Écritures de la synchronisation elle-même : ignorées
+                scheduler.trigger()
+                started.set()
+                self.assertTrue(release.wait(timeout=5))
+
+        scheduler = self.make_scheduler(blocking_run)
+        scheduler.trigger()
+        self.assertTrue(started.wait(timeout=5))
+        for _ in range(3):
+            scheduler.trigger()
+        release.set()
+        self.wait_for_runs(2)
+
+
+class AssetEventsTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        cloudinary_assets_changed.connect(self.record)
+        self.addCleanup(cloudinary_assets_changed.disconnect, self.record)
+
+    def record(self, sender, action, public_ids, **kwargs):
+        self.events.append((action, sorted(public_ids)))
+
+    def batches(self, callbacks):
+        return [callback for callback in callbacks if isinstance(callback, PendingAssetEvents)]
+
+    def create_asset(self, public_id, **fields):
+        return CloudinaryAsset.objects.create(
+            public_id=public_id, url=f"https://fake-storage.local/{public_id}", **fields
+        )
+
+    def test_one_event_per_action_and_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                source = self.create_asset("s")
+                for level in range(3):
+                    self.create_asset(f"v{level}", source=source, variant=f"lod{level}")
+                self.create_asset("other").delete()
+        self.assertEqual(len(self.batches(callbacks)), 1)
+        self.assertEqual(
+            self.events,
+            [(ASSET_CREATED, ["other", "s", "v0", "v1", "v2"]), (ASSET_DELETED, ["other"])],
+        )
+
+        self.events.clear()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                # Cascade : un post_delete par variante, un seul événement
+                source.delete()
+        self.assertEqual(len(self.batches(callbacks)), 1)
+        self.assertEqual(self.events, [(ASSET_DELETED, ["s", "v0", "v1", "v2"])])
+
+    def test_rolled_back_savepoint_does_not_swallow_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        self.create_asset("lost")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.create_asset("kept")
+        self.assertEqual(self.events, [(ASSET_CREATED, ["kept"])])
+
+        self.events.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.create_asset("next")
+        self.assertEqual(self.events, [(ASSET_CREATED, ["next"])])
+
+
+def create_link_fixtures(Geometry, CloudinaryAsset):
+    """Trois géométries sans asset : par URL, par public_id extrait de l'URL, sans correspondance"""
+    by_url = CloudinaryAsset.objects.create(
+        public_id="dv-threlte/models/a.glb",
+        url="https://res.cloudinary.com/demo/raw/upload/v1/dv-threlte/models/a.glb",
+    )
+    by_public_id = CloudinaryAsset.objects.create(
+        public_id="dv-threlte/models/b.glb",
+        url="https://res.cloudinary.com/demo/raw/upload/v2/dv-threlte/models/b.glb",
+    )
+    geometries = [
+        Geometry.objects.create(name="a", type="gltf_model", model_url=by_url.url),
+        Geometry.objects.create(
+            name="b", type="gltf_model",
+            model_url="https://res.cloudinary.com/demo/raw/upload/v1/dv-threlte/models/b.glb",
+        ),
+        Geometry.objects.create(
+            name="c", type="gltf_model",
+            model_url="https://res.cloudinary.com/demo/raw/upload/v1/dv-threlte/models/c.glb",
+        ),
+    ]
+    return [geometry.pk for geometry in geometries], [by_url.pk, by_public_id.pk, None]
+
+
+class LinkGeometriesCommandTests(PipelineTestCase):
+    def test_links_by_url_then_public_id(self):
+        geometry_ids, expected = create_link_fixtures(Geometry, CloudinaryAsset)
+        output = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("link_geometries_to_assets", stdout=output)
+        # Correspondances exactes : une seule requête sur les assets, pas une par géométrie
+        exact_lookups = [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"Base_threlte_dv_cloudinaryasset"' in query["sql"] and "LIKE" not in query["sql"]
+        ]
+        self.assertEqual(len(exact_lookups), 1)
+
+        self.assertEqual(
+            [Geometry.objects.get(pk=pk).asset_id for pk in geometry_ids], expected
+        )
+        self.assertIn("2 géométries liées, 1 non trouvées", output.getvalue())
+
+
+class BackfillGeometryAssetMigrationTests(TransactionTestCase):
+    migrate_from = [("Base_threlte_dv", "0019_geometry_asset")]
+    migrate_to = [("Base_threlte_dv", "0020_backfill_geometry_asset")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_backfill(self):
+        old_apps = self.migrate(self.migrate_from)
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        geometry_ids, expected = create_link_fixtures(
+            old_apps.get_model("Base_threlte_dv", "Geometry"),
+            old_apps.get_model("Base_threlte_dv", "CloudinaryAsset"),
+        )
+
+        new_apps = self.migrate(self.migrate_to)
+        Geometry = new_apps.get_model("Base_threlte_dv", "Geometry")
+        self.assertEqual(
+            [Geometry.objects.get(pk=pk).asset_id for pk in geometry_ids], expected
+        )
+
+
+class RemoteDeletionTests(PipelineTestCase):
+    def delete_geometry(self, geometry):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/api/geometries/{geometry.pk}/")
+        self.assertEqual(response.status_code, 204)
+
+    def failing_storage(self):
+        return mock.patch.object(
+            FakeStorageBackend, "delete_many", side_effect=RuntimeError("stockage indisponible")
+        )
+
+    def make_due(self):
+        RemoteDeletion.objects.update(next_attempt_at=timezone.now())
+
+    def test_file_deleted_after_commit(self):
+        geometry = self.upload(make_glb())
+        key = geometry.asset.public_id
+        self.delete_geometry(geometry)
+
+        self.assertNotIn(key, get_storage_backend().objects)
+        deletion = RemoteDeletion.objects.get()
+        self.assertEqual((deletion.key, deletion.backend), (key, "fake"))
+        self.assertEqual((deletion.status, deletion.attempts), (RemoteDeletion.STATUS_DONE, 1))
+        self.assertFalse(CloudinaryAsset.objects.exists())
+
+    def test_failed_deletion_is_retried(self):
+        geometry = self.upload(make_glb())
+        key = geometry.asset.public_id
+        with self.failing_storage(), self.assertLogs(remote_deletion.logger, "ERROR"):
+            self.delete_geometry(geometry)
+
+        deletion = RemoteDeletion.objects.get()
+        self.assertEqual(deletion.status, RemoteDeletion.STATUS_PENDING)
+        self.assertEqual(deletion.last_error, "stockage indisponible")
+        self.assertGreater(deletion.next_attempt_at, timezone.now())
+        self.assertIn(key, get_storage_backend().objects)
+        # Pas encore dû : rien n'est tenté
+        self.assertEqual(remote_deletion.reap_remote_deletions()["deleted"], 0)
+
+        self.make_due()
+        self.assertEqual(remote_deletion.reap_remote_deletions()["deleted"], 1)
+        self.assertNotIn(key, get_storage_backend().objects)
+        deletion.refresh_from_db()
+        self.assertEqual((deletion.status, deletion.attempts), (RemoteDeletion.STATUS_DONE, 2))
+
+    def replace_file(self, geometry, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/geometries/{geometry.pk}/",
+                encode_multipart(BOUNDARY, {"model_file": SimpleUploadedFile("chair.glb", content)}),
+                content_type=MULTIPART_CONTENT,
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        geometry.refresh_from_db()
+        return geometry
+
+    def test_replaced_file_is_deleted_with_its_variants(self):
+        geometry = self.upload(make_glb())
+        old = geometry.asset
+        CloudinaryAsset.objects.create(
+            public_id=f"{old.public_id}/lod1", url=f"{old.url}/lod1", source=old, variant="lod1"
+        )
+        get_storage_backend().objects[f"{old.public_id}/lod1"] = b"lod"
+
+        for upload_async in (True, False):
+            with self.subTest(upload_async=upload_async), override_settings(UPLOAD_ASYNC=upload_async):
+                content = make_glb({"extras": {"async": upload_async}})
+                geometry = self.replace_file(geometry, content)
+                self.assertEqual(get_storage_backend().objects[geometry.asset.public_id], content)
+                self.assertNotIn(old.public_id, get_storage_backend().objects)
+                self.assertNotIn(f"{old.public_id}/lod1", get_storage_backend().objects)
+                self.assertFalse(CloudinaryAsset.objects.filter(public_id__startswith=old.public_id).exists())
+                old = geometry.asset
+
+    def test_shared_file_is_kept_on_replace(self):
+        geometry = self.upload(make_glb())
+        shared = self.upload(make_glb()).asset
+        self.replace_file(geometry, make_glb({"extras": {"v": 2}}))
+
+        self.assertIn(shared.public_id, get_storage_backend().objects)
+        self.assertFalse(RemoteDeletion.objects.exists())
+
+    def test_upload_for_deleted_geometry_is_not_orphaned(self):
+        content = make_glb()
+        staged_path = os.path.join(self.staging_dir, "chair.glb")
+        with open(staged_path, "wb") as fh:
+            fh.write(content)
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertLogs(level="WARNING"):
+            self.assertIsNone(process_upload(0, staged_path, "chair.glb", "raw", content_hash))
+
+        deletion = RemoteDeletion.objects.get()
+        self.assertEqual((deletion.key, deletion.status), (content_key(content_hash), RemoteDeletion.STATUS_DONE))
+        self.assertEqual(get_storage_backend().objects, {})
+
+    @override_settings(REMOTE_DELETE_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        RemoteDeletion.objects.create(backend="fake", key="models/chair")
+        with self.failing_storage(), self.assertLogs(remote_deletion.logger, "ERROR"):
+            self.assertEqual(remote_deletion.reap_remote_deletions()["retried"], 1)
+            self.make_due()
+            self.assertEqual(remote_deletion.reap_remote_deletions()["failed"], 1)
+        self.assertEqual(RemoteDeletion.objects.get().status, RemoteDeletion.STATUS_FAILED)
+
+    def test_reupload_cancels_pending_deletion(self):
+        content = make_glb()
+        geometry = self.upload(content)
+        key = geometry.asset.public_id
+        with self.failing_storage(), self.assertLogs(remote_deletion.logger, "ERROR"):
+            self.delete_geometry(geometry)
+
+        # Même contenu ré-uploadé avant la nouvelle tentative
+        self.upload(content)
+        self.make_due()
+        self.assertEqual(remote_deletion.reap_remote_deletions()["deleted"], 0)
+        self.assertEqual(RemoteDeletion.objects.get().status, RemoteDeletion.STATUS_DONE)
+        self.assertEqual(get_storage_backend().objects[key], content)
+
+    def test_reused_key_is_skipped(self):
+        backend = get_storage_backend()
+        backend.put(io.BytesIO(b"data"), "models/shared")
+        RemoteDeletion.objects.create(backend="fake", key="models/shared")
+        # Clé de nouveau référencée sans passer par cancel_remote_deletions
+        CloudinaryAsset.objects.create(public_id="models/shared", url="https://fake-storage.local/s")
+
+        self.assertEqual(remote_deletion.reap_remote_deletions()["skipped"], 1)
+        self.assertIn("models/shared", backend.objects)
+        self.assertEqual(RemoteDeletion.objects.get().status, RemoteDeletion.STATUS_DONE)
+
+    def test_storage_called_outside_transaction(self):
+        RemoteDeletion.objects.create(backend="fake", key="models/chair")
+        depth = len(connection.atomic_blocks)
+        depths = []
+
+        def delete_many(backend, keys, resource_type="raw"):
+            depths.append(len(connection.atomic_blocks))
+            return set(keys)
+
+        with mock.patch.object(
+            FakeStorageBackend, "delete_many", autospec=True, side_effect=delete_many
+        ):
+            self.assertEqual(remote_deletion.reap_remote_deletions()["deleted"], 1)
+        self.assertEqual(depths, [depth])
+
+    def test_cancelled_during_call_is_not_marked(self):
+        RemoteDeletion.objects.create(backend="fake", key="models/chair")
+
+        def delete_many(backend, keys, resource_type="raw"):
+            # Upload concurrent de la même clé pendant l'appel au stockage
+            remote_deletion.cancel_remote_deletions("fake", keys)
+            return set(keys)
+
+        with mock.patch.object(
+            FakeStorageBackend, "delete_many", autospec=True, side_effect=delete_many
+        ), self.assertLogs(remote_deletion.logger, "ERROR"):
+            stats = remote_deletion.reap_remote_deletions()
+        self.assertEqual((stats["deleted"], stats["conflicts"]), (0, 1))
+        deletion = RemoteDeletion.objects.get()
+        self.assertEqual(deletion.last_error, "Annulée : clé de nouveau utilisée")
+
+
+def load_bulk_upload():
+    """scripts/bulk_upload.py n'est pas un paquet : chargé depuis son chemin"""
+    path = settings.BASE_DIR / "scripts" / "bulk_upload.py"
+    spec = importlib.util.spec_from_file_location("bulk_upload", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeCloudinaryClient:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+        self._lock = threading.Lock()
+
+    def upload(self, path, public_id, resource_type, **options):
+        with self._lock:
+            self.calls.append((public_id, resource_type))
+        if public_id in self.failing:
+            raise RuntimeError("quota dépassé")
+        return {"secure_url": f"https://res.cloudinary.com/demo/{resource_type}/{public_id}"}
+
+
+class BulkUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.bulk_upload = load_bulk_upload()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(root)
+        for name, content in (
+            ("static/models/chair.glb", b"glb"),
+            ("static/assets/sky.png", b"png"),
+            ("static/models/file-list.json", b"[]"),
+        ):
+            os.makedirs(os.path.dirname(name), exist_ok=True)
+            with open(name, "wb") as fh:
+                fh.write(content)
+        self.manifest_path = os.path.join(root, "manifest.json")
+
+    def run_upload(self, client):
+        uploader = self.bulk_upload.CloudinaryUploader(client=client)
+        manifest = self.bulk_upload.Manifest(self.manifest_path)
+        files = self.bulk_upload.iter_files(["static/models", "static/assets"])
+        return self.bulk_upload.bulk_upload(
+            uploader, manifest, files, workers=2, log=lambda message: None
+        )
+
+    def test_unchanged_files_are_skipped_on_next_run(self):
+        client = FakeCloudinaryClient()
+        stats = self.run_upload(client)
+        self.assertEqual((stats["uploaded"], stats["skipped"], stats["total"]), (2, 0, 2))
+        self.assertEqual(sorted(client.calls), [("assets/sky", "image"), ("models/chair", "raw")])
+
+        # Nouveau processus : l'état vient du manifeste sur disque
+        client = FakeCloudinaryClient()
+        self.assertEqual(self.run_upload(client)["skipped"], 2)
+        self.assertEqual(client.calls, [])
+
+        with open("static/models/chair.glb", "wb") as fh:
+            fh.write(b"glb v2")
+        # mtime modifié, contenu identique : pas de nouvel upload
+        os.utime("static/assets/sky.png", (0, 0))
+        stats = self.run_upload(client)
+        self.assertEqual((stats["uploaded"], stats["skipped"]), (1, 1))
+        self.assertEqual(client.calls, [("models/chair", "raw")])
+
+    def test_failed_file_is_retried_on_next_run(self):
+        with mock.patch.object(self.bulk_upload.time, "sleep"):
+            stats = self.run_upload(FakeCloudinaryClient(failing={"models/chair"}))
+        self.assertEqual((stats["uploaded"], stats["errors"]), (1, 1))
+
+        client = FakeCloudinaryClient()
+        stats = self.run_upload(client)
+        self.assertEqual((stats["uploaded"], stats["skipped"]), (1, 1))
+        self.assertEqual(client.calls, [("models/chair", "raw")])
+
+
+class StorageMetricsTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        blob_metrics.reset()
+        self.addCleanup(blob_metrics.reset)
+
+    def test_subclass_methods_are_instrumented(self):
+        class FlakyBackend(StorageBackend):
+            name = 'flaky "b"'
+
+            def put(self, source, key, resource_type="raw"):
+                if key == "broken":
+                    raise RuntimeError("stockage indisponible")
+                return {"url": key, "key": key, "bytes": 42}
+
+            def head(self, key, resource_type="raw"):
+                return None
+
+            def open(self, key, resource_type="raw"):
+                raise FileNotFoundError(key)
+
+        class ChildBackend(FlakyBackend):
+            pass
+
+        # Instrumenté une seule fois, méthodes héritées comprises
+        self.assertTrue(FlakyBackend.put.instrumented)
+        self.assertIs(ChildBackend.put, FlakyBackend.put)
+
+        backend = ChildBackend()
+        backend.put(io.BytesIO(b""), "a")
+        with self.assertRaises(RuntimeError):
+            backend.put(io.BytesIO(b""), "broken")
+        self.assertIsNone(backend.head("a"))
+        with self.assertRaises(FileNotFoundError):
+            backend.open("a")
+
+        snapshot = blob_metrics.snapshot()
+        put = snapshot[('flaky "b"', "put")]
+        self.assertEqual((put["outcomes"], put["bytes"]), ({"success": 1, "error": 1}, 42))
+        self.assertEqual(put["duration"]["count"], 2)
+        self.assertEqual(snapshot[('flaky "b"', "head")]["outcomes"], {"not_found": 1})
+        self.assertEqual(snapshot[('flaky "b"', "get")]["outcomes"], {"not_found": 1})
+
+    def test_prometheus_exposition(self):
+        backend = get_storage_backend()
+        backend.put(io.BytesIO(b"0123456789"), "models/a")
+        backend.head("models/missing")
+
+        response = self.client.get("/api/storage/metrics/")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE dv_blob_operations_total counter", lines)
+        self.assertIn("# TYPE dv_blob_operation_duration_seconds histogram", lines)
+        self.assertIn(
+            'dv_blob_operations_total{backend="fake",operation="put",outcome="success"} 1', lines
+        )
+        self.assertIn(
+            'dv_blob_operations_total{backend="fake",operation="head",outcome="not_found"} 1', lines
+        )
+        self.assertIn('dv_blob_bytes_total{backend="fake",operation="put"} 10', lines)
+        self.assertIn(
+            'dv_blob_operation_duration_seconds_bucket{backend="fake",operation="put",le="+Inf"} 1',
+            lines,
+        )
+        self.assertIn(
+            'dv_blob_operation_duration_seconds_count{backend="fake",operation="put"} 1', lines
+        )
+        # Chaque ligne d'échantillon : nom{labels} valeur
+        for line in lines:
+            if not line.startswith("#"):
+                self.assertRegex(line, r'^dv_blob_[a-z_]+\{[^}]*\} (NaN|[0-9.e+-]+)$')
+
+        # Guillemets échappés dans les labels
+        text = render_prometheus({('a"b', "put"): blob_metrics.get("fake", "put").snapshot()})
+        self.assertIn('backend="a\\"b"', text)
+
+
+class StorageProbeTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(storage_prober.probes.clear)
+
+    def test_probe_records_success_and_failures(self):
+        prober = StorageProber()
+        self.assertIsNone(prober.snapshot()["ok"])
+
+        state = prober.probe("fake")
+        self.assertTrue(state.ok)
+        # Fichier témoin écrit au premier passage seulement
+        self.assertIn(SENTINEL_KEY, get_storage_backend().objects)
+
+        with mock.patch.object(
+            FakeStorageBackend, "head", side_effect=RuntimeError("stockage indisponible")
+        ), self.assertLogs("backend.Base_threlte_dv.storage_probe", "WARNING"):
+            prober.probe("fake")
+            prober.probe("fake")
+        snapshot = prober.snapshot()
+        probe = snapshot["backends"]["fake"]
+        self.assertFalse(snapshot["ok"])
+        self.assertEqual(
+            (probe["ok"], probe["consecutive_failures"], probe["last_error"]),
+            (False, 2, "stockage indisponible"),
+        )
+        self.assertIsNotNone(probe["last_success"])
+        self.assertEqual(probe["latency"]["count"], 3)
+
+    def test_status_and_health_serve_cached_result(self):
+        storage_prober.probe("fake")
+        checked = storage_prober.probes["fake"].last_checked
+
+        # Aucun appel au stockage pendant la requête
+        with mock.patch.object(
+            FakeStorageBackend, "head", side_effect=AssertionError("appel réseau")
+        ), mock.patch.object(FakeStorageBackend, "put", side_effect=AssertionError("appel réseau")):
+            status = self.client.get("/api/storage/status/").json()
+            health = self.client.get("/health/").json()
+
+        self.assertEqual(
+            (status["test"]["success"], status["test"]["checked_at"], status["test"]["cached"]),
+            (True, checked, True),
+        )
+        # Sonde désactivée dans les tests : pas de thread démarré
+        self.assertFalse(status["probes"]["running"])
+        self.assertEqual(health["storage"]["backends"]["fake"]["last_checked"], checked)
+        self.assertTrue(health["storage"]["ok"])
+
+
+@override_settings(
+    REQUEST_PROFILING_ENABLED=True,
+    REQUEST_PROFILING_BUFFER=1000,
+    REQUEST_PROFILING_SAMPLE_RATE=0,
+)
+class ProfilingMiddlewareTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        # Middleware chargé à la construction du client : le reconstruire sous l'override
+        self.client = self.client_class()
+        request_profiles.reset()
+        self.addCleanup(request_profiles.reset)
+        self.addCleanup(request_profiles.resize, 1000)
+
+    def middleware(self, get_response):
+        return ProfilingMiddleware(get_response)
+
+    def test_disabled_middleware_is_not_used(self):
+        with override_settings(REQUEST_PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: HttpResponse())
+
+    def test_ring_buffer_keeps_latest_samples(self):
+        with override_settings(REQUEST_PROFILING_BUFFER=2):
+            middleware = self.middleware(lambda request: HttpResponse(request.path))
+        factory = RequestFactory()
+        for path in ("/a/", "/b/", "/c/"):
+            middleware(factory.get(path))
+
+        summary = request_profiles.summary()
+        self.assertEqual(summary["buffer"], {"size": 2, "capacity": 2})
+        self.assertEqual([sample["path"] for sample in summary["recent"]], ["/c/", "/b/"])
+        self.assertEqual(summary["endpoints"]["<unresolved>"]["count"], 2)
+        self.assertEqual(summary["recent"][0]["bytes"], len(b"/c/"))
+
+    def test_counts_queries_and_duplicates(self):
+        def view(request):
+            for _ in range(3):
+                list(Geometry.objects.filter(name="cube"))
+            Geometry.objects.count()
+            return HttpResponse()
+
+        self.middleware(view)(RequestFactory().get("/"))
+        sample = request_profiles.summary()["recent"][0]
+        self.assertEqual((sample["queries"], sample["duplicate_queries"]), (4, 2))
+        self.assertGreaterEqual(sample["db_ms"], 0)
+
+        # Requête réelle : nom d'URL résolu et temps de sérialisation mesuré
+        self.create_geometry()
+        request_profiles.reset()
+        self.assertEqual(self.client.get("/api/geometries/").status_code, 200)
+        sample = request_profiles.summary()["recent"][0]
+        self.assertEqual((sample["url_name"], sample["status"]), ("geometries-list", 200))
+        self.assertGreater(sample["queries"], 0)
+        self.assertGreater(sample["serializer_ms"], 0)
+
+    def test_report_is_staff_only(self):
+        self.client.get("/api/geometries/")
+        self.assertEqual(self.client.get("/api/debug/profiling/").status_code, 403)
+
+        user = User.objects.create_user("visiteur")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/api/debug/profiling/").status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        report = self.client.get("/api/debug/profiling/").json()
+        self.assertTrue(report["enabled"])
+        self.assertIn("geometries-list", report["endpoints"])
+        self.assertEqual(report["endpoints"]["geometries-list"]["count"], 1)
+
+        self.assertEqual(self.client.delete("/api/debug/profiling/").status_code, 204)
+        # Seule reste la requête DELETE, enregistrée après la purge
+        recent = request_profiles.summary()["recent"]
+        self.assertEqual([sample["method"] for sample in recent], ["DELETE"])
+
+    def test_profile_dumped_only_above_threshold(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        request = RequestFactory().get("/")
+
+        with override_settings(
+            REQUEST_PROFILING_SAMPLE_RATE=1,
+            REQUEST_PROFILING_SLOW_MS=60_000,
+            REQUEST_PROFILING_DIR=directory,
+        ):
+            self.middleware(lambda request: HttpResponse())(request)
+        self.assertEqual(os.listdir(directory), [])
+        self.assertIsNone(request_profiles.summary()["recent"][0]["profile"])
+
+        with override_settings(
+            REQUEST_PROFILING_SAMPLE_RATE=1,
+            REQUEST_PROFILING_SLOW_MS=0,
+            REQUEST_PROFILING_DIR=directory,
+        ), self.assertLogs("backend.profiling_middleware", "INFO"):
+            self.middleware(lambda request: HttpResponse())(request)
+        path = request_profiles.summary()["recent"][0]["profile"]
+        self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+        self.assertTrue(path.endswith(".prof"))
+
+
+@override_settings(BLOB_STORAGE_BACKEND="local", BLOB_LOCAL_URL="http://testserver/media/")
+class LocalStorageBackendTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.backend = get_storage_backend()
+
+    def test_io_interface(self):
+        self.assertIsInstance(self.backend, LocalStorageBackend)
+        source = os.path.join(self.staging_dir, "chair.glb")
+        with open(source, "wb") as fh:
+            fh.write(b"from path")
+        result = self.backend.put(source, "models/a.glb")
+        self.assertEqual(result["url"], "http://testserver/media/models/a.glb")
+        self.assertEqual(result["bytes"], 9)
+        self.backend.put(io.BytesIO(b"from stream"), "models/b.glb")
+
+        self.assertEqual(self.backend.head("models/b.glb")["bytes"], 11)
+        self.assertEqual(self.backend.head("models/b.glb")["content_type"], "model/gltf-binary")
+        self.assertIsNone(self.backend.head("models/missing.glb"))
+        with self.backend.open("models/a.glb") as fh:
+            self.assertEqual(fh.read(), b"from path")
+        target = os.path.join(self.staging_dir, "copy.glb")
+        self.assertEqual(self.backend.download("models/b.glb", target), 11)
+
+        # Clé absente : comptée comme supprimée
+        deleted = self.backend.delete_many(["models/a.glb", "models/missing.glb"])
+        self.assertEqual(deleted, {"models/a.glb", "models/missing.glb"})
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "models", "a.glb")))
+        with self.assertRaises(ValueError):
+            self.backend.put(io.BytesIO(b"x"), "../outside.glb")
+
+    def test_upload_and_delete_through_api(self):
+        content = make_glb()
+        geometry = self.upload(content)
+        key = geometry.asset.public_id
+        self.assertEqual(geometry.upload_status, Geometry.UPLOAD_READY)
+        self.assertEqual(geometry.model_url, f"http://testserver/media/{key}")
+        with open(os.path.join(self.media_root, key), "rb") as fh:
+            self.assertEqual(fh.read(), content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/geometries/{geometry.pk}/")
+        self.assertEqual(RemoteDeletion.objects.get().backend, "local")
+        self.assertIsNone(self.backend.head(key))
@@ -0,0 +1,162 @@
+"""
+Transcodage des textures embarquées d'un GLB (Pillow).
+
+Chaque image du chunk BIN est décodée, réduite à `max_size` pixels sur son
+plus grand côté (dimensions arrondies au multiple de 4, compatibles KTX2/Basis),
+puis réencodée en WebP. Les textures pointent alors vers l'image via
+EXT_texture_webp et le GLB est réécrit avec un buffer recompacté.
+
+Les résultats sont mis en cache sur disque par hash de l'image (et réglages) :
+une texture partagée entre plusieurs modèles n'est traitée qu'une fois.
+Module indépendant de Django : `transcode_textures` est exécutée dans le pool
+de processus.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from .glb import GLB
+
+WEBP_EXTENSION = "EXT_texture_webp"
+TRANSCODED_MIME_TYPES = ("image/png", "image/jpeg", "image/webp")
+
+
+def target_size(width, height, max_size):
+    """Dimensions réduites (côté max `max_size`), arrondies au multiple de 4"""
+    scale = min(1.0, max_size / max(width, height))
+    return (
+        max(4, int(round(width * scale / 4)) * 4),
+        max(4, int(round(height * scale / 4)) * 4),
+    )
+
+
+def encode_webp(data, max_size, quality, lossless=False):
+    """Retourne (octets WebP, (largeur, hauteur) d'origine, nouvelles dimensions)"""
+    with Image.open(io.BytesIO(data)) as image:
+        original = image.size
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        size = target_size(*original, max_size)
+        if size != original:
+            image = image.resize(size, Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=quality, lossless=lossless, method=6)
+    return output.getvalue(), original, size
+
+
+def cached_webp(data, cache_dir, max_size, quality, lossless=False):
+    """encode_webp avec cache disque adressé par le hash de l'image. Retourne aussi cached."""
+    digest = hashlib.sha256(data).hexdigest()
+    suffix = "lossless" if lossless else f"q{quality}"
+    path = os.path.join(cache_dir, f"{digest}-{max_size}-{suffix}.webp")
+    if os.path.exists(path):
+        with open(path, "rb") as fh:
+            encoded = fh.read()
+        with Image.open(io.BytesIO(data)) as image:
+            original = image.size
+        with Image.open(io.BytesIO(encoded)) as image:
+            size = image.size
+        return encoded, original, size, True
+
+    encoded, original, size = encode_webp(data, max_size, quality, lossless)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Écriture atomique : plusieurs processus peuvent traiter la même image
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(encoded)
+    os.replace(tmp_path, path)
+    return encoded, original, size, False
+
+
+def normal_map_images(document):
+    """Images utilisées comme normal maps (encodées sans perte visible)"""
+    textures = document.get("textures", [])
+    images = set()
+    for material in document.get("materials", []):
+        normal = material.get("normalTexture")
+        if normal and normal.get("index", len(textures)) < len(textures):
+            source = textures[normal["index"]].get("source")
+            if source is not None:
+                images.add(source)
+    return images
+
+
+def transcode_textures(source_path, output_dir, options):
+    """
+    Réduit et convertit en WebP les images embarquées d'un GLB.
+    Retourne [{"variant": "textures", "path", "metadata"}] ou [] si aucun gain.
+    """
+    max_size = options.get("max_size", 2048)
+    quality = options.get("quality", 85)
+    cache_dir = options.get("cache_dir") or os.path.join(tempfile.gettempdir(), "dv-threlte-textures")
+
+    glb = GLB.load(source_path)
+    doc = glb.document
+    normal_images = normal_map_images(doc)
+
+    report = []
+    transcoded = set()
+    for index, image in enumerate(doc.get("images", [])):
+        if "bufferView" not in image or image.get("mimeType") not in TRANSCODED_MIME_TYPES:
+            continue
+        data = glb.views[image["bufferView"]]
+        lossless = index in normal_images and options.get("lossless_normals", False)
+        image_quality = max(quality, 95) if index in normal_images else quality
+        try:
+            encoded, original, size, cached = cached_webp(
+                data, cache_dir, max_size, image_quality, lossless
+            )
+        except (OSError, ValueError) as e:
+            report.append({"index": index, "name": image.get("name", ""), "error": str(e)})
+            continue
+
+        if len(encoded) >= len(data) and size == original:
+            continue
+        # Nouveau bufferView : les données d'origine sont retirées par prune()
+        image["bufferView"] = glb.add_view(encoded)
+        image["mimeType"] = "image/webp"
+        transcoded.add(index)
+        report.append(
+            {
+                "index": index,
+                "name": image.get("name", ""),
+                "size_before": list(original),
+                "size_after": list(size),
+                "bytes_before": len(data),
+                "bytes_after": len(encoded),
+                "saved": len(data) - len(encoded),
+                "cached": cached,
+            }
+        )
+
+    if not transcoded:
+        return []
+
+    for texture in doc.get("textures", []):
+        source = texture.get("source")
+        if source in transcoded:
+            texture.pop("source")
+            texture.setdefault("extensions", {})[WEBP_EXTENSION] = {"source": source}
+    glb.use_extension(WEBP_EXTENSION, required=True)
+    glb.prune()
+
+    output_path = os.path.join(output_dir, "textures.glb")
+    size = glb.save(output_path)
+    original_bytes = os.path.getsize(source_path)
+    return [
+        {
+            "variant": "textures",
+            "path": output_path,
+            "metadata": {
+                "max_size": max_size,
+                "original_bytes": original_bytes,
+                "bytes": size,
+                "saved": original_bytes - size,
+                "textures": report,
+            },
+        }
+    ]
@@ -0,0 +1,296 @@
+"""
+Miniatures WebP des modèles GLB et des images (aperçus du sélecteur de scène).
+
+Modèles : rastériseur logiciel NumPy (vue 3/4 orthographique, z-buffer,
+éclairage diffus par face, couleur de base du matériau). Les triangles sont
+groupés par taille de boîte englobante à l'écran et traités par lots vectorisés ;
+le rendu est sur-échantillonné puis réduit (anticrénelage).
+Images : réduction Pillow.
+
+Module indépendant de Django : `render_thumbnail` est exécutée dans le pool de
+processus.
+"""
+
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .glb import GLB, GLBError
+from .model_inspection import GLB_MAGIC, _identity, _multiply, _node_matrix
+
+MODE_TRIANGLES = 4
+SUPERSAMPLING = 2
+MARGIN = 0.06
+# Nombre max de fragments candidats par lot (mémoire des tableaux intermédiaires)
+BATCH_FRAGMENTS = 1 << 22
+VIEW_DIRECTION = np.array([1.0, 0.8, 1.3])
+LIGHT_DIRECTION = np.array([0.6, 1.0, 0.8])
+AMBIENT = 0.35
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v)
+
+
+def _float_attribute(glb, index):
+    """Attribut converti en float (accessors normalisés/quantifiés compris)"""
+    accessor = glb.document["accessors"][index]
+    values = glb.accessor(index)
+    if accessor.get("normalized") and values.dtype.kind in "iu":
+        return values.astype(np.float64) / np.iinfo(values.dtype).max
+    return values.astype(np.float64)
+
+
+def _image_color(glb, image_index, cache):
+    """Couleur moyenne d'une image embarquée (RGB 0..1), ou None"""
+    if image_index in cache:
+        return cache[image_index]
+    color = None
+    images = glb.document.get("images", [])
+    if image_index is not None and image_index < len(images) and "bufferView" in images[image_index]:
+        try:
+            with Image.open(io.BytesIO(glb.views[images[image_index]["bufferView"]])) as image:
+                image.thumbnail((64, 64))
+                pixels = np.asarray(image.convert("RGB"), dtype=np.float64) / 255
+                color = pixels.reshape(-1, 3).mean(axis=0)
+        except (OSError, ValueError):
+            color = None
+    cache[image_index] = color
+    return color
+
+
+def _material_color(glb, material_index, cache):
+    """Couleur de base (facteur x moyenne de la texture), en RGB 0..1"""
+    materials = glb.document.get("materials", [])
+    if material_index is None or material_index >= len(materials):
+        return np.array([0.8, 0.8, 0.8])
+    pbr = materials[material_index].get("pbrMetallicRoughness", {})
+    color = np.array(pbr.get("baseColorFactor", [1.0, 1.0, 1.0, 1.0])[:3], dtype=np.float64)
+    texture = pbr.get("baseColorTexture")
+    textures = glb.document.get("textures", [])
+    if texture and texture.get("index", len(textures)) < len(textures):
+        entry = textures[texture["index"]]
+        source = entry.get("source")
+        for extension in entry.get("extensions", {}).values():
+            source = extension.get("source", source)
+        average = _image_color(glb, source, cache)
+        if average is not None:
+            color = color * average
+    return color
+
+
+def scene_triangles(glb):
+    """
+    Triangles du GLB dans le repère de la scène.
+    Retourne (sommets (T, 3, 3), couleurs (T, 3)).
+    """
+    doc = glb.document
+    meshes = doc.get("meshes", [])
+    nodes = doc.get("nodes", [])
+    scenes = doc.get("scenes", [])
+    if scenes:
+        scene_index = doc.get("scene", 0)
+        roots = (scenes[scene_index] if scene_index < len(scenes) else scenes[0]).get("nodes", [])
+    else:
+        roots = range(len(nodes))
+
+    instances = []
+    stack = [(index, _identity()) for index in roots]
+    visited = set()
+    while stack:
+        index, parent = stack.pop()
+        if index in visited or index >= len(nodes):
+            continue
+        visited.add(index)
+        matrix = _multiply(parent, _node_matrix(nodes[index]))
+        if nodes[index].get("mesh") is not None and nodes[index]["mesh"] < len(meshes):
+            instances.append((nodes[index]["mesh"], matrix))
+        stack.extend((child, matrix) for child in nodes[index].get("children", []))
+
+    triangles = []
+    colors = []
+    image_cache = {}
+    accessors = doc.get("accessors", [])
+    for mesh_index, matrix in instances:
+        transform = np.array(matrix, dtype=np.float64).reshape(4, 4).T
+        for primitive in meshes[mesh_index].get("primitives", []):
+            position = primitive.get("attributes", {}).get("POSITION")
+            if (
+                position is None
+                or primitive.get("mode", MODE_TRIANGLES) != MODE_TRIANGLES
+                # Données compressées (Draco...) : pas de bufferView lisible
+                or "bufferView" not in accessors[position]
+            ):
+                continue
+            points = _float_attribute(glb, position)[:, :3]
+            points = points @ transform[:3, :3].T + transform[:3, 3]
+            if "indices" in primitive:
+                faces = glb.accessor(primitive["indices"]).reshape(-1).astype(np.int64)
+            else:
+                faces = np.arange(len(points), dtype=np.int64)
+            faces = faces[: len(faces) - len(faces) % 3].reshape(-1, 3)
+            if not len(faces):
+                continue
+            triangles.append(points[faces])
+            color = _material_color(glb, primitive.get("material"), image_cache)
+            colors.append(np.broadcast_to(color, (len(faces), 3)))
+
+    if not triangles:
+        return np.zeros((0, 3, 3)), np.zeros((0, 3))
+    return np.concatenate(triangles), np.concatenate(colors)
+
+
+def _fragments(screen, depth, width, height):
+    """
+    Fragments couverts par chaque triangle (centre de pixel dans le triangle).
+    Retourne (index de pixel, profondeur, index de triangle).
+    """
+    x, y = screen[..., 0], screen[..., 1]
+    x0 = np.clip(np.floor(x.min(axis=1)), 0, width).astype(np.int64)
+    x1 = np.clip(np.ceil(x.max(axis=1)), 0, width).astype(np.int64)
+    y0 = np.clip(np.floor(y.min(axis=1)), 0, height).astype(np.int64)
+    y1 = np.clip(np.ceil(y.max(axis=1)), 0, height).astype(np.int64)
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    visible = (x1 > x0) & (y1 > y0) & (np.abs(area) > 1e-12)
+
+    # Lots par taille de boîte (puissance de 2) : grilles de pixels de même forme
+    extent = np.maximum(x1 - x0, y1 - y0)
+    buckets = np.ceil(np.log2(np.maximum(extent, 1))).astype(np.int64)
+    pixels, depths, owners = [], [], []
+    for bucket in np.unique(buckets[visible]):
+        side = 1 << int(bucket)
+        oy, ox = np.divmod(np.arange(side * side), side)
+        selected = np.nonzero(visible & (buckets == bucket))[0]
+        step = max(1, BATCH_FRAGMENTS // (side * side))
+        for start in range(0, len(selected), step):
+            tri = selected[start : start + step]
+            px = x0[tri, None] + ox
+            py = y0[tri, None] + oy
+            cx, cy = px + 0.5, py + 0.5
+            tx, ty = x[tri], y[tri]
+            # Coordonnées barycentriques (fonctions d'arête)
+            w0 = (tx[:, 1, None] - cx) * (ty[:, 2, None] - cy) - (tx[:, 2, None] - cx) * (ty[:, 1, None] - cy)
+            w1 = (tx[:, 2, None] - cx) * (ty[:, 0, None] - cy) - (tx[:, 0, None] - cx) * (ty[:, 2, None] - cy)
+            w0 = w0 / area[tri, None]
+            w1 = w1 / area[tri, None]
+            w2 = 1.0 - w0 - w1
+            inside = (
+                (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+                & (px < x1[tri, None]) & (py < y1[tri, None])
+            )
+            rows, cols = np.nonzero(inside)
+            z = depth[tri]
+            pixels.append(py[rows, cols] * width + px[rows, cols])
+            depths.append(
+                w0[rows, cols] * z[rows, 0] + w1[rows, cols] * z[rows, 1] + w2[rows, cols] * z[rows, 2]
+            )
+            owners.append(tri[rows])
+
+    if not pixels:
+        return np.zeros(0, np.int64), np.zeros(0), np.zeros(0, np.int64)
+    return np.concatenate(pixels), np.concatenate(depths), np.concatenate(owners)
+
+
+def rasterize(triangles, colors, size):
+    """Rendu RGBA (size x size) des triangles, vue 3/4 orthographique cadrée sur le modèle"""
+    width = height = size * SUPERSAMPLING
+    image = np.zeros((height * width, 4), dtype=np.uint8)
+    if not len(triangles):
+        return image.reshape(height, width, 4)
+
+    view = _normalize(VIEW_DIRECTION)
+    right = _normalize(np.cross([0.0, 1.0, 0.0], view))
+    up = np.cross(view, right)
+    points = triangles.reshape(-1, 3)
+    projected = np.stack([points @ right, points @ up], axis=-1)
+    lo, hi = projected.min(axis=0), projected.max(axis=0)
+    extent = max(float((hi - lo).max()), 1e-9)
+    scale = width * (1 - 2 * MARGIN) / extent
+    center = (lo + hi) / 2
+
+    screen = np.empty_like(projected)
+    screen[:, 0] = (projected[:, 0] - center[0]) * scale + width / 2
+    screen[:, 1] = height / 2 - (projected[:, 1] - center[1]) * scale
+    screen = screen.reshape(-1, 3, 2)
+    # Profondeur : plus grande = plus proche de la caméra
+    depth = (points @ view).reshape(-1, 3)
+
+    pixel, z, owner = _fragments(screen, depth, width, height)
+    if len(pixel):
+        # z-buffer : pour chaque pixel, le fragment le plus proche
+        order = np.lexsort((-z, pixel))
+        pixel, owner = pixel[order], owner[order]
+        first = np.concatenate([[True], pixel[1:] != pixel[:-1]])
+        pixel, owner = pixel[first], owner[first]
+
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = normals / np.where(lengths > 0, lengths, 1)
+        # Éclairage double face : les modèles ont souvent des normales incohérentes
+        diffuse = np.abs(normals @ _normalize(LIGHT_DIRECTION))
+        shade = colors * (AMBIENT + (1 - AMBIENT) * diffuse)[:, None]
+        image[pixel, :3] = np.clip(shade[owner] * 255, 0, 255).astype(np.uint8)
+        image[pixel, 3] = 255
+    return image.reshape(height, width, 4)
+
+
+def save_webp(image, path, quality):
+    image.save(path, format="WEBP", quality=quality, method=6)
+    return os.path.getsize(path)
+
+
+def model_thumbnail(source_path, output_path, size, quality):
+    triangles, colors = scene_triangles(GLB.load(source_path))
+    if not len(triangles):
+        return None
+    pixels = rasterize(triangles, colors, size)
+    # Réduction en alpha prémultiplié : pas de franges sombres sur les bords
+    image = Image.fromarray(pixels, "RGBA").convert("RGBa")
+    image = image.resize((size, size), Image.LANCZOS).convert("RGBA")
+    return {
+        "source": "model",
+        "width": size,
+        "height": size,
+        "triangles": int(len(triangles)),
+        "bytes": save_webp(image, output_path, quality),
+    }
+
+
+def image_thumbnail(source_path, output_path, size, quality):
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((size, size), Image.LANCZOS)
+        return {
+            "source": "image",
+            "width": image.width,
+            "height": image.height,
+            "bytes": save_webp(image, output_path, quality),
+        }
+
+
+def render_thumbnail(source_path, output_dir, options):
+    """
+    Miniature WebP d'un GLB ou d'une image.
+    Retourne [{"variant": "thumbnail", "format": "webp", ...}] ou [] si rien à rendre.
+    """
+    size = options.get("size", 256)
+    quality = options.get("quality", 80)
+    output_path = os.path.join(output_dir, "thumbnail.webp")
+
+    with open(source_path, "rb") as fh:
+        is_glb = fh.read(4) == GLB_MAGIC
+    try:
+        if is_glb:
+            metadata = model_thumbnail(source_path, output_path, size, quality)
+        else:
+            metadata = image_thumbnail(source_path, output_path, size, quality)
+    except (GLBError, UnidentifiedImageError):
+        # glTF à buffers externes, SVG... : pas de miniature
+        return []
+    if metadata is None:
+        return []
+    return [{"variant": "thumbnail", "format": "webp", "path": output_path, "metadata": metadata}]
@@ -0,0 +1,320 @@
+"""
+Pipeline d'upload asynchrone.
+
+La requête ne fait que copier le fichier dans un dossier de staging local et créer
+la Geometry en statut "pending". Un pool de workers envoie ensuite le fichier vers
+le backend de stockage, puis remplace atomiquement model_url et passe le statut à
+"ready" (ou "failed"). Le post_save de Geometry publie le changement
+(journal de scène + flux SSE), les clients voient donc l'évolution du statut.
+
+Les fichiers sont adressés par contenu (SHA-256) : un fichier déjà connu réutilise
+le CloudinaryAsset existant sans aucun appel réseau.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .model_inspection import inspect_model
+from .models import CloudinaryAsset, Geometry, UploadSession
+from .storage_backends import get_storage_backend
+
+logger = logging.getLogger(__name__)
+
+MODELS_FOLDER = "dv-threlte/models"
+HASH_BLOCK_SIZE = 1024 * 1024
+# Intervalle minimal entre deux purges opportunistes des sessions d'upload
+PURGE_INTERVAL = 3600
+
+_purge_lock = threading.Lock()
+_last_purge = None
+
+
+class InlineExecutor:
+    """Exécuteur synchrone (tests, scripts) : même interface que concurrent.futures"""
+
+    runs_inline = True
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, **kwargs):
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_upload_executor():
+    executor_path = getattr(
+        settings, "UPLOAD_EXECUTOR", "concurrent.futures.ThreadPoolExecutor"
+    )
+    workers = getattr(settings, "UPLOAD_WORKERS", 4)
+    return import_string(executor_path)(max_workers=workers)
+
+
+@receiver(setting_changed)
+def reset_upload_executor(setting, **kwargs):
+    if setting in ("UPLOAD_EXECUTOR", "UPLOAD_WORKERS"):
+        get_upload_executor.cache_clear()
+
+
+def get_staging_dir():
+    staging_dir = getattr(settings, "UPLOAD_STAGING_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "dv-threlte-staging"
+    )
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def hash_file(path):
+    """SHA-256 d'un fichier, lu par blocs (mémoire constante)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_uploaded_file(uploaded_file):
+    """SHA-256 d'un UploadedFile, puis retour au début du fichier"""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def content_key(content_hash):
+    return f"{MODELS_FOLDER}/{content_hash}"
+
+
+def find_asset_by_hash(content_hash):
+    return CloudinaryAsset.objects.filter(content_hash=content_hash).first()
+
+
+def stage_upload(uploaded_file):
+    """
+    Copie le fichier reçu dans le staging local.
+    Retourne (chemin, sha256) ; le hash est calculé pendant la copie.
+    """
+    ext = os.path.splitext(uploaded_file.name)[1].lower()
+    staged_path = os.path.join(get_staging_dir(), f"{uuid.uuid4().hex}{ext}")
+
+    if hasattr(uploaded_file, "temporary_file_path"):
+        # Fichier déjà sur disque (TemporaryUploadedFile) : simple déplacement
+        shutil.move(uploaded_file.temporary_file_path(), staged_path)
+        return staged_path, hash_file(staged_path)
+
+    digest = hashlib.sha256()
+    with open(staged_path, "wb") as fh:
+        for chunk in uploaded_file.chunks():
+            fh.write(chunk)
+            digest.update(chunk)
+    return staged_path, digest.hexdigest()
+
+
+def discard_staged(staged_path):
+    if os.path.exists(staged_path):
+        os.remove(staged_path)
+
+
+def get_session_ttl():
+    return getattr(settings, "UPLOAD_SESSION_TTL", 24 * 3600)
+
+
+def purge_upload_sessions(ttl=None):
+    """
+    Supprime les sessions d'upload par morceaux restées ouvertes sans nouveau
+    morceau depuis `ttl` secondes (UPLOAD_SESSION_TTL) avec leur fichier de
+    staging, puis les fichiers de staging orphelins plus anciens que `ttl`
+    (worker interrompu...). Retourne (sessions supprimées, fichiers supprimés).
+    """
+    ttl = get_session_ttl() if ttl is None else ttl
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        # Une session en cours d'écriture (PUT) est verrouillée : ignorée
+        stale = list(
+            UploadSession.objects.select_for_update(skip_locked=True).filter(
+                status=UploadSession.STATUS_OPEN, updated_at__lt=cutoff
+            )
+        )
+        for session in stale:
+            discard_staged(session.staged_path)
+        UploadSession.objects.filter(pk__in=[session.pk for session in stale]).delete()
+
+    staging_dir = get_staging_dir()
+    in_use = set(
+        UploadSession.objects.filter(status=UploadSession.STATUS_OPEN).values_list(
+            "staged_path", flat=True
+        )
+    )
+    removed_files = 0
+    for entry in os.scandir(staging_dir):
+        if entry.path in in_use or entry.stat().st_mtime >= cutoff.timestamp():
+            continue
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+            removed_files += 1
+        except OSError as e:
+            logger.warning(f"⚠️ Fichier de staging non supprimé ({entry.path}): {str(e)}")
+
+    if stale or removed_files:
+        logger.info(
+            f"🧹 Staging purgé: {len(stale)} sessions d'upload abandonnées, "
+            f"{removed_files} fichiers orphelins"
+        )
+    return len(stale), removed_files
+
+
+def schedule_session_purge():
+    """Purge opportuniste (au plus une fois par PURGE_INTERVAL et par processus)"""
+    global _last_purge
+    with _purge_lock:
+        now = time.monotonic()
+        if _last_purge is not None and now - _last_purge < PURGE_INTERVAL:
+            return False
+        _last_purge = now
+    submit_task(purge_upload_sessions)
+    return True
+
+
+def run_in_worker(fn, *args, **kwargs):
+    """Exécute une tâche dans un thread du pool et libère ses connexions DB"""
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def submit_task(fn, *args, **kwargs):
+    executor = get_upload_executor()
+    if getattr(executor, "runs_inline", False):
+        return executor.submit(fn, *args, **kwargs)
+    return executor.submit(run_in_worker, fn, *args, **kwargs)
+
+
+def schedule_upload(geometry_id, staged_path, filename, resource_type, content_hash):
+    """Soumet l'upload au pool une fois la Geometry "pending" commitée"""
+    transaction.on_commit(
+        lambda: submit_task(
+            process_upload,
+            geometry_id,
+            staged_path,
+            filename,
+            resource_type,
+            content_hash,
+        )
+    )
+
+
+def process_staged_model(asset_id, staged_path):
+    """Étapes d'ingestion (LOD...) sur le fichier encore présent dans le staging"""
+    if not getattr(settings, "MODEL_PROCESSING", True):
+        return
+    from .model_processing import process_model_asset
+
+    try:
+        process_model_asset(asset_id, staged_path)
+    except Exception as e:
+        # Le modèle source reste servi : l'échec d'une étape n'invalide pas l'upload
+        logger.error(f"❌ Traitement du modèle échoué (asset {asset_id}): {str(e)}", exc_info=True)
+
+
+def process_upload(geometry_id, staged_path, filename, resource_type, content_hash):
+    """Tâche exécutée par le pool : upload puis bascule atomique de model_url"""
+    from .remote_deletion import (
+        cancel_remote_deletions,
+        enqueue_remote_deletion,
+        release_asset,
+    )
+
+    key = content_key(content_hash)
+    try:
+        # Inspection locale avant l'envoi : le fichier est déjà sur disque
+        model_stats = inspect_model(staged_path, filename)
+        backend = get_storage_backend()
+        # Même contenu supprimé récemment : sa suppression distante ne doit pas suivre l'écriture
+        cancel_remote_deletions(backend.name, [key])
+        result = backend.put(staged_path, key, resource_type=resource_type)
+
+        with transaction.atomic():
+            geometry = Geometry.objects.select_for_update().filter(pk=geometry_id).first()
+            if geometry is None:
+                # Fichier orphelin, sauf si un asset (dédupliqué entre-temps) le référence
+                if not CloudinaryAsset.objects.filter(public_id=result["key"]).exists():
+                    enqueue_remote_deletion(CloudinaryAsset(
+                        public_id=result["key"], url=result["url"], asset_type=resource_type
+                    ))
+                logger.warning(
+                    f"⚠️ Geometry {geometry_id} supprimée pendant l'upload "
+                    f"(suppression distante de {result['key']} planifiée)"
+                )
+                return None
+
+            defaults = {
+                "url": result["url"],
+                "asset_type": resource_type,
+                "file_name": filename,
+                "format": os.path.splitext(filename)[1].lstrip(".").lower(),
+                "file_size": result.get("bytes"),
+                "content_hash": content_hash,
+            }
+            if model_stats is not None:
+                defaults["metadata"] = {"model": model_stats}
+            asset, _ = CloudinaryAsset.objects.update_or_create(
+                public_id=result["key"], defaults=defaults
+            )
+
+            previous = geometry.asset
+            geometry.model_url = result["url"]
+            geometry.asset = asset
+            geometry.upload_status = Geometry.UPLOAD_READY
+            geometry.upload_error = ""
+            geometry.save(
+                update_fields=["model_url", "asset", "upload_status", "upload_error"]
+            )
+            # Fichier remplacé : l'ancien asset part avec ses variantes s'il n'est plus utilisé
+            if previous is not None and previous.pk != asset.pk:
+                release_asset(previous, geometry)
+
+        logger.info(f"✅ Upload terminé pour Geometry {geometry_id}: {result['url']}")
+        process_staged_model(asset.pk, staged_path)
+        return result["url"]
+
+    except Exception as e:
+        logger.error(f"❌ Upload échoué pour Geometry {geometry_id}: {str(e)}", exc_info=True)
+        geometry = Geometry.objects.filter(pk=geometry_id).first()
+        if geometry is not None:
+            geometry.upload_status = Geometry.UPLOAD_FAILED
+            geometry.upload_error = str(e)[:1000]
+            geometry.save(update_fields=["upload_status", "upload_error"])
+        return None
+
+    finally:
+        discard_staged(staged_path)
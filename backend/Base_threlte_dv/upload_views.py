@@ -0,0 +1,250 @@
+"""
+Upload par morceaux avec reprise, pour les gros modèles GLB/GLTF.
+
+    POST /api/uploads/                     {"filename", "size"}  -> session
+    GET  /api/uploads/<id>/                                      -> offset courant
+    PUT  /api/uploads/<id>/  Content-Range: bytes <début>-<fin>/<total>  (corps brut)
+    POST /api/uploads/<id>/finalize/       {"crc32", champs Geometry} -> Geometry "pending"
+
+Chaque morceau est lu par blocs depuis le flux de la requête dans un fichier
+temporaire, sans verrou : la mémoire reste constante quelle que soit la taille.
+L'offset n'est avancé que par un compare-and-set sur `received_bytes`, dans une
+transaction courte qui recopie le morceau dans le fichier de staging. Un client
+interrompu relit l'offset (GET) et reprend à partir de là. Le CRC32 du fichier
+complet est obligatoire à la finalisation.
+
+Les sessions restées ouvertes sans nouveau morceau pendant UPLOAD_SESSION_TTL
+secondes sont supprimées avec leur fichier de staging (purge opportuniste à
+l'ouverture d'une session, ou commande `purge_upload_sessions`).
+"""
+
+import logging
+import os
+import re
+import shutil
+import uuid
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import UploadSession
+from .serializers import GeometrySerializer
+from .upload_pipeline import get_staging_dir, schedule_session_purge
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def session_payload(session):
+    return {
+        "id": str(session.id),
+        "filename": session.filename,
+        "size": session.total_size,
+        "offset": session.received_bytes,
+        "crc32": f"{session.crc32:08x}",
+        "status": session.status,
+        "geometry": session.geometry_id,
+        "chunk_size": getattr(settings, "UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024),
+    }
+
+
+class UploadSessionCreateView(APIView):
+    def post(self, request):
+        filename = os.path.basename(str(request.data.get("filename", "")))
+        try:
+            total_size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            total_size = -1
+
+        if not filename or total_size <= 0:
+            return Response(
+                {"error": "'filename' et 'size' (octets) sont requis"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_size = getattr(settings, "UPLOAD_MAX_SIZE", 512 * 1024 * 1024)
+        if total_size > max_size:
+            return Response(
+                {"error": f"Fichier trop volumineux (max {max_size} octets)"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        session = UploadSession(filename=filename, total_size=total_size)
+        ext = os.path.splitext(filename)[1].lower()
+        session.staged_path = os.path.join(get_staging_dir(), f"{session.id.hex}{ext}")
+        open(session.staged_path, "wb").close()
+        session.save()
+
+        logger.info(f"📦 Upload par morceaux ouvert: {filename} ({total_size} octets)")
+        schedule_session_purge()
+        return Response(session_payload(session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    def get(self, request, pk):
+        session = UploadSession.objects.filter(pk=pk).first()
+        if session is None:
+            return Response(
+                {"error": "Session d'upload non trouvée"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(session_payload(session))
+
+    def put(self, request, pk):
+        match = CONTENT_RANGE_RE.match(request.headers.get("Content-Range", ""))
+        if not match:
+            return Response(
+                {"error": "En-tête Content-Range requis: bytes <début>-<fin>/<total>"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end = int(match.group(1)), int(match.group(2))
+        declared_total = None if match.group(3) == "*" else int(match.group(3))
+        length = end - start + 1
+
+        session = UploadSession.objects.filter(pk=pk).first()
+        if session is None:
+            return Response(
+                {"error": "Session d'upload non trouvée"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if session.status != UploadSession.STATUS_OPEN:
+            return Response(
+                {"error": "Session déjà finalisée", **session_payload(session)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if end >= session.total_size or declared_total not in (None, session.total_size):
+            # Morceau au-delà de la taille annoncée à l'ouverture de la session
+            return Response(
+                {"error": "Plage hors de la taille du fichier", **session_payload(session)},
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            )
+        if start != session.received_bytes or length <= 0:
+            # Morceau hors séquence (déjà reçu ou trou) : le client reprend à "offset"
+            return Response(
+                {"error": "Offset inattendu", **session_payload(session)},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        # Le corps est reçu sans verrou, dans un fichier propre à la requête :
+        # un morceau rejeté ou concurrent ne touche pas au fichier de staging
+        part_path = f"{session.staged_path}.{uuid.uuid4().hex}.part"
+        try:
+            expected_chunk_crc = request.headers.get("X-Chunk-CRC32")
+            written, crc, chunk_crc = self._write_chunk(request, part_path, session.crc32, length)
+            error = None
+            if written != length:
+                error = f"Morceau incomplet ({written}/{length} octets)"
+            elif expected_chunk_crc and expected_chunk_crc.lower() != f"{chunk_crc:08x}":
+                error = "Checksum CRC32 du morceau invalide"
+            if error:
+                # Offset inchangé : le client renvoie le morceau
+                return Response(
+                    {"error": error, **session_payload(session)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            with transaction.atomic():
+                # Compare-and-set : seul le premier morceau reçu à cet offset avance la session
+                claimed = UploadSession.objects.filter(
+                    pk=pk, status=UploadSession.STATUS_OPEN, received_bytes=start
+                ).update(received_bytes=start + written, crc32=crc, updated_at=timezone.now())
+                if not claimed:
+                    session = UploadSession.objects.filter(pk=pk).first()
+                    if session is None:
+                        return Response(
+                            {"error": "Session d'upload non trouvée"},
+                            status=status.HTTP_404_NOT_FOUND,
+                        )
+                    return Response(
+                        {"error": "Offset inattendu", **session_payload(session)},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                # Copie locale dans la transaction : la finalisation (select_for_update)
+                # attend qu'elle soit terminée
+                with open(part_path, "rb") as part, open(session.staged_path, "r+b") as fh:
+                    fh.seek(start)
+                    shutil.copyfileobj(part, fh, READ_BLOCK_SIZE)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        session.received_bytes = start + written
+        session.crc32 = crc
+        return Response(session_payload(session))
+
+    def _write_chunk(self, request, part_path, crc, length):
+        """
+        Copie le corps de la requête par blocs dans `part_path`.
+        Retourne (octets écrits, CRC32 glissant du fichier, CRC32 du morceau).
+        """
+        chunk_crc = 0
+        written = 0
+        stream = request.stream
+        with open(part_path, "wb") as fh:
+            while stream is not None and written < length:
+                block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                fh.write(block)
+                crc = zlib.crc32(block, crc)
+                chunk_crc = zlib.crc32(block, chunk_crc)
+                written += len(block)
+        return written, crc, chunk_crc
+
+
+class UploadSessionFinalizeView(APIView):
+    def post(self, request, pk):
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(pk=pk).first()
+            if session is None:
+                return Response(
+                    {"error": "Session d'upload non trouvée"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            if session.status != UploadSession.STATUS_OPEN:
+                return Response(
+                    {"error": "Session déjà finalisée", **session_payload(session)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if session.received_bytes != session.total_size:
+                return Response(
+                    {"error": "Upload incomplet", **session_payload(session)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            expected_crc = str(request.data.get("crc32", "")).lower()
+            if not expected_crc:
+                return Response(
+                    {"error": "'crc32' (CRC32 du fichier complet) est requis"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if expected_crc != f"{session.crc32:08x}":
+                return Response(
+                    {"error": "Checksum CRC32 invalide", **session_payload(session)},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+
+            geometry_data = {
+                key: value
+                for key, value in request.data.items()
+                if key not in ("crc32", "model_file")
+            }
+            geometry_data.setdefault("name", os.path.splitext(session.filename)[0][:45])
+            serializer = GeometrySerializer(data=geometry_data)
+            serializer.is_valid(raise_exception=True)
+            geometry = serializer.save(
+                staged_upload=(session.staged_path, session.filename)
+            )
+
+            session.status = UploadSession.STATUS_COMPLETE
+            session.geometry = geometry
+            session.save(update_fields=["status", "geometry", "updated_at"])
+
+        logger.info(f"✅ Upload par morceaux finalisé: {session.filename} → Geometry {geometry.id}")
+        return Response(GeometrySerializer(geometry).data, status=status.HTTP_201_CREATED)
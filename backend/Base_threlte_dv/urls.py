@@ -4,7 +4,8 @@ from django.http import JsonResponse
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import GeometryViewSet, TypeView, ToggleGeometryVisibilityView
-from . import storage_views
+from . import debug_views, storage_views, upload_views
+from .scene_events import scene_events_stream
 
 
 def debug_env(request):
@@ -32,7 +33,32 @@ urlpatterns = [
         ToggleGeometryVisibilityView.as_view(),
         name="toggle-geometry-visibility",
     ),
+    # Flux SSE (ASGI) : à déclarer avant le routeur pour ne pas être pris pour un id
+    path("geometries/events/", scene_events_stream, name="geometry-events"),
+    path(
+        "uploads/",
+        include(
+            [
+                path(
+                    "",
+                    upload_views.UploadSessionCreateView.as_view(),
+                    name="upload-create",
+                ),
+                path(
+                    "<uuid:pk>/",
+                    upload_views.UploadSessionView.as_view(),
+                    name="upload-session",
+                ),
+                path(
+                    "<uuid:pk>/finalize/",
+                    upload_views.UploadSessionFinalizeView.as_view(),
+                    name="upload-finalize",
+                ),
+            ]
+        ),
+    ),
     path("debug-env/", debug_env, name="debug-env"),
+    path("debug/profiling/", debug_views.profiling_report, name="debug-profiling"),
     path(
         "storage/",
         include(
@@ -44,6 +70,7 @@ urlpatterns = [
                 path("switch/", storage_views.storage_switch, name="storage-switch"),
                 path("test/", storage_views.storage_test, name="storage-test"),
                 path("status/", storage_views.storage_status, name="storage-status"),
+                path("metrics/", storage_views.storage_metrics, name="storage-metrics"),
             ]
         ),
     ),
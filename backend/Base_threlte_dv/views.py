@@ -2,14 +2,27 @@ import logging
 import os
 import re
 
-import requests
+from django.db import transaction
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 from .dv_config import TYPE_CHOICES
-from .models import Geometry, BlobLog, CloudinaryAsset
-from .serializers import GeometrySerializer
+from .models import Geometry, BlobLog, CloudinaryAsset, GeometryChange
+from .serializers import GeometryBulkUpdateSerializer, GeometrySerializer
+from .remote_deletion import release_asset
+from .scene_events import EVENT_UPDATED, publish_geometry_event
+from .spatial_index import SpatialFilterBackend
+from .scene_version import (
+    etag_matches,
+    get_changes_since,
+    get_scene_snapshot,
+    get_scene_version,
+    record_geometry_changes,
+    scene_etag,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,14 +31,142 @@ class GeometryViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         try:
             logger.info("✅ GeometryViewSet.list() called")
-            return super().list(request, *args, **kwargs)
+            if not self._is_snapshot_request(request):
+                return super().list(request, *args, **kwargs)
+
+            # Liste complète : servie depuis le snapshot versionné de la scène
+            version = get_scene_version()
+            etag = scene_etag(version)
+            headers = {
+                "ETag": etag,
+                "Cache-Control": "no-cache",
+                "X-Scene-Version": str(version),
+            }
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            data = get_scene_snapshot(version, self._build_snapshot)
+            return Response(data, headers=headers)
         except Exception as e:
             logger.error(f"❌ Error in GeometryViewSet.list(): {str(e)}", exc_info=True)
             raise
 
-    queryset = Geometry.objects.all()
+    queryset = Geometry.objects.select_related("asset").prefetch_related("asset__variants")
     serializer_class = GeometrySerializer
     pagination_class = None
+    # ?near=x,y,z&radius=r / ?bbox=... : requêtes spatiales
+    filter_backends = [*api_settings.DEFAULT_FILTER_BACKENDS, SpatialFilterBackend]
+
+    def _is_snapshot_request(self, request):
+        """Seule la liste sans filtre ni tri (hors ?format=) est mise en cache"""
+        return not any(key != "format" for key in request.query_params)
+
+    def _build_snapshot(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return [dict(item) for item in serializer.data]
+
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        """
+        Synchronisation différentielle : GET /api/geometries/changes/?since=<version>
+        Retourne les géométries créées/modifiées et les ids supprimés depuis `since`,
+        ou la scène complète ("full": true) si le journal a été compacté.
+        """
+        try:
+            since = int(request.query_params.get("since", ""))
+        except ValueError:
+            return Response(
+                {"error": "Paramètre 'since' requis (entier)"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        version, upsert_ids, deleted_ids = get_changes_since(since)
+        if upsert_ids is None:
+            logger.info(f"🔄 Resynchronisation complète demandée (since={since}, v{version})")
+            return Response(
+                {
+                    "version": version,
+                    "full": True,
+                    "geometries": get_scene_snapshot(version, self._build_snapshot),
+                }
+            )
+
+        upserts = self.get_queryset().filter(id__in=upsert_ids) if upsert_ids else []
+        return Response(
+            {
+                "version": version,
+                "full": False,
+                "upserts": self.get_serializer(upserts, many=True).data,
+                "deleted": deleted_ids,
+            }
+        )
+
+    @action(detail=False, methods=["patch"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Mise à jour groupée : PATCH /api/geometries/bulk/
+        Corps : [{"id": 1, "position": {...}, "visible": false}, ...]
+        Une seule validation, un seul bulk_update limité aux champs touchés,
+        et une seule nouvelle version de scène.
+        """
+        serializer = GeometryBulkUpdateSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Un même id peut apparaître plusieurs fois : le dernier l'emporte
+        vector_fields = GeometryBulkUpdateSerializer.VECTOR_FIELDS
+        changes = {}
+        for item in serializer.validated_data:
+            fields = changes.setdefault(item.pop("id"), {})
+            for attr, value in item.items():
+                if attr in vector_fields:
+                    value = {**fields.get(attr, {}), **value}
+                fields[attr] = value
+        if not changes:
+            return Response({"version": get_scene_version(), "updated": 0})
+
+        with transaction.atomic():
+            geometries = Geometry.objects.select_for_update().in_bulk(list(changes))
+            missing = sorted(set(changes) - set(geometries))
+            if missing:
+                return Response(
+                    {"error": "Géométries non trouvées", "ids": missing},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+            touched_fields = set()
+            for geometry_id, fields in changes.items():
+                geometry = geometries[geometry_id]
+                for attr, value in fields.items():
+                    if attr in vector_fields:
+                        # Position partielle : les axes absents sont conservés
+                        current = getattr(geometry, attr)
+                        value = {**(current if isinstance(current, dict) else {}), **value}
+                    setattr(geometry, attr, value)
+                touched_fields.update(fields)
+
+            update_fields = [
+                field
+                for field in GeometryBulkUpdateSerializer.BULK_FIELDS
+                if field in touched_fields
+            ]
+            if "position" in update_fields:
+                # bulk_update n'appelle pas save() : colonnes indexées à recopier
+                for geometry in geometries.values():
+                    geometry.sync_position_columns()
+                update_fields.extend(Geometry.POSITION_COLUMNS)
+            if update_fields:
+                Geometry.objects.bulk_update(
+                    geometries.values(), update_fields, batch_size=500
+                )
+            # bulk_update n'émet pas post_save : journal et événements explicites
+            version = record_geometry_changes(
+                list(geometries), GeometryChange.ACTION_UPSERT
+            )
+            for geometry_id, geometry in geometries.items():
+                publish_geometry_event(EVENT_UPDATED, geometry_id, version, geometry)
+
+        logger.info(f"✅ Bulk update: {len(geometries)} géométries (v{version})")
+        return Response({"version": version, "updated": len(geometries)})
 
     def partial_update(self, request, *args, **kwargs):
         logger.info(f"--- Entering partial_update for Geometry ID: {kwargs.get('pk')} ---")
@@ -43,8 +184,9 @@ class GeometryViewSet(viewsets.ModelViewSet):
         # La sauvegarde initiale gère l'upload du fichier grâce au serializer
         geometry_instance = serializer.save()
 
-        # Si une URL de modèle a été générée, créer l'enregistrement CloudinaryAsset
-        if geometry_instance.model_url:
+        # URL fournie sans passer par l'upload (asset non lié) : retrouver ou créer
+        # l'enregistrement CloudinaryAsset et le lier à la géométrie
+        if geometry_instance.model_url and geometry_instance.asset_id is None:
             # Extraire le public_id depuis l'URL Cloudinary
             url_pattern = r"/dv-threlte/models/([^/]+)"
             match = re.search(url_pattern, geometry_instance.model_url)
@@ -52,18 +194,18 @@ class GeometryViewSet(viewsets.ModelViewSet):
             if match:
                 public_id = f"dv-threlte/models/{match.group(1)}"
 
-                # Créer ou mettre à jour l'enregistrement de l'asset
-                asset, created = CloudinaryAsset.objects.update_or_create(
+                asset, created = CloudinaryAsset.objects.get_or_create(
                     public_id=public_id,
                     defaults={
                         "url": geometry_instance.model_url,
                         "asset_type": "raw",
                         "file_name": geometry_instance.name or public_id.split("/")[-1],
-                        "file_size": 0,  # Size not available from URL
                     },
                 )
+                geometry_instance.asset = asset
+                geometry_instance.save(update_fields=["asset"])
                 logger.info(
-                    f"✅ {'Created' if created else 'Updated'} CloudinaryAsset: {public_id}"
+                    f"✅ {'Created' if created else 'Found'} CloudinaryAsset: {public_id}"
                 )
 
         logger.info(f"✅ Created geometry: {geometry_instance.name}")
@@ -72,40 +214,18 @@ class GeometryViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        from django.db import transaction # Import transaction here
-
         with transaction.atomic():
-            # Supprimer le fichier Cloudinary associé
-            if instance.model_url:
-                try:
-                    # Extraire le public_id depuis l'URL
-                    url_pattern = r"/dv-threlte/models/([^/]+)"
-                    match = re.search(url_pattern, instance.model_url)
-
-                    if match:
-                        public_id = f"dv-threlte/models/{match.group(1)}"
-
-                        # Supprimer l'asset de Cloudinary
-                        import cloudinary.uploader
-
-                        cloudinary.uploader.destroy(public_id, resource_type="raw")
-                        logger.info(f"✅ Deleted Cloudinary asset: {public_id}")
-
-                        # Supprimer l'enregistrement CloudinaryAsset correspondant
-                        from .models import CloudinaryAsset
-
-                        CloudinaryAsset.objects.filter(public_id=public_id).delete()
-                        logger.info(f"✅ Deleted CloudinaryAsset record: {public_id}")
-                    else:
-                        logger.warning(f"⚠️ Could not extract public_id from model_url: {instance.model_url}. Cloudinary asset not deleted.")
-
-                except Exception as e:
-                    logger.error(f"❌ Error deleting Cloudinary asset: {str(e)}. Rolling back transaction.")
-                    # Re-raise to trigger transaction rollback
-                    raise
+            # Fichier distant supprimé après le commit (outbox), sauf s'il est
+            # partagé par une autre géométrie (déduplication)
+            asset = instance.asset
+            # Les variantes (LOD...) sont supprimées avec leur source
+            if asset is not None and release_asset(asset, instance):
+                logger.info(f"✅ Deleted CloudinaryAsset record: {asset.public_id} (remote deletion queued)")
+            elif asset is None and instance.model_url:
+                logger.warning(f"⚠️ No asset linked to geometry {instance.pk} ({instance.model_url}). Remote file not deleted.")
 
             self.perform_destroy(instance)
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ToggleGeometryVisibilityView(APIView):
@@ -113,7 +233,7 @@ class ToggleGeometryVisibilityView(APIView):
         try:
             geometry = Geometry.objects.get(pk=pk)
             geometry.visible = not geometry.visible
-            geometry.save()
+            geometry.save(update_fields=["visible"])
 
             return Response(
                 {
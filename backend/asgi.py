@@ -1,3 +1,9 @@
+"""
+Point d'entrée ASGI (ex: uvicorn backend.asgi:application).
+Requis pour le flux SSE /api/geometries/events/ ; les autres vues restent
+servies à l'identique qu'en WSGI.
+"""
+
 import os
 
 from django.core.asgi import get_asgi_application
@@ -1,6 +1,15 @@
-from django.apps import AppConfig
-
-
-class FilmsConfig(AppConfig):
-    default_auto_field = "django.db.models.BigAutoField"
-    name = "backend.films"
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class FilmsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "backend.films"
+
+    def ready(self):
+        """
+        Recrée les triggers de recherche perdus après une migration
+        """
+        from backend.search import ensure_search_triggers
+
+        post_migrate.connect(ensure_search_triggers, sender=self)
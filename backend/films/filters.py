@@ -0,0 +1,32 @@
+from django.contrib.contenttypes.models import ContentType
+from rest_framework.filters import BaseFilterBackend
+from taggit.models import Tag, TaggedItem
+
+
+class TagFilterBackend(BaseFilterBackend):
+    """
+    ?tags=a,b : objets portant tous ces tags.
+    Chaque tag devient un `id IN (SELECT object_id FROM taggit_taggeditem
+    WHERE content_type_id = ... AND tag_id = ...)` sur la table de liaison de
+    taggit (index tag_id / content_type, object_id), sans JOIN ni DISTINCT.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        names = {name.strip() for name in request.query_params.get("tags", "").split(",")}
+        names.discard("")
+        if not names:
+            return queryset
+
+        tag_ids = list(Tag.objects.filter(name__in=names).values_list("id", flat=True))
+        if len(tag_ids) < len(names):
+            # Un tag inconnu : aucun objet ne peut les porter tous
+            return queryset.none()
+
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        for tag_id in tag_ids:
+            queryset = queryset.filter(
+                id__in=TaggedItem.objects.filter(
+                    content_type=content_type, tag_id=tag_id
+                ).values("object_id")
+            )
+        return queryset
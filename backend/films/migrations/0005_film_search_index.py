@@ -0,0 +1,74 @@
+from django.db import migrations
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL exécuté uniquement sur la base `vendor` (sqlite, postgresql)"""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Recherche plein texte (voir backend/search.py) : name (A), director (B), description (C)
+POSTGRESQL_SQL = [
+    """ALTER TABLE "films_film" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce("name", '')), 'A')
+        || setweight(to_tsvector('simple', coalesce("director", '')), 'B')
+        || setweight(to_tsvector('simple', coalesce("description", '')), 'C')
+    ) STORED""",
+    'CREATE INDEX "films_film_search_vector" ON "films_film" USING GIN (search_vector)',
+]
+POSTGRESQL_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS "films_film_search_vector"',
+    'ALTER TABLE "films_film" DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_SQL = [
+    """CREATE VIRTUAL TABLE "films_film_fts" USING fts5(
+        "name", "director", "description",
+        content="films_film", content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER "films_film_fts_insert" AFTER INSERT ON "films_film" BEGIN
+        INSERT INTO "films_film_fts" (rowid, "name", "director", "description")
+        VALUES (new.id, new."name", new."director", new."description");
+    END""",
+    """CREATE TRIGGER "films_film_fts_delete" AFTER DELETE ON "films_film" BEGIN
+        INSERT INTO "films_film_fts" ("films_film_fts", rowid, "name", "director", "description")
+        VALUES ('delete', old.id, old."name", old."director", old."description");
+    END""",
+    """CREATE TRIGGER "films_film_fts_update" AFTER UPDATE OF "name", "director", "description"
+    ON "films_film" BEGIN
+        INSERT INTO "films_film_fts" ("films_film_fts", rowid, "name", "director", "description")
+        VALUES ('delete', old.id, old."name", old."director", old."description");
+        INSERT INTO "films_film_fts" (rowid, "name", "director", "description")
+        VALUES (new.id, new."name", new."director", new."description");
+    END""",
+    # Indexation des lignes existantes
+    """INSERT INTO "films_film_fts" ("films_film_fts") VALUES ('rebuild')""",
+]
+SQLITE_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS "films_film_fts_insert"',
+    'DROP TRIGGER IF EXISTS "films_film_fts_delete"',
+    'DROP TRIGGER IF EXISTS "films_film_fts_update"',
+    'DROP TABLE IF EXISTS "films_film_fts"',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('films', '0004_alter_film_options'),
+    ]
+
+    operations = [
+        VendorRunSQL("postgresql", POSTGRESQL_SQL, POSTGRESQL_REVERSE_SQL),
+        VendorRunSQL("sqlite", SQLITE_SQL, SQLITE_REVERSE_SQL),
+    ]
@@ -0,0 +1,57 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class FilmCursorPagination(CursorPagination):
+    """
+    Pagination par curseur sur -id : chaque page est une requête
+    `WHERE id < <curseur> ORDER BY id DESC LIMIT n` sur la clé primaire,
+    sans OFFSET ni COUNT(*), quelle que soit la profondeur.
+    """
+
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class FilmPagination(PageNumberPagination):
+    """
+    Contrat historique par défaut : ?page=, réponse avec `count`.
+    Pagination par curseur sur demande (?pagination=cursor) ; les liens
+    next/previous portent ensuite ?cursor=, qui suffit à la conserver.
+
+    Recherche plein texte : toujours par numéro de page. Le curseur DRF ne
+    compare que le premier champ de tri, et search_rank n'est pas unique
+    (ex aequo sautés ou répétés d'une page à l'autre).
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_pagination_class = FilmCursorPagination
+
+    def use_cursor(self, request, queryset):
+        if "search_rank" in queryset.query.annotations:
+            return False
+        params = request.query_params
+        return "cursor" in params or params.get("pagination") == "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request, queryset):
+            self.cursor_paginator = self.cursor_pagination_class()
+            page = self.cursor_paginator.paginate_queryset(queryset, request, view)
+            # API navigable : contrôles du paginateur effectif
+            self.display_page_controls = getattr(
+                self.cursor_paginator, "display_page_controls", False
+            )
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -1,3 +1,133 @@
-from django.test import TestCase
-
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase
+
+from backend.search import repair_search_triggers
+
+from .models import Film
+
+
+class FilmPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.films = [
+            Film.objects.create(name=f"Film {index}", description="", director="Varda")
+            for index in range(25)
+        ]
+        cls.films[0].tags.add("classique")
+        cls.films[1].tags.add("classique", "muet")
+
+    def test_page_numbers_by_default(self):
+        data = self.client.get("/api/films/").json()
+        self.assertEqual(data["count"], 25)
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIn("page=2", data["next"])
+
+        data = self.client.get("/api/films/?page=3").json()
+        self.assertEqual(len(data["results"]), 5)
+        self.assertIsNone(data["next"])
+
+        data = self.client.get("/api/films/?page_size=500").json()
+        self.assertEqual(len(data["results"]), 25)
+
+    def test_cursor_on_request(self):
+        response = self.client.get("/api/films/?pagination=cursor&page_size=10")
+        data = response.json()
+        self.assertNotIn("count", data)
+        self.assertIn("cursor=", data["next"])
+
+        seen = [film["id"] for film in data["results"]]
+        next_url = data["next"]
+        while next_url:
+            data = self.client.get(next_url).json()
+            seen.extend(film["id"] for film in data["results"])
+            next_url = data["next"]
+        # Ordre -id, sans doublon ni trou
+        self.assertEqual(seen, sorted((film.pk for film in self.films), reverse=True))
+
+        previous = self.client.get(data["previous"]).json()
+        self.assertEqual(len(previous["results"]), 10)
+
+    def test_browsable_api_with_both_paginators(self):
+        for url in ("/api/films/", "/api/films/?pagination=cursor"):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT="text/html")
+                self.assertEqual(response.status_code, 200)
+
+    def test_tag_filter(self):
+        data = self.client.get("/api/films/?tags=classique").json()
+        self.assertEqual(data["count"], 2)
+        data = self.client.get("/api/films/?tags=classique,muet").json()
+        self.assertEqual([film["id"] for film in data["results"]], [self.films[1].pk])
+        self.assertEqual(self.client.get("/api/films/?tags=inconnu").json()["count"], 0)
+
+    def test_tags_prefetched(self):
+        with self.assertNumQueries(3):
+            self.client.get("/api/films/?page_size=25")
+
+
+class FilmSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alien = Film.objects.create(
+            name="Alien", director="Ridley Scott", description="Un cargo spatial"
+        )
+        cls.aliens = Film.objects.create(
+            name="Aliens", director="James Cameron", description="La suite"
+        )
+        cls.scott = Film.objects.create(
+            name="Blade Runner", director="Ridley Scott", description="Des réplicants"
+        )
+        cls.amelie = Film.objects.create(
+            name="Le Fabuleux Destin d'Amélie Poulain", director="Jean-Pierre Jeunet",
+            description="Montmartre",
+        )
+
+    def search(self, query, **params):
+        return self.client.get("/api/films/", {"search": query, **params}).json()
+
+    def ids(self, query):
+        return [film["id"] for film in self.search(query)["results"]]
+
+    def test_prefix_terms_and_weights(self):
+        self.assertEqual(sorted(self.ids("alie")), sorted([self.alien.pk, self.aliens.pk]))
+        # Tous les mots doivent correspondre
+        self.assertEqual(self.ids("alien ridley"), [self.alien.pk])
+        # Le titre (A) pèse plus que la description (C)
+        self.assertEqual(self.ids("blade")[0], self.scott.pk)
+        self.assertEqual(self.ids("amelie"), [self.amelie.pk])
+        self.assertEqual(self.ids("introuvable"), [])
+
+    def test_index_follows_writes(self):
+        self.scott.name = "Gladiator"
+        self.scott.save()
+        self.assertEqual(self.ids("blade"), [])
+        self.assertEqual(self.ids("gladiator"), [self.scott.pk])
+        self.alien.delete()
+        self.assertEqual(self.ids("ridley"), [self.scott.pk])
+
+    def test_ranked_results_page_by_number(self):
+        for index in range(15):
+            Film.objects.create(name="Alien", director="", description=f"copie {index}")
+        # Curseur ignoré : les ex aequo ne sont ni sautés ni répétés
+        data = self.search("alien", pagination="cursor", page_size=5)
+        self.assertEqual(data["count"], 17)
+        seen = [film["id"] for film in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            seen.extend(film["id"] for film in data["results"])
+        self.assertEqual(len(seen), 17)
+        self.assertEqual(len(set(seen)), 17)
+
+    def test_lost_triggers_are_repaired(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Triggers FTS5 : SQLite uniquement")
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER "films_film_fts_insert"')
+        Film.objects.create(name="Nosferatu", director="Murnau", description="")
+        self.assertEqual(self.ids("nosferatu"), [])
+
+        with self.assertLogs("backend.search", "WARNING"):
+            self.assertEqual(repair_search_triggers(connection, [Film]), ["films_film"])
+        # Index reconstruit : la ligne écrite sans trigger est retrouvée
+        self.assertEqual(len(self.ids("nosferatu")), 1)
+        self.assertEqual(repair_search_triggers(connection, [Film]), [])
@@ -1,21 +1,32 @@
-from django.shortcuts import render
-from rest_framework import generics, viewsets
-
-from .models import Film
-from .serializers import FilmSerializer
-
-
-class FilmViewSet(viewsets.ModelViewSet):
-    queryset = Film.objects.all()
-    serializer_class = FilmSerializer
-
-
-# Create your views here.
-class FilmListAPIView(generics.ListAPIView):
-    queryset = Film.objects.all()
-    serializer_class = FilmSerializer
-
-
-class FilmDetailAPIView(generics.RetrieveAPIView):
-    queryset = Film.objects.all()
-    serializer_class = FilmSerializer
+from rest_framework import generics, viewsets
+from rest_framework.filters import OrderingFilter
+
+from backend.search import FullTextSearchFilter
+
+from .filters import TagFilterBackend
+from .models import Film
+from .pagination import FilmPagination
+from .serializers import FilmSerializer
+
+
+class FilmQuerysetMixin:
+    # Tags chargés en une requête par page (au lieu d'une par film)
+    queryset = Film.objects.prefetch_related("tags")
+    serializer_class = FilmSerializer
+    pagination_class = FilmPagination
+    filter_backends = [TagFilterBackend, FullTextSearchFilter, OrderingFilter]
+    # La pagination par curseur (opt-in) exige un tri unique et indexé
+    ordering_fields = ["id"]
+
+
+class FilmViewSet(FilmQuerysetMixin, viewsets.ModelViewSet):
+    pass
+
+
+class FilmListAPIView(FilmQuerysetMixin, generics.ListAPIView):
+    pass
+
+
+class FilmDetailAPIView(generics.RetrieveAPIView):
+    queryset = Film.objects.prefetch_related("tags")
+    serializer_class = FilmSerializer
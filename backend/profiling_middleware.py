@@ -0,0 +1,236 @@
+"""
+Profilage des requêtes (opt-in : REQUEST_PROFILING_ENABLED).
+
+Pour chaque requête, par nom d'URL résolu (ex: "film-list") : durée totale,
+nombre et durée des requêtes SQL (connection.execute_wrapper), requêtes SQL
+répétées (signe d'un N+1), temps de sérialisation DRF (`serializer.data`,
+requêtes paresseuses comprises) et taille de la réponse.
+
+Les mesures sont gardées dans un tampon circulaire borné
+(REQUEST_PROFILING_BUFFER requêtes) ; les agrégats sont calculés à la lecture
+(/api/debug/profiling/, réservé aux membres du staff).
+
+Option : une fraction REQUEST_PROFILING_SAMPLE_RATE des requêtes est
+exécutée sous cProfile ; le profil est écrit dans REQUEST_PROFILING_DIR
+seulement si la requête dépasse REQUEST_PROFILING_SLOW_MS.
+"""
+
+import cProfile
+import functools
+import logging
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Mesures de la requête en cours (None hors d'une requête profilée)
+_current = ContextVar("request_profile", default=None)
+# cProfile ne supporte qu'un profileur actif à la fois
+_profiler_lock = threading.Lock()
+
+
+class RequestProfiles:
+    """Tampon circulaire des dernières requêtes profilées"""
+
+    def __init__(self, capacity=1000):
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=capacity)
+
+    def resize(self, capacity):
+        with self._lock:
+            if self.samples.maxlen != capacity:
+                self.samples = deque(self.samples, maxlen=capacity)
+
+    def record(self, sample):
+        with self._lock:
+            self.samples.append(sample)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+    def summary(self, recent=20):
+        with self._lock:
+            samples = list(self.samples)
+        by_name = defaultdict(list)
+        for sample in samples:
+            by_name[sample["url_name"]].append(sample)
+
+        endpoints = {}
+        for name, group in by_name.items():
+            walls = sorted(s["wall_ms"] for s in group)
+            endpoints[name] = {
+                "count": len(group),
+                "wall_ms": {
+                    "p50": _percentile(walls, 0.5),
+                    "p95": _percentile(walls, 0.95),
+                    "max": walls[-1],
+                },
+                "queries": {
+                    "avg": round(statistics.fmean(s["queries"] for s in group), 1),
+                    "max": max(s["queries"] for s in group),
+                    "duplicates_max": max(s["duplicate_queries"] for s in group),
+                },
+                "db_ms_avg": round(statistics.fmean(s["db_ms"] for s in group), 1),
+                "serializer_ms_avg": round(
+                    statistics.fmean(s["serializer_ms"] for s in group), 1
+                ),
+                "bytes_avg": round(statistics.fmean(s["bytes"] or 0 for s in group)),
+            }
+        return {
+            "buffer": {"size": len(samples), "capacity": self.samples.maxlen},
+            # Les plus lents d'abord
+            "endpoints": dict(
+                sorted(endpoints.items(), key=lambda item: -item[1]["wall_ms"]["p95"])
+            ),
+            "recent": samples[-recent:][::-1],
+        }
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+request_profiles = RequestProfiles()
+
+
+def _count_query(profile, execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile["db_time"] += time.perf_counter() - started
+        profile["queries"] += 1
+        if sql in profile["statements"]:
+            profile["duplicate_queries"] += 1
+        else:
+            profile["statements"].add(sql)
+
+
+def _timed_data(fget):
+    @functools.wraps(fget)
+    def data(self):
+        profile = _current.get()
+        # Sérialiseurs imbriqués : seul l'appel le plus externe est compté
+        if profile is None or profile["serializer_depth"]:
+            return fget(self)
+        profile["serializer_depth"] += 1
+        started = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            profile["serializer_depth"] -= 1
+            profile["serializer_time"] += time.perf_counter() - started
+
+    data.profiled = True
+    return property(data)
+
+
+def install_serializer_timer():
+    """Chronomètre `serializer.data` (sans effet hors d'une requête profilée)"""
+    from rest_framework import serializers
+
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        fget = serializer_class.data.fget
+        if not getattr(fget, "profiled", False):
+            serializer_class.data = _timed_data(fget)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        request_profiles.resize(getattr(settings, "REQUEST_PROFILING_BUFFER", 1000))
+        install_serializer_timer()
+
+    def _start_profiler(self):
+        rate = getattr(settings, "REQUEST_PROFILING_SAMPLE_RATE", 0.0)
+        if not rate or random.random() >= rate:
+            return None
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Un autre outil de profilage est déjà actif
+            _profiler_lock.release()
+            return None
+        return profiler
+
+    def _dump_profile(self, profiler, url_name, wall_ms):
+        directory = str(getattr(settings, "REQUEST_PROFILING_DIR", settings.BASE_DIR / "profiles"))
+        os.makedirs(directory, exist_ok=True)
+        stamp = timezone.now().strftime("%Y%m%dT%H%M%S%f")
+        safe_name = re.sub(r"[^\w.-]+", "_", url_name)
+        path = os.path.join(directory, f"{stamp}-{safe_name}-{round(wall_ms)}ms.prof")
+        profiler.dump_stats(path)
+        logger.info(f"🐢 Requête lente profilée ({url_name}, {round(wall_ms)} ms): {path}")
+        return path
+
+    def __call__(self, request):
+        profile = {
+            "queries": 0,
+            "duplicate_queries": 0,
+            "statements": set(),
+            "db_time": 0.0,
+            "serializer_time": 0.0,
+            "serializer_depth": 0,
+        }
+        token = _current.set(profile)
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(functools.partial(_count_query, profile))
+                    )
+                response = self.get_response(request)
+        finally:
+            wall_ms = (time.perf_counter() - started) * 1000
+            if profiler is not None:
+                profiler.disable()
+                _profiler_lock.release()
+            _current.reset(token)
+
+        match = getattr(request, "resolver_match", None)
+        url_name = (match.view_name if match else None) or "<unresolved>"
+        profile_path = None
+        if profiler is not None and wall_ms >= getattr(settings, "REQUEST_PROFILING_SLOW_MS", 500):
+            try:
+                profile_path = self._dump_profile(profiler, url_name, wall_ms)
+            except OSError as e:
+                logger.warning(f"⚠️ Écriture du profil impossible: {str(e)}")
+
+        request_profiles.record(
+            {
+                "url_name": url_name,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "at": timezone.now().isoformat(),
+                "wall_ms": round(wall_ms, 2),
+                "queries": profile["queries"],
+                "duplicate_queries": profile["duplicate_queries"],
+                "db_ms": round(profile["db_time"] * 1000, 2),
+                "serializer_ms": round(profile["serializer_time"] * 1000, 2),
+                # Réponses en flux (SSE) : taille inconnue
+                "bytes": None if response.streaming else len(response.content),
+                "profile": profile_path,
+            }
+        )
+        return response
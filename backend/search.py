@@ -0,0 +1,226 @@
+"""
+Recherche plein texte (films, géométries).
+
+Une seule API, `search(queryset, query)`, deux moteurs selon la base :
+- PostgreSQL (DATABASE_URL) : colonne `search_vector` tsvector générée
+  (GENERATED ALWAYS ... STORED) avec index GIN ;
+- SQLite (développement) : table virtuelle FTS5 `<table>_fts` à contenu
+  externe, tenue à jour par des triggers INSERT/UPDATE/DELETE.
+
+Dans les deux cas la base met l'index à jour ligne par ligne à chaque
+écriture (save, bulk_create, bulk_update, delete) : aucune réindexation.
+Colonne, table virtuelle et triggers sont créés par migration (SQL en dur)
+et restent invisibles pour l'ORM. Après chaque `migrate`, les triggers
+SQLite perdus lors d'une reconstruction de table sont recréés
+(`ensure_search_triggers`).
+
+Requête : mots (\\w+) en ET logique, chacun en préfixe ("pix" trouve
+"pixar") ; résultats annotés par `search_rank` (plus grand = plus pertinent)
+et triés par pertinence. Autres bases : repli sur icontains, sans rang.
+"""
+
+import logging
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+# Champs indexés et poids (A > B > C) par modèle
+SEARCH_INDEXES = {
+    "films.Film": (("name", "A"), ("director", "B"), ("description", "C")),
+    "Base_threlte_dv.Geometry": (("name", "A"), ("type", "B"), ("model_type", "C")),
+}
+# Configuration sans racinisation : titres et noms propres multilingues
+TS_CONFIG = "simple"
+# Poids bm25 (FTS5) équivalents aux poids A/B/C de PostgreSQL
+FTS_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 1.0}
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+
+def _vendor(schema_editor):
+    return schema_editor.connection.vendor
+
+
+def _sqlite_trigger_sql(qn, table, fields):
+    """Triggers tenant la table FTS5 de `table` à jour (nom, SQL)"""
+    fts = qn(f"{table}_fts")
+    columns = ", ".join(qn(name) for name, _ in fields)
+    new_values = ", ".join(f"new.{qn(name)}" for name, _ in fields)
+    old_values = ", ".join(f"old.{qn(name)}" for name, _ in fields)
+    delete_old = (
+        f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        (
+            f"{table}_fts_insert",
+            f"AFTER INSERT ON {qn(table)} BEGIN {insert_new} END",
+        ),
+        (
+            f"{table}_fts_delete",
+            f"AFTER DELETE ON {qn(table)} BEGIN {delete_old} END",
+        ),
+        (
+            f"{table}_fts_update",
+            f"AFTER UPDATE OF {columns} ON {qn(table)} BEGIN {delete_old} {insert_new} END",
+        ),
+    ]
+
+
+def install_search_index(schema_editor, table, fields):
+    """
+    Crée l'index plein texte de `table`. Les migrations (films 0005,
+    Base_threlte_dv 0023) contiennent le même SQL en dur ; sert aux tests
+    qui créent les tables sans migrations.
+    """
+    qn = schema_editor.quote_name
+    if _vendor(schema_editor) == "postgresql":
+        vector = " || ".join(
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce({qn(name)}, '')), '{weight}')"
+            for name, weight in fields
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {qn(table)} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {qn(table + '_search_vector')} ON {qn(table)} USING GIN (search_vector)"
+        )
+    elif _vendor(schema_editor) == "sqlite":
+        fts = qn(f"{table}_fts")
+        columns = ", ".join(qn(name) for name, _ in fields)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content={qn(table)}, "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        for name, body in _sqlite_trigger_sql(qn, table, fields):
+            schema_editor.execute(f"CREATE TRIGGER {qn(name)} {body}")
+        # Indexation des lignes existantes
+        schema_editor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def uninstall_search_index(schema_editor, table):
+    qn = schema_editor.quote_name
+    if _vendor(schema_editor) == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {qn(table + '_search_vector')}")
+        schema_editor.execute(f"ALTER TABLE {qn(table)} DROP COLUMN IF EXISTS search_vector")
+    elif _vendor(schema_editor) == "sqlite":
+        for suffix in ("_fts_insert", "_fts_delete", "_fts_update"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {qn(table + suffix)}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {qn(table + '_fts')}")
+
+
+def repair_search_triggers(connection, models):
+    """
+    SQLite reconstruit une table (copie puis renommage) pour certaines
+    migrations, dont l'ajout d'une colonne NOT NULL, et perd alors ses
+    triggers : l'index FTS5 cesserait silencieusement de suivre les
+    écritures. Recrée les triggers manquants des tables déjà indexées et
+    réindexe. Retourne les tables réparées.
+    """
+    if connection.vendor != "sqlite":
+        return []
+    qn = connection.ops.quote_name
+    repaired = []
+    with connection.cursor() as cursor:
+        for model in models:
+            fields = SEARCH_INDEXES.get(model._meta.label)
+            if fields is None:
+                continue
+            table = model._meta.db_table
+            cursor.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE name = %s OR (type = 'trigger' AND tbl_name = %s)",
+                [f"{table}_fts", table],
+            )
+            existing = {name for (name,) in cursor.fetchall()}
+            if f"{table}_fts" not in existing:
+                # Migration de l'index pas encore appliquée
+                continue
+            triggers = _sqlite_trigger_sql(qn, table, fields)
+            missing = [(name, body) for name, body in triggers if name not in existing]
+            if not missing:
+                continue
+            for name, body in missing:
+                cursor.execute(f"CREATE TRIGGER {qn(name)} {body}")
+            fts = qn(f"{table}_fts")
+            cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            logger.warning(
+                f"⚠️ Triggers de recherche manquants sur {table} "
+                f"({', '.join(name for name, _ in missing)}) : recréés, index reconstruit"
+            )
+            repaired.append(table)
+    return repaired
+
+
+def ensure_search_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Récepteur post_migrate (voir apps.ready) : répare les triggers FTS5 de l'app"""
+    repair_search_triggers(connections[using], sender.get_models())
+
+
+def search(queryset, query):
+    """Filtre `queryset` par `query`, annoté par search_rank et trié par pertinence"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    model = queryset.model
+    fields = SEARCH_INDEXES[model._meta.label]
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = f"{table}.{qn(model._meta.pk.column)}"
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        vector = f"{table}.search_vector"
+        matches = RawSQL(
+            f"{vector} @@ to_tsquery('{TS_CONFIG}', %s)", (tsquery,), output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f"ts_rank_cd({vector}, to_tsquery('{TS_CONFIG}', %s))",
+            (tsquery,),
+            output_field=FloatField(),
+        )
+        queryset = queryset.alias(search_match=matches).filter(search_match=True)
+    elif connection.vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        fts_table = f"{model._meta.db_table}_fts"
+        fts = qn(fts_table)
+        weights = ", ".join(str(FTS_WEIGHTS[weight]) for _, weight in fields)
+        # Jointure directe sur la table FTS5 : une sous-requête corrélée
+        # réévaluerait le MATCH pour chaque ligne (quadratique)
+        queryset = queryset.extra(
+            tables=[fts_table], where=[f"{fts}.rowid = {pk}", f"{fts} MATCH %s"], params=[match]
+        )
+        # bm25 est négatif (plus petit = plus pertinent)
+        rank = RawSQL(f"-bm25({fts}, {weights})", (), output_field=FloatField())
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q.create(
+                [(f"{name}__icontains", term) for name, _ in fields], connector=Q.OR
+            )
+        queryset = queryset.filter(condition)
+        rank = Value(0.0, output_field=FloatField())
+
+    return queryset.annotate(search_rank=rank).order_by("-search_rank", "-pk")
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """?search= : recherche plein texte indexée (modèles de SEARCH_INDEXES)"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(api_settings.SEARCH_PARAM, "")
+        if not query or queryset.model._meta.label not in SEARCH_INDEXES:
+            return queryset
+        return search(queryset, query)
@@ -97,7 +97,8 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": [
-        "rest_framework.filters.SearchFilter",
+        # ?search= : recherche plein texte indexée (tsvector/GIN ou FTS5)
+        "backend.search.FullTextSearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
@@ -125,6 +126,8 @@ ADMIN_SITE_TITLE = "Film Service Admin"
 ADMIN_INDEX_TITLE = "Gestion des Films et Géométries"
 
 MIDDLEWARE = [
+    # Inactif sauf si REQUEST_PROFILING_ENABLED (voir plus bas)
+    "backend.profiling_middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -137,6 +140,17 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Profilage des requêtes (durée, requêtes SQL, sérialisation par nom d'URL),
+# consultable par le staff sur /api/debug/profiling/
+REQUEST_PROFILING_ENABLED = os.environ.get("REQUEST_PROFILING_ENABLED", "False") == "True"
+# Nombre de requêtes gardées en mémoire (tampon circulaire)
+REQUEST_PROFILING_BUFFER = int(os.environ.get("REQUEST_PROFILING_BUFFER", "1000"))
+# Fraction des requêtes exécutées sous cProfile (0 = jamais) ; le profil n'est
+# écrit dans REQUEST_PROFILING_DIR que si la requête dépasse REQUEST_PROFILING_SLOW_MS
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get("REQUEST_PROFILING_SAMPLE_RATE", "0"))
+REQUEST_PROFILING_SLOW_MS = float(os.environ.get("REQUEST_PROFILING_SLOW_MS", "500"))
+REQUEST_PROFILING_DIR = os.environ.get("REQUEST_PROFILING_DIR", str(BASE_DIR / "profiles"))
+
 ROOT_URLCONF = "backend.urls"
 
 TEMPLATES = [
@@ -290,6 +304,91 @@ else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads asynchrones : le fichier est copié en staging local, la Geometry est
+# créée en "pending" et un pool de workers l'envoie vers le backend de stockage.
+UPLOAD_ASYNC = os.environ.get("UPLOAD_ASYNC", "True") == "True"
+UPLOAD_EXECUTOR = os.environ.get(
+    "UPLOAD_EXECUTOR", "concurrent.futures.ThreadPoolExecutor"
+)
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "4"))
+UPLOAD_STAGING_DIR = os.environ.get("UPLOAD_STAGING_DIR")  # défaut: /tmp/dv-threlte-staging
+# Upload par morceaux (/api/uploads/) : taille de morceau conseillée et taille max
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_SIZE = int(os.environ.get("UPLOAD_MAX_SIZE", str(512 * 1024 * 1024)))
+# Sessions par morceaux sans activité depuis ce délai (secondes) : supprimées avec leur fichier
+UPLOAD_SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", str(24 * 3600)))
+# Backend des fichiers : "cloudinary", "s3" (B2), "local" ou chemin d'import ;
+# vide = Cloudinary, ou B2 si USE_B2_STORAGE
+BLOB_STORAGE_BACKEND = os.environ.get("BLOB_STORAGE_BACKEND")
+# Connexions HTTP gardées ouvertes par backend (partagées entre threads)
+BLOB_POOL_CONNECTIONS = int(os.environ.get("BLOB_POOL_CONNECTIONS", "20"))
+# S3/B2 : upload multipart au-delà de ce seuil (octets)
+BLOB_MULTIPART_THRESHOLD = int(
+    os.environ.get("BLOB_MULTIPART_THRESHOLD", str(16 * 1024 * 1024))
+)
+# Backend local : URL publique de MEDIA_ROOT
+BLOB_LOCAL_URL = os.environ.get("BLOB_LOCAL_URL", "http://localhost:8000/media/")
+# Sonde de stockage en arrière-plan (servie en cache par /api/storage/status/ et /health/)
+STORAGE_PROBE_ENABLED = os.environ.get("STORAGE_PROBE_ENABLED", "True") == "True"
+STORAGE_PROBE_INTERVAL = float(os.environ.get("STORAGE_PROBE_INTERVAL", "60"))
+# Backends sondés (noms courts, séparés par des virgules) ; vide = backend actif
+STORAGE_PROBE_BACKENDS = [
+    name.strip()
+    for name in os.environ.get("STORAGE_PROBE_BACKENDS", "").split(",")
+    if name.strip()
+]
+# Index spatial des géométries (?near= / ?bbox=) : taille des cellules de la
+# grille en mémoire (unités de la scène) ; au-delà de SPATIAL_MAX_IDS résultats,
+# la requête utilise l'index SQL des colonnes position_x/y/z
+SPATIAL_INDEX_ENABLED = os.environ.get("SPATIAL_INDEX_ENABLED", "True") == "True"
+SPATIAL_GRID_CELL_SIZE = float(os.environ.get("SPATIAL_GRID_CELL_SIZE", "10"))
+SPATIAL_MAX_IDS = int(os.environ.get("SPATIAL_MAX_IDS", "5000"))
+# Métriques des opérations de stockage (/api/storage/metrics/) : fenêtre glissante (s)
+STORAGE_METRICS_WINDOW = float(os.environ.get("STORAGE_METRICS_WINDOW", "300"))
+
+# Synchronisation Cloudinary automatique après création d'un asset :
+# les déclenchements sont regroupés sur CLOUDINARY_SYNC_DEBOUNCE secondes
+CLOUDINARY_AUTO_SYNC = os.environ.get("CLOUDINARY_AUTO_SYNC", "True") == "True"
+CLOUDINARY_SYNC_DEBOUNCE = float(os.environ.get("CLOUDINARY_SYNC_DEBOUNCE", "5"))
+
+# Suppression différée des fichiers distants (outbox RemoteDeletion) :
+# délai de base des nouvelles tentatives (exponentiel) et nombre maximum d'essais
+REMOTE_DELETE_RETRY_DELAY = int(os.environ.get("REMOTE_DELETE_RETRY_DELAY", "30"))
+REMOTE_DELETE_MAX_ATTEMPTS = int(os.environ.get("REMOTE_DELETE_MAX_ATTEMPTS", "5"))
+# Relance automatique du reaper à la prochaine échéance (sinon : commande reap_remote_deletions)
+REMOTE_DELETE_RETRY_TIMER = os.environ.get("REMOTE_DELETE_RETRY_TIMER", "True") == "True"
+
+# Étapes d'ingestion des modèles GLB, exécutées dans un pool de processus.
+# "textures" produit le fichier utilisé par les étapes suivantes.
+MODEL_PROCESSING = os.environ.get("MODEL_PROCESSING", "True") == "True"
+MODEL_PROCESSING_STAGES = [
+    name.strip()
+    for name in os.environ.get("MODEL_PROCESSING_STAGES", "textures,lod,compression,thumbnail").split(",")
+    if name.strip()
+]
+MODEL_PROCESSING_EXECUTOR = os.environ.get(
+    "MODEL_PROCESSING_EXECUTOR", "concurrent.futures.ProcessPoolExecutor"
+)
+MODEL_PROCESSING_WORKERS = int(os.environ.get("MODEL_PROCESSING_WORKERS", "2"))
+# Ratios de triangles conservés pour chaque niveau de détail (lod1, lod2, ...)
+MODEL_LOD_RATIOS = [
+    float(ratio) for ratio in os.environ.get("MODEL_LOD_RATIOS", "0.5,0.25,0.1").split(",")
+]
+MODEL_LOD_MIN_TRIANGLES = int(os.environ.get("MODEL_LOD_MIN_TRIANGLES", "5000"))
+# Compression : "quantize" (intégré, par défaut) ou "draco" / "meshopt" (CLI
+# gltf-transform, vérifiée au démarrage ; "quantize" en repli si elle échoue).
+# La variante compressée est servie dans model_url (le source reste dans original_model_url).
+MODEL_COMPRESSION_CODEC = os.environ.get("MODEL_COMPRESSION_CODEC", "quantize")
+MODEL_COMPRESSION_CLI = os.environ.get("MODEL_COMPRESSION_CLI", "npx gltf-transform")
+MODEL_SERVE_COMPRESSED = os.environ.get("MODEL_SERVE_COMPRESSED", "True") == "True"
+# Textures embarquées : côté max en pixels, qualité WebP, cache par hash d'image
+MODEL_TEXTURE_MAX_SIZE = int(os.environ.get("MODEL_TEXTURE_MAX_SIZE", "2048"))
+MODEL_TEXTURE_QUALITY = int(os.environ.get("MODEL_TEXTURE_QUALITY", "85"))
+MODEL_TEXTURE_CACHE_DIR = os.environ.get("MODEL_TEXTURE_CACHE_DIR")
+# Miniatures WebP (modèles et image_plane) : côté en pixels, qualité
+MODEL_THUMBNAIL_SIZE = int(os.environ.get("MODEL_THUMBNAIL_SIZE", "256"))
+MODEL_THUMBNAIL_QUALITY = int(os.environ.get("MODEL_THUMBNAIL_QUALITY", "80"))
+
 # Legacy: Configuration Vercel Blob Storage (deprecated)
 BLOB_READ_WRITE_TOKEN = os.environ.get("BLOB_READ_WRITE_TOKEN")
 VERCEL_BLOB_STORE_ID = os.environ.get("STORE_ID", "your-store-id")
@@ -352,8 +451,37 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "if-none-match",
+    "content-range",
+    "x-chunk-crc32",
 ]
 
+# Exposer l'ETag et la version de scène au frontend (requêtes conditionnelles
+# et synchronisation différentielle sur /api/geometries/)
+CORS_EXPOSE_HEADERS = ["etag", "x-scene-version"]
+
+# Durée de vie (secondes) du snapshot sérialisé de la scène, indexé par version
+SCENE_SNAPSHOT_TTL = int(os.environ.get("SCENE_SNAPSHOT_TTL", "300"))
+
+# Journal des changements de la scène (synchronisation différentielle)
+# Nombre de versions conservées, et fréquence (en versions) de la compaction
+SCENE_CHANGELOG_RETENTION = int(os.environ.get("SCENE_CHANGELOG_RETENTION", "1000"))
+SCENE_CHANGELOG_COMPACT_EVERY = int(
+    os.environ.get("SCENE_CHANGELOG_COMPACT_EVERY", "100")
+)
+
+# Flux SSE des modifications de la scène (/api/geometries/events/, ASGI uniquement)
+# Broker en mémoire par défaut (un seul worker) ; plusieurs workers :
+# "backend.Base_threlte_dv.scene_events.PostgresNotifyBroker" (LISTEN/NOTIFY).
+# Fenêtre de fusion des événements par géométrie (s)
+SCENE_EVENT_BROKER = os.environ.get(
+    "SCENE_EVENT_BROKER", "backend.Base_threlte_dv.scene_events.InProcessBroker"
+)
+SCENE_EVENTS_COALESCE_WINDOW = float(
+    os.environ.get("SCENE_EVENTS_COALESCE_WINDOW", "0.1")
+)
+SCENE_EVENTS_HEARTBEAT = int(os.environ.get("SCENE_EVENTS_HEARTBEAT", "15"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -31,7 +31,26 @@ def health_check(request):
                 getattr(settings, "CLOUDINARY_STORAGE", {}).get("API_SECRET", None)
             ),
         },
-        "default_file_storage": str(settings.DEFAULT_FILE_STORAGE),
+        "default_file_storage": str(
+            getattr(settings, "DEFAULT_FILE_STORAGE", "django.core.files.storage.FileSystemStorage")
+        ),
+    }
+
+    # Stockage : dernier résultat de la sonde en arrière-plan (aucun appel réseau)
+    from backend.Base_threlte_dv.storage_probe import get_storage_health
+
+    storage = get_storage_health()
+    response_data["storage"] = {
+        "ok": storage["ok"],
+        "backends": {
+            name: {
+                "ok": probe["ok"],
+                "latency_ms": probe["latency_ms"],
+                "last_checked": probe["last_checked"],
+                "last_error": probe["last_error"],
+            }
+            for name, probe in storage["backends"].items()
+        },
     }
 
     try:
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+📤 Upload en masse des assets statiques vers Cloudinary ou Backblaze B2.
+
+Remplace upload-to-cloudinary.py et upload-to-b2.py (conservés comme raccourcis).
+
+- Un seul parcours de l'arborescence, uploads dans un pool de threads borné
+  (clients partagés : connexions HTTP réutilisées).
+- Manifeste persistant (chemin, taille, mtime, sha256, clé, URL) : les fichiers
+  inchangés sont ignorés et un upload interrompu reprend où il s'était arrêté.
+- B2 : upload multipart (boto3 TransferConfig) au-delà de --multipart-threshold.
+
+Les clients sont injectables (CloudinaryUploader(client=...), B2Uploader(client=...)) :
+tests possibles avec moto et un faux client Cloudinary.
+
+Usage:
+    python scripts/bulk_upload.py cloudinary [dossiers...] [--workers 8]
+    python scripts/bulk_upload.py b2 [dossiers...] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+HASH_BLOCK_SIZE = 1024 * 1024
+MANIFEST_DIR = ".upload-manifests"
+MANIFEST_SAVE_INTERVAL = 5.0
+MAX_ATTEMPTS = 3
+
+CLOUDINARY_SOURCE_DIRS = [
+    'static/models',
+    'static/assets',
+    'static/public',
+    'static/fkisios',
+    'static/textures',
+]
+B2_SOURCE_DIRS = ['vercel-blob-backup']
+# Fichiers de service jamais uploadés
+IGNORED_NAMES = {'file-list.json', '.DS_Store'}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.webm', '.mov'}
+CONTENT_TYPES = {
+    '.glb': 'model/gltf-binary',
+    '.gltf': 'model/gltf+json',
+    '.hdr': 'image/vnd.radiance',
+}
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    État des fichiers déjà envoyés, par cible, sauvegardé atomiquement.
+    Thread-safe : les workers enregistrent leurs résultats au fil de l'eau.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        # Écritures sérialisées : un instantané ancien n'écrase jamais un plus récent
+        self.save_lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f).get('files', {})
+
+    def get(self, relative_path):
+        with self.lock:
+            return self.entries.get(relative_path)
+
+    def record(self, relative_path, entry):
+        with self.lock:
+            self.entries[relative_path] = entry
+            self.dirty = True
+            due = time.monotonic() - self.saved_at >= MANIFEST_SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                data = json.dumps({'version': 1, 'files': self.entries}, indent=1, sort_keys=True)
+                self.dirty = False
+                self.saved_at = time.monotonic()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+
+class CloudinaryUploader:
+    name = 'cloudinary'
+    source_dirs = CLOUDINARY_SOURCE_DIRS
+
+    def __init__(self, client=None, folder='dv-threlte'):
+        if client is None:
+            import cloudinary.uploader
+
+            client = cloudinary.uploader
+        self.client = client
+        self.folder = folder
+
+    def key_for(self, relative_path):
+        # public_id sans extension, relatif à static/
+        path = Path(relative_path)
+        if path.parts and path.parts[0] == 'static':
+            path = Path(*path.parts[1:])
+        return str(path.with_suffix('')).replace('\\', '/')
+
+    def upload(self, path, key):
+        suffix = Path(path).suffix.lower()
+        resource_type = 'raw'  # Par défaut (GLB, etc.)
+        if suffix in IMAGE_EXTENSIONS:
+            resource_type = 'image'
+        elif suffix in VIDEO_EXTENSIONS:
+            resource_type = 'video'
+        result = self.client.upload(
+            str(path),
+            public_id=key,
+            resource_type=resource_type,
+            folder=self.folder,
+            overwrite=True,
+            unique_filename=False,
+        )
+        return result['secure_url']
+
+
+class B2Uploader:
+    name = 'b2'
+    source_dirs = B2_SOURCE_DIRS
+
+    def __init__(
+        self,
+        client=None,
+        bucket=None,
+        endpoint_url=None,
+        workers=8,
+        multipart_threshold=16 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+    ):
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket or os.getenv('B2_BUCKET_NAME')
+        self.endpoint_url = endpoint_url or os.getenv(
+            'B2_ENDPOINT_URL', 'https://s3.us-west-004.backblazeb2.com'
+        )
+        if client is None:
+            import boto3
+            from botocore.config import Config
+
+            # Un client partagé par tous les threads, pool de connexions à la taille du pool
+            client = boto3.client(
+                's3',
+                endpoint_url=self.endpoint_url,
+                aws_access_key_id=os.getenv('B2_KEY_ID'),
+                aws_secret_access_key=os.getenv('B2_APPLICATION_KEY'),
+                region_name=os.getenv('B2_REGION', 'us-west-004'),
+                config=Config(
+                    max_pool_connections=workers * 4,
+                    retries={'max_attempts': 5, 'mode': 'adaptive'},
+                ),
+            )
+        self.client = client
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=4,
+        )
+
+    def key_for(self, relative_path):
+        # Même arborescence que vercel-blob-backup/ (pathname Vercel Blob)
+        path = Path(relative_path)
+        if path.parts and path.parts[0] in B2_SOURCE_DIRS:
+            path = Path(*path.parts[1:])
+        return str(path).replace('\\', '/')
+
+    def upload(self, path, key):
+        suffix = Path(path).suffix.lower()
+        content_type = (
+            CONTENT_TYPES.get(suffix)
+            or mimetypes.guess_type(str(path))[0]
+            or 'application/octet-stream'
+        )
+        self.client.upload_file(
+            str(path),
+            self.bucket,
+            key,
+            ExtraArgs={
+                'ContentType': content_type,
+                'ACL': 'public-read',
+                'CacheControl': 'max-age=86400',
+            },
+            Config=self.transfer_config,
+        )
+        return f"{self.endpoint_url}/{self.bucket}/{key}"
+
+
+def iter_files(source_dirs):
+    """(chemin, chemin relatif) de chaque fichier, en un seul parcours"""
+    for source_dir in source_dirs:
+        source_path = Path(source_dir)
+        if not source_path.exists():
+            print(f"⚠️  Dossier ignoré: {source_dir} (inexistant)")
+            continue
+        for filepath in sorted(source_path.rglob('*')):
+            if filepath.is_file() and filepath.name not in IGNORED_NAMES:
+                yield filepath, filepath.as_posix()
+
+
+def upload_one(uploader, manifest, filepath, relative_path, dry_run=False):
+    """
+    Envoie un fichier s'il a changé depuis le manifeste.
+    Retourne ("uploaded" | "skipped", URL ou None).
+    """
+    stat = filepath.stat()
+    key = uploader.key_for(relative_path)
+    entry = manifest.get(relative_path)
+    if entry and entry.get('key') == key and entry['size'] == stat.st_size:
+        if entry['mtime'] == stat.st_mtime:
+            return 'skipped', entry.get('url')
+        # mtime modifié (copie, checkout...) : on compare le contenu
+        content_hash = hash_file(filepath)
+        if content_hash == entry['sha256']:
+            manifest.record(relative_path, {**entry, 'mtime': stat.st_mtime})
+            return 'skipped', entry.get('url')
+    else:
+        content_hash = hash_file(filepath)
+
+    if dry_run:
+        return 'uploaded', None
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            url = uploader.upload(filepath, key)
+            break
+        except Exception:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(2 ** attempt)
+
+    manifest.record(
+        relative_path,
+        {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': content_hash,
+            'key': key,
+            'url': url,
+            'uploaded_at': time.time(),
+        },
+    )
+    return 'uploaded', url
+
+
+def bulk_upload(uploader, manifest, files, workers=8, dry_run=False, log=print):
+    """
+    Upload parallèle de `files` [(chemin, chemin relatif)] ; au plus workers x 4
+    tâches en attente. Retourne {"uploaded", "skipped", "errors", "total"}.
+    """
+    files = list(files)
+    total = len(files)
+    stats = {'uploaded': 0, 'skipped': 0, 'errors': 0, 'total': total}
+    log(f"📦 {total} fichiers trouvés\n")
+
+    pending = {}
+    done = 0
+    queue = iter(files)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while len(pending) < workers * 4:
+                item = next(queue, None)
+                if item is None:
+                    break
+                future = executor.submit(upload_one, uploader, manifest, *item, dry_run)
+                pending[future] = item[1]
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                relative_path = pending.pop(future)
+                done += 1
+                try:
+                    status, url = future.result()
+                except Exception as e:
+                    stats['errors'] += 1
+                    log(f"❌ [{done}/{total}] {relative_path}: {e}")
+                    continue
+                stats[status] += 1
+                if status == 'uploaded':
+                    log(f"⬆️  [{done}/{total}] {relative_path} ✅ {url or '(dry-run)'}")
+    except KeyboardInterrupt:
+        for future in pending:
+            future.cancel()
+        log("\n⏸️  Interrompu : relancez la même commande pour reprendre")
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        manifest.save()
+    return stats
+
+
+def check_credentials(target):
+    """Vérifie que les credentials de la cible sont configurés"""
+    if target == 'cloudinary':
+        if os.getenv('CLOUDINARY_URL') or all(
+            os.getenv(name)
+            for name in ('CLOUDINARY_CLOUD_NAME', 'CLOUDINARY_API_KEY', 'CLOUDINARY_API_SECRET')
+        ):
+            return True
+        print("❌ Erreur: Credentials Cloudinary manquants\n")
+        print("💡 Définir les variables d'environnement:")
+        print("   export CLOUDINARY_CLOUD_NAME='your-cloud-name'")
+        print("   export CLOUDINARY_API_KEY='your-api-key'")
+        print("   export CLOUDINARY_API_SECRET='your-api-secret'")
+        return False
+
+    if all(os.getenv(name) for name in ('B2_KEY_ID', 'B2_APPLICATION_KEY', 'B2_BUCKET_NAME')):
+        return True
+    print("❌ Erreur: Credentials Backblaze B2 manquants")
+    print("\n💡 Définissez les variables d'environnement:")
+    print("   export B2_KEY_ID='your-key-id'")
+    print("   export B2_APPLICATION_KEY='your-application-key'")
+    print("   export B2_BUCKET_NAME='your-bucket-name'")
+    return False
+
+
+def build_uploader(target, workers, multipart_threshold_mb):
+    if target == 'cloudinary':
+        import cloudinary
+
+        if not os.getenv('CLOUDINARY_URL'):
+            cloudinary.config(
+                cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
+                api_key=os.getenv('CLOUDINARY_API_KEY'),
+                api_secret=os.getenv('CLOUDINARY_API_SECRET'),
+                secure=True,
+            )
+        return CloudinaryUploader()
+    return B2Uploader(
+        workers=workers, multipart_threshold=multipart_threshold_mb * 1024 * 1024
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload en masse vers Cloudinary ou B2")
+    parser.add_argument('target', choices=['cloudinary', 'b2'])
+    parser.add_argument('sources', nargs='*', help="Dossiers à envoyer (défaut selon la cible)")
+    parser.add_argument('--workers', type=int, default=8, help="Uploads simultanés")
+    parser.add_argument('--manifest', help=f"Fichier manifeste (défaut: {MANIFEST_DIR}/<cible>.json)")
+    parser.add_argument('--dry-run', action='store_true', help="Liste les fichiers à envoyer")
+    parser.add_argument(
+        '--multipart-threshold', type=int, default=16, help="B2 : seuil multipart en Mo"
+    )
+    args = parser.parse_args(argv)
+
+    if not args.dry_run and not check_credentials(args.target):
+        return 1
+
+    uploader = build_uploader(args.target, args.workers, args.multipart_threshold)
+    manifest = Manifest(args.manifest or Path(MANIFEST_DIR) / f"{args.target}.json")
+    print(f"🚀 Début de l'upload vers {args.target} ({args.workers} workers)...\n")
+
+    started = time.monotonic()
+    try:
+        stats = bulk_upload(
+            uploader,
+            manifest,
+            iter_files(args.sources or uploader.source_dirs),
+            workers=args.workers,
+            dry_run=args.dry_run,
+        )
+    except KeyboardInterrupt:
+        return 130
+
+    print(f"\n{'=' * 60}")
+    print(f"✅ Upload terminé en {time.monotonic() - started:.1f}s !")
+    print(f"   - Uploadés: {stats['uploaded']}/{stats['total']}")
+    print(f"   - Inchangés: {stats['skipped']}")
+    print(f"   - Erreurs: {stats['errors']}")
+    print(f"{'=' * 60}\n")
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,66 +1,85 @@
 #!/usr/bin/env python3
-import subprocess
+"""
+Compression des GLB locaux avec l'étape de compression du backend.
+
+Les modèles stockés sont compressés automatiquement à l'upload ; pour les
+retraiter : `python backend/manage.py process_models --stage compression`.
+Ce script reste utile pour les fichiers de static/public/.
+"""
 import os
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-def compress_with_gltf_transform(input_path, output_path=None):
-    """Compresse un fichier GLB avec gltf-transform (Node.js)"""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.Base_threlte_dv.compression import CODECS, compress_model  # noqa: E402
+
+
+def compress_file(input_path, output_path=None, codec="draco"):
+    """Compresse un GLB ; retourne (chemin de sortie ou None, métadonnées)"""
     if output_path is None:
         output_path = input_path.replace('.glb', '_draco.glb')
-    
-    cmd = [
-        'npx', 'gltf-transform', 'draco',
-        input_path,
-        output_path
-    ]
-    
-    try:
-        print(f"🔄 Compression de {input_path}...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ Fichier compressé : {output_path}")
-            original_size = os.path.getsize(input_path)
-            compressed_size = os.path.getsize(output_path)
-            compression_ratio = (1 - compressed_size/original_size) * 100
-            
-            print(f"📊 Taille originale : {original_size/1024/1024:.2f} MB")
-            print(f"📊 Taille compressée : {compressed_size/1024/1024:.2f} MB")
-            print(f"📈 Ratio de compression : {compression_ratio:.1f}%")
-            
-            return output_path
-        else:
-            print(f"❌ Erreur : {result.stderr}")
-            return None
-    except FileNotFoundError:
-        print("❌ gltf-transform n'est pas installé. Installez-le avec :")
-        print("   npm install -g @gltf-transform/cli")
-        return None
 
-def batch_compress(folder_path):
-    """Compresse tous les GLB dans un dossier"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        outputs = compress_model(input_path, output_dir, {"codec": codec})
+        if not outputs:
+            return None, {}
+        shutil.move(outputs[0]["path"], output_path)
+        return output_path, outputs[0]["metadata"]
+
+
+def batch_compress(folder_path, codec="draco", workers=None):
+    """Compresse tous les GLB d'un dossier en parallèle"""
     folder = Path(folder_path)
-    glb_files = list(folder.glob('*.glb'))
-    
+    glb_files = [f for f in folder.glob('*.glb') if '_draco' not in f.stem]
+
     print(f"📁 Dossier : {folder}")
     print(f"📦 {len(glb_files)} fichiers GLB trouvés")
-    
-    for glb_file in glb_files:
-        # Ne pas recompresser les fichiers déjà compressés
-        if '_draco' not in glb_file.stem:
-            output_file = glb_file.parent / f"{glb_file.stem}_draco.glb"
-            compress_with_gltf_transform(str(glb_file), str(output_file))
-            print("-" * 50)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(
+                compress_file,
+                str(glb_file),
+                str(glb_file.parent / f"{glb_file.stem}_draco.glb"),
+                codec,
+            ): glb_file
+            for glb_file in glb_files
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            glb_file = futures[future]
+            try:
+                output_path, metadata = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(glb_files)}] ❌ {glb_file.name} : {e}")
+                continue
+            if output_path is None:
+                print(f"[{done}/{len(glb_files)}] ⏭️  {glb_file.name} : déjà compressé ou aucun gain")
+                continue
+            print(
+                f"[{done}/{len(glb_files)}] ✅ {glb_file.name} ({metadata['codec']}) : "
+                f"{metadata['original_bytes']/1024/1024:.2f} MB → "
+                f"{metadata['bytes']/1024/1024:.2f} MB "
+                f"({(1 - metadata['ratio']) * 100:.1f}% gagnés)"
+            )
+
 
 if __name__ == "__main__":
+    codec = os.environ.get("MODEL_COMPRESSION_CODEC", "draco")
+    if codec not in CODECS:
+        sys.exit(f"Codec inconnu : {codec} ({', '.join(CODECS)})")
+
     if len(sys.argv) > 1:
         # Compression d'un fichier spécifique
         input_file = sys.argv[1]
         output_file = sys.argv[2] if len(sys.argv) > 2 else None
-        compress_with_gltf_transform(input_file, output_file)
+        output_path, metadata = compress_file(input_file, output_file, codec)
+        print(f"✅ {output_path} : {metadata}" if output_path else "⏭️  Aucun gain")
     else:
         # Compression en batch
         folder = input("Entrez le chemin du dossier (défaut: ./static/public/) : ")
         folder = folder.strip() if folder else "./static/public/"
-        batch_compress(folder)
+        batch_compress(folder, codec)